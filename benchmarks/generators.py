@@ -0,0 +1,275 @@
+"""
+Generate synthetic raw files in the native format of each builtin dataloader.
+
+Instruments are derived from the row index, so files generated with the same
+number of rows describe the same book across providers and can be reconciled
+against each other. The quantity of a small share of rows is perturbed so that
+reconciliation finds breaks.
+"""
+
+import datetime as dt
+import io
+from pathlib import Path
+
+import polars as pl
+
+from novi_tally.dataloaders.formidium import FormidiumAPIPositionLoader
+from novi_tally.dataloaders.rjo import headers
+
+FUND_NAME = "Noviscient Pure Alpha - Noviscient Solutions VCC"
+IB_ACCOUNTS = ["U19923882", "U8674826"]
+RJO_ACCOUNTS = ["30012", "30014", "30015", "30016"]
+
+RJO_ROOTS = ["ES", "NQ", "CL", "NG", "GC", "C", "W", "ZB"]
+RJO_SECTORS = [
+    "Index",
+    "Index",
+    "Comdty",
+    "Comdty",
+    "Comdty",
+    "Comdty",
+    "Comdty",
+    "Comdty",
+]
+
+
+def _rjo_contract() -> dict[str, pl.Expr]:
+    """The root, sector, contract code and month of each instrument of the book.
+
+    They are derived from the instrument index alone, so that every instrument
+    has its own bloomberg yellow key and RJO contract code. Beyond the 960
+    contracts of the roots (8 roots, 12 months, 10 years), roots are numbered:
+    ES1, NQ1...
+    """
+    contract = pl.col("i") // 120
+    root_index = (contract % len(RJO_ROOTS)).cast(pl.UInt32)
+    generation = contract // len(RJO_ROOTS)
+    root = pl.concat_str(
+        root_index.replace_strict(dict(enumerate(RJO_ROOTS)), return_dtype=pl.String),
+        pl.when(generation > 0).then(generation.cast(pl.String)).otherwise(pl.lit("")),
+    )
+    return {
+        "Exchange_code": pl.lit("01"),
+        "Contract_code": root,
+        "bloomberg_root": root,
+        "bloomberg_market_sector": root_index.replace_strict(
+            dict(enumerate(RJO_SECTORS)), return_dtype=pl.String
+        ),
+        "Contract_month": pl.format(
+            "20{}{}",
+            (25 + pl.col("i") // 12 % 10).cast(pl.String),
+            (1 + pl.col("i") % 12).cast(pl.String).str.zfill(2),
+        ),
+    }
+
+
+def _pick(values: list, seed: int) -> pl.Expr:
+    """Pick one of `values` per row, deterministically."""
+    return (
+        pl.int_range(pl.len())
+        .hash(seed)
+        .mod(len(values))
+        .cast(pl.UInt32)
+        .replace_strict(dict(enumerate(values)), return_dtype=pl.String)
+    )
+
+
+def _uniform(low: float, high: float, seed: int) -> pl.Expr:
+    return low + (
+        pl.int_range(pl.len()).hash(seed).mod(1_000_000).cast(pl.Float64) / 1_000_000
+    ) * (high - low)
+
+
+def _book(n_rows: int, accounts: list[str]) -> pl.DataFrame:
+    """The underlying book: one row per (account, instrument)."""
+    return pl.DataFrame({"i": pl.int_range(n_rows, eager=True)}).with_columns(
+        _pick(accounts, seed=1).alias("account"),
+        pl.format("SECURITY {}", pl.col("i")).alias("description"),
+        pl.format("TICK{} US EQUITY", pl.col("i")).alias("bbg_yellow"),
+        pl.format("BBG{}", pl.col("i").cast(pl.String).str.zfill(9)).alias("figi"),
+        (_uniform(1, 1000, seed=2)).round(0).cast(pl.Int64).alias("quantity"),
+        (_uniform(1, 500, seed=3)).round(4).alias("price"),
+        _pick(["USD", "USD", "USD", "EUR", "JPY"], seed=4).alias("ccy"),
+        # rows where the provider disagrees with the others
+        (pl.int_range(pl.len()).hash(5).mod(100) == 0).alias("is_break"),
+    )
+
+
+def _perturbed(book: pl.DataFrame) -> pl.DataFrame:
+    return book.with_columns(
+        pl.when(pl.col("is_break"))
+        .then(pl.col("quantity") + 1)
+        .otherwise(pl.col("quantity"))
+        .alias("quantity")
+    )
+
+
+def ib_position_csv(n_rows: int) -> bytes:
+    """An IB `F5678557_Position_YYYYMMDD.csv` file."""
+    book = _book(n_rows, IB_ACCOUNTS)
+    frame = book.select(
+        pl.lit("D").alias("Type"),
+        pl.col("account").alias("AccountID"),
+        pl.lit("Noviscient").alias("AccountAlias"),
+        pl.col("description").alias("SecurityDescription"),
+        pl.col("figi").alias("BBGlobalID"),
+        _pick(["STK", "STK", "FUT", "OPT"], seed=6).alias("AssetType"),
+        pl.col("ccy").alias("Currency"),
+        pl.col("quantity").alias("Quantity"),
+        pl.col("price").alias("MarketPrice"),
+        (pl.col("quantity") * pl.col("price")).alias("MarketValue"),
+        (pl.col("price") * 0.95).round(4).alias("CostPrice"),
+        pl.lit(1).alias("Multiplier"),
+    )
+    # a couple of cash rows, which the loader filters out
+    frame = pl.concat(
+        [
+            frame,
+            frame.head(2).with_columns(
+                pl.lit("CASH").alias("AssetType"),
+                pl.lit(None, pl.String).alias("BBGlobalID"),
+            ),
+        ]
+    )
+
+    buffer = io.BytesIO()
+    buffer.write(b'"HEADER","F5678557","Position"\n')
+    frame.write_csv(buffer)
+    return buffer.getvalue()
+
+
+def rjo_position_csv(n_rows: int) -> bytes:
+    """An RJO `NOVISCIENT_SFTP_csvnpos_npos_YYYYMMDD.csv` file, without a header."""
+    book = _perturbed(_book(n_rows, RJO_ACCOUNTS))
+    columns = {
+        "Record_code": pl.lit("P"),
+        "Account_number": pl.col("account"),
+        "Buy_sell_code": pl.when(pl.col("i") % 5 == 0).then(2).otherwise(1),
+        "Quantity": pl.col("quantity").abs(),
+        "Security_desc_line_1": pl.col("description"),
+        "Formatted_trade_price": pl.col("price").cast(pl.String),
+        "Trade_date": pl.lit("20241231"),
+        "Security_type_code": pl.lit("F"),
+        "Security_subtype_code": pl.lit(None, pl.String),
+        "Trade_price": pl.col("price") * 0.95,
+        "Account_type_currency_symbol": pl.col("ccy"),
+        "Close_price": pl.col("price"),
+        "Multiplication_factor": pl.lit(50.0),
+        **_rjo_contract(),
+    }
+    frame = book.select(
+        columns.get(name, pl.lit(None, pl.String)).alias(name)
+        for name in headers.POSITION_HEADER
+    )
+    return frame.write_csv(include_header=False).encode()
+
+
+def rjo_trade_csv(n_rows: int, date: dt.date = dt.date(2024, 12, 31)) -> bytes:
+    """An RJO `NOVISCIENT_SFTP_csvth1_dth1_YYYYMMDD.csv` file, without a header.
+
+    Each instrument of the book is filled in up to three trades.
+    """
+    book = _perturbed(_book(n_rows, RJO_ACCOUNTS))
+    fills = book.with_columns(
+        pl.int_ranges(1 + pl.col("i").hash(8).mod(3).cast(pl.Int64)).alias("fill")
+    ).explode("fill")
+    columns = {
+        "Record_code": pl.lit("T"),
+        "Account_number": pl.col("account"),
+        "Buy_sell_code": pl.when(pl.col("i") % 5 == 0).then(2).otherwise(1),
+        "Quantity": pl.col("quantity"),
+        "Security_desc_line_1": pl.col("description"),
+        "Formatted_trade_price": pl.col("price").cast(pl.String),
+        "Trade_date": pl.lit(f"{date:%Y%m%d}"),
+        "Security_type_code": pl.lit("F"),
+        "Security_subtype_code": pl.lit(None, pl.String),
+        "Trade_price": pl.col("price") + pl.col("fill") * 0.25,
+        "Account_type_currency_symbol": pl.col("ccy"),
+        "Multiplication_factor": pl.lit(50.0),
+        **_rjo_contract(),
+    }
+    frame = fills.select(
+        columns.get(name, pl.lit(None, pl.String)).alias(name)
+        for name in headers.TRADE_HEADER
+    )
+    return frame.write_csv(include_header=False).encode()
+
+
+def enfusion_position_csv(n_rows: int) -> bytes:
+    """An Enfusion `paf_1_dailyposition_YYYYMMDD.csv` file."""
+    book = _perturbed(_book(n_rows, IB_ACCOUNTS))
+    frame = book.select(
+        pl.col("i").cast(pl.String).alias("Deal Id"),
+        pl.format("IBLLC {}", pl.col("account")).alias("Account"),
+        pl.col("description").alias("Description"),
+        pl.col("bbg_yellow").alias("BB Yellow Key"),
+        pl.col("quantity").cast(pl.Float64).alias("Notional Quantity"),
+        pl.col("price").alias("Market Price"),
+        (pl.col("price") * 0.95).round(4).alias("Native Average Cost"),
+        pl.col("ccy").alias("Native Currency"),
+        pl.lit("Equity").alias("Asset Class"),
+        pl.lit("12/31/2024").alias("Position Scenario Date"),
+        pl.lit(True).alias("Active"),
+    )
+    return frame.write_csv().encode()
+
+
+def _formidium_rows(n_rows: int) -> pl.DataFrame:
+    book = _perturbed(_book(n_rows, IB_ACCOUNTS))
+    return book.select(
+        pl.format("Interactive Brokers - {}", pl.col("account")).alias("Account"),
+        pl.col("bbg_yellow").alias("Symbol"),
+        pl.col("description").alias("Security"),
+        pl.col("quantity").cast(pl.Float64).alias("Quantity"),
+        pl.col("price").alias("MP"),
+        (pl.col("price") * 0.95).round(4).alias("Unit Cost (LC)"),
+        pl.col("ccy").alias("CCY"),
+        pl.lit("Equities").alias("Asset Class"),
+    )
+
+
+def formidium_positions_json(n_rows: int) -> dict:
+    """A Formidium API positions response, as returned by `FormidiumApi`."""
+    assert set(IB_ACCOUNTS) <= set(FormidiumAPIPositionLoader.FUNDNAMES[FUND_NAME])
+    return {"resultList": _formidium_rows(n_rows).to_dicts()}
+
+
+def formidium_nav_report_xlsx(n_rows: int, path: str | Path) -> Path:
+    """A Formidium NAV report workbook, with the table header on the 4th row.
+
+    Requires `xlsxwriter`. Excel sheets hold at most 1,048,576 rows.
+    """
+    path = Path(path)
+    _formidium_rows(min(n_rows, 1_048_570)).write_excel(
+        path,
+        position=(3, 0),
+        autofit=False,
+    )
+    return path
+
+
+def write_all(
+    directory: str | Path, n_rows: int, date: dt.date = dt.date(2024, 12, 31)
+) -> Path:
+    """Write the raw CSV files of every file-based loader under `directory`.
+
+    The layout matches the paths the loaders read, so the directory can be used
+    as the root of a `LocalFileSystem`.
+    """
+    directory = Path(directory)
+    (directory / "IB").mkdir(parents=True, exist_ok=True)
+    (directory / "daily_positions").mkdir(parents=True, exist_ok=True)
+
+    (directory / f"IB/F5678557_Position_{date:%Y%m%d}.csv").write_bytes(
+        ib_position_csv(n_rows)
+    )
+    (directory / f"NOVISCIENT_SFTP_csvnpos_npos_{date:%Y%m%d}.csv").write_bytes(
+        rjo_position_csv(n_rows)
+    )
+    (directory / f"daily_positions/paf_1_dailyposition_{date:%Y%m%d}.csv").write_bytes(
+        enfusion_position_csv(n_rows)
+    )
+    (directory / f"NOVISCIENT_SFTP_csvth1_dth1_{date:%Y%m%d}.csv").write_bytes(
+        rjo_trade_csv(n_rows, date)
+    )
+    return directory
@@ -0,0 +1,207 @@
+"""
+# Benchmark the stages of position reconciliation on synthetic data
+
+Times `extract`, `transform` and full and fast validation of every builtin
+position loader, and `reconcile_with` between providers, on generated files of
+the requested sizes. Network connections are replaced by local files and
+offline stand-ins, so only our own processing is measured.
+
+Run:
+    python -m benchmarks.run --rows 1000 100000 1000000
+    python -m benchmarks.run --rows 100000 --save before.json
+    python -m benchmarks.run --rows 100000 --compare before.json
+"""
+
+import argparse
+import datetime as dt
+import importlib.util
+import json
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import polars as pl
+
+from novi_tally import Position
+from novi_tally.connections.file_systems import LocalFileSystem
+from novi_tally.dataloaders import enfusion, formidium, ib, rjo
+from novi_tally.schemas import PositionSchema
+from novi_tally.validation import validate
+
+from . import generators
+
+DATE = dt.date(2024, 12, 31)
+
+
+class OfflineOpenFigiApi:
+    """Maps the generated BB global IDs without calling OpenFIGI."""
+
+    def get_bbg_mapping_table(self, bb_globals) -> dict[str, str]:
+        return {
+            bb_global: f"TICK{int(bb_global[3:])} US Equity"
+            for bb_global in bb_globals
+            if bb_global
+        }
+
+
+class OfflineFormidiumApi:
+    def __init__(self, response: dict):
+        self._response = response
+
+    def read_positions(self, date: dt.date, fund_name: str) -> dict:
+        return self._response
+
+    def read_positions_many(self, date: dt.date, fund_names: list[str]) -> dict:
+        return self._response
+
+
+def best_of(func: Callable[[], object], repeat: int) -> tuple[float, object]:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def make_loaders(directory: Path, n_rows: int) -> dict[str, tuple]:
+    fs = LocalFileSystem(str(directory))
+    return {
+        "ib": (
+            ib.IbPositionLoader(fs=fs, openfigi_api=OfflineOpenFigiApi()),  # type: ignore
+            generators.IB_ACCOUNTS,
+        ),
+        "rjo": (rjo.RjoPositionLoader(fs=fs), generators.RJO_ACCOUNTS),
+        "enfusion": (enfusion.EnfusionPositionLoader(fs=fs), generators.IB_ACCOUNTS),
+        "formidium": (
+            formidium.FormidiumAPIPositionLoader(
+                formidium_api=OfflineFormidiumApi(  # type: ignore
+                    generators.formidium_positions_json(n_rows)
+                )
+            ),
+            generators.IB_ACCOUNTS,
+        ),
+    }
+
+
+def run(n_rows: int, repeat: int) -> dict[str, float]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = generators.write_all(tmp, n_rows=n_rows, date=DATE)
+
+        positions = {}
+        for provider, (loader, accounts) in make_loaders(directory, n_rows).items():
+            elapsed, raw = best_of(
+                lambda: loader.extract(date=DATE, accounts=accounts), repeat
+            )
+            results[f"{provider}.extract"] = elapsed
+
+            elapsed, transformed = best_of(lambda: loader.transform(raw), repeat)
+            results[f"{provider}.transform"] = elapsed
+
+            elapsed, _ = best_of(lambda: PositionSchema.validate(transformed), repeat)
+            results[f"{provider}.validate"] = elapsed
+
+            elapsed, _ = best_of(
+                lambda: validate(transformed, PositionSchema, mode="fast"), repeat
+            )
+            results[f"{provider}.validate_fast"] = elapsed
+
+            position = Position(
+                dataloader=loader, date=DATE, provider_name=provider, accounts=accounts
+            )
+            position._data = transformed  # type: ignore
+            positions[provider] = position
+
+        # writing the workbook needs the optional `xlsxwriter` package
+        if importlib.util.find_spec("xlsxwriter") is not None:
+            report = generators.formidium_nav_report_xlsx(
+                n_rows, directory / "nav_report.xlsx"
+            )
+            loader = formidium.FormidiumPositionLoader(filepath=str(report))
+            # the first read parses the workbook and writes its Parquet sidecar
+            elapsed, _ = best_of(
+                lambda: loader.extract(date=DATE, accounts=generators.IB_ACCOUNTS), 1
+            )
+            results["formidium_xlsx.extract"] = elapsed
+            elapsed, _ = best_of(
+                lambda: loader.extract(date=DATE, accounts=generators.IB_ACCOUNTS),
+                repeat,
+            )
+            results["formidium_xlsx.extract_sidecar"] = elapsed
+
+        for left, right in [("ib", "enfusion"), ("ib", "formidium")]:
+            elapsed, _ = best_of(
+                lambda: positions[left].reconcile_with(
+                    positions[right],
+                    instrument_identifier="description",
+                    fallback_identifier="bbg_yellow",
+                ),
+                repeat,
+            )
+            results[f"reconcile.{left}_vs_{right}"] = elapsed
+
+        # matched on BBG yellows rather than descriptions, RJO with a copy of itself
+        positions["rjo_copy"] = Position(
+            dataloader=positions["rjo"].dataloader, date=DATE, provider_name="rjo_copy"
+        )
+        positions["rjo_copy"]._data = positions["rjo"].data  # type: ignore
+        for left, right in [("ib", "enfusion"), ("rjo", "rjo_copy")]:
+            elapsed, _ = best_of(
+                lambda: positions[left].reconcile_with(
+                    positions[right], instrument_identifier="bbg_yellow"
+                ),
+                repeat,
+            )
+            results[f"reconcile.{left}_vs_{right}.bbg_yellow"] = elapsed
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--save", help="save the timings to this JSON file")
+    parser.add_argument("--compare", help="compare with timings saved by --save")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="relative slowdown reported as a regression with --compare",
+    )
+    args = parser.parse_args()
+
+    timings = {}
+    for n_rows in args.rows:
+        for name, elapsed in run(n_rows, args.repeat).items():
+            timings[f"{name}[{n_rows}]"] = elapsed
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else {}
+    table = pl.DataFrame(
+        {
+            "benchmark": list(timings),
+            "seconds": list(timings.values()),
+            "baseline": [baseline.get(name) for name in timings],
+        },
+        schema_overrides={"baseline": pl.Float64},
+    ).with_columns(
+        (pl.col("seconds") / pl.col("baseline") - 1).alias("change"),
+    )
+
+    with pl.Config(tbl_rows=-1, fmt_str_lengths=60):
+        print(table)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(timings, indent=2))
+
+    regressions = table.filter(pl.col("change") > args.tolerance)
+    if len(regressions):
+        print(f"{len(regressions)} regression(s) above {args.tolerance:.0%}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
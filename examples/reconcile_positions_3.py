@@ -116,6 +116,9 @@ for broker, broker_accounts in chk_accounts.items():
         accounts=broker_accounts,
     )
 
+    # fetch all three providers concurrently instead of one after another
+    Position.load_all([broker_position, enfusion_position, fund_admin_position])
+
     ##### Broker versus Fund Admin #####
     print("Broker versus Fund Admin ")
     diff, left, right = broker_position.reconcile_with(
@@ -1,3 +1,15 @@
-from novi_tally.api import Position
+from novi_tally.api import Position, PositionRange, Trade
+from novi_tally.instruments import InstrumentMaster
+from novi_tally.reconciliation import ReconciliationState
+from novi_tally.results import ResultStore
+from novi_tally.snapshots import SnapshotStore
 
-__all__ = ["Position"]
+__all__ = [
+    "InstrumentMaster",
+    "Position",
+    "PositionRange",
+    "ReconciliationState",
+    "ResultStore",
+    "SnapshotStore",
+    "Trade",
+]
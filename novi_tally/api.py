@@ -1,18 +1,81 @@
+import asyncio
 import datetime as dt
-from functools import cached_property
-from typing import Literal
+import inspect
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar, Literal
 
 import polars as pl
 
-from novi_tally.config import load_config
+from novi_tally.config import registry
 from novi_tally.dataloaders import enfusion, formidium, ib, rjo
-from novi_tally.errors import ConfigError
-from novi_tally.protocols import PositionLoader
-from novi_tally.schemas import PositionSchema
+from novi_tally.dates import business_days
+from novi_tally.errors import MissingDataError
+from novi_tally.instrumentation import stage
+from novi_tally.instruments import InstrumentMaster, standard_id_columns
+from novi_tally.protocols import (
+    AsyncPositionLoader,
+    LazyPositionLoader,
+    LazyTradeLoader,
+    PositionLoader,
+    TradeLoader,
+)
+from novi_tally.reconciliation import (
+    ReconciliationState,
+    reconcile_frames,
+    reconcile_incremental,
+    reconcile_many_frames,
+    reconcile_sharded,
+)
+from novi_tally.results import ResultSink
+from novi_tally.schemas import PositionSchema, TradeSchema
+from novi_tally.snapshots import SnapshotLoader, SnapshotStore
+from novi_tally.validation import ValidationMode, validate
+
+InstrumentIdentifier = Literal["description", "bbg_yellow", "instrument_key"]
+
+
+def _identifiers(
+    instrument_identifier: str | list[str], fallback_identifier: str | None
+) -> list[str]:
+    identifiers = (
+        [instrument_identifier]
+        if isinstance(instrument_identifier, str)
+        else list(instrument_identifier)
+    )
+    if not identifiers:
+        raise ValueError("At least one instrument identifier is needed")
+    if fallback_identifier:
+        # further reconcile unmatched rows with `fallback_identifier`
+        identifiers.append(fallback_identifier)
+    return identifiers
+
+
+def _make_dataloader(
+    provider: str,
+    config_filepath: str,
+    dataloader_classes: dict,
+    instrument_master: InstrumentMaster | None = None,
+):
+    try:
+        dataloader_cls = dataloader_classes[provider]
+    except KeyError as e:
+        raise KeyError(f"Dataloader not defined for provider {provider}") from e
+
+    # connections are shared with every other dataloader using the same file
+    kwargs = registry.dataloader_kwargs(config_filepath, provider)
+    # e.g. IB maps its instruments with the master before asking OpenFIGI
+    if (
+        instrument_master is not None
+        and "instrument_master" in inspect.signature(dataloader_cls).parameters
+    ):
+        kwargs["instrument_master"] = instrument_master
+    return dataloader_cls(**kwargs)
 
 
 class Position:
-    DATALOADER_CLASS_MAPPING = {
+    DATALOADER_CLASS_MAPPING: ClassVar[dict[str, type[PositionLoader]]] = {
         "ib": ib.IbPositionLoader,
         "rjo": rjo.RjoPositionLoader,
         "enfusion": enfusion.EnfusionPositionLoader,
@@ -25,11 +88,30 @@ class Position:
         date: dt.date,
         provider_name: str = "custom",
         accounts: list[str] | None = None,
+        validation: ValidationMode = "full",
+        validation_sample: int | None = None,
+        instrument_master: InstrumentMaster | None = None,
     ):
+        """
+        Args:
+            validation: How the transformed data is validated against
+                `PositionSchema`, see `novi_tally.validation.validate`. "full" by
+                default; "fast" only checks columns, dtypes and nulls.
+            validation_sample: Only validate this many sampled rows in "full" mode.
+            instrument_master: If given, new instruments are registered in it and
+                every row gets its canonical `instrument_key`, to reconcile on.
+        """
         self.dataloader = dataloader
         self.date = date
         self.accounts = accounts
         self.provider_name = provider_name
+        self.validation = validation
+        self.validation_sample = validation_sample
+        self.instrument_master = instrument_master
+
+        self._data: pl.DataFrame | None = None
+        self._lock = threading.Lock()
+        self._loading: asyncio.Task[pl.DataFrame] | None = None
 
     @classmethod
     def from_config_file(
@@ -38,53 +120,279 @@ class Position:
         config_filepath: str,
         date: dt.date,
         accounts: list[str] | None = None,
+        validation: ValidationMode = "full",
+        instrument_master: InstrumentMaster | None = None,
     ):
-        config = load_config(config_filepath)
-
-        try:
-            dataloader_kwargs = config[provider]
-        except KeyError as e:
-            raise ConfigError(
-                f"No config found for provider {provider} in file {config_filepath}"
-            ) from e
-
-        try:
-            dataloader_cls = Position.DATALOADER_CLASS_MAPPING[provider]
-        except KeyError as e:
-            raise KeyError(f"PositionLoader not defined for provider {provider}") from e
+        return cls(
+            dataloader=Position._make_dataloader(
+                provider, config_filepath, instrument_master
+            ),
+            date=date,
+            accounts=accounts,
+            provider_name=provider,
+            validation=validation,
+            instrument_master=instrument_master,
+        )
 
-        dataloader = dataloader_cls(**dataloader_kwargs)
+    @classmethod
+    def from_snapshot(
+        cls,
+        store: SnapshotStore,
+        provider: str,
+        date: dt.date,
+        accounts: list[str] | None = None,
+        instrument_master: InstrumentMaster | None = None,
+    ) -> "Position":
+        """The position of `provider` on `date` as saved by `to_snapshot`.
 
+        Snapshots hold validated data, so the position is read from `store`
+        without extracting, transforming or validating it again. Its instruments
+        are still resolved against `instrument_master`, if given.
+        """
         return cls(
-            dataloader=dataloader,
+            dataloader=SnapshotLoader(store, provider),
             date=date,
             accounts=accounts,
             provider_name=provider,
+            validation="none",
+            instrument_master=instrument_master,
+        )
+
+    def to_snapshot(self, store: SnapshotStore) -> None:
+        """Save the data, loading it if needed, to `store` for `from_snapshot`."""
+        store.write(self.data, provider=self.provider_name, date=self.date)
+
+    @classmethod
+    def range(
+        cls,
+        provider: Literal["ib", "rjo", "enfusion", "formidium"],
+        config_filepath: str,
+        start: dt.date,
+        end: dt.date,
+        accounts: list[str] | None = None,
+        skip_missing: bool = False,
+        validation: ValidationMode = "full",
+        instrument_master: InstrumentMaster | None = None,
+    ) -> "PositionRange":
+        """Positions of a provider on every business day from `start` to `end`.
+
+        See `PositionRange` for details.
+        """
+        return PositionRange(
+            dataloader=Position._make_dataloader(
+                provider, config_filepath, instrument_master
+            ),
+            dates=business_days(start, end),
+            accounts=accounts,
+            provider_name=provider,
+            skip_missing=skip_missing,
+            validation=validation,
+            instrument_master=instrument_master,
         )
 
-    @cached_property
+    @staticmethod
+    def _make_dataloader(
+        provider: str,
+        config_filepath: str,
+        instrument_master: InstrumentMaster | None = None,
+    ) -> PositionLoader:
+        return _make_dataloader(
+            provider,
+            config_filepath,
+            Position.DATALOADER_CLASS_MAPPING,
+            instrument_master,
+        )
+
+    @property
     def data(self) -> pl.DataFrame:
-        raw = self.dataloader.extract(date=self.date, accounts=self.accounts)
-        transformed = self.dataloader.transform(raw)
-        return PositionSchema.validate(transformed)  # type: ignore
+        # a per-instance lock, so that different positions can load concurrently
+        # while the same position is only ever loaded once
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self._load()
+        return self._data
+
+    def lazy(self) -> pl.LazyFrame:
+        """The standardized positions as a lazy query, without validation.
+
+        With a `LazyPositionLoader`, extraction and transformation form a single
+        query, so filters and column selections applied to it (or a
+        reconciliation built on it, see `reconcile_frames`) are pushed down into
+        the file scan. Other loaders, and already loaded positions, return their
+        data as is.
+        """
+        if self._data is None and isinstance(self.dataloader, LazyPositionLoader):
+            return self.dataloader.transform_lazy(
+                self.dataloader.scan(date=self.date, accounts=self.accounts)
+            )
+        return self.data.lazy()
+
+    def _load(self) -> pl.DataFrame:
+        if isinstance(self.dataloader, LazyPositionLoader):
+            # extraction and transformation run as one query
+            with stage("position.extract_transform", **self._attributes()) as s:
+                transformed = self.dataloader.transform_lazy(
+                    self.dataloader.scan(date=self.date, accounts=self.accounts)
+                ).collect()
+                s.set(rows_out=transformed.height)
+        else:
+            with stage("position.extract", **self._attributes()) as s:
+                raw = self.dataloader.extract(date=self.date, accounts=self.accounts)
+                s.set(rows_out=raw.height)
+            transformed = self._transform(raw)
+        return self._validate(self._resolve_instruments(transformed))
+
+    def _transform(self, raw: pl.DataFrame) -> pl.DataFrame:
+        with stage("position.transform", **self._attributes()) as s:
+            transformed = self.dataloader.transform(raw)
+            s.set(rows_in=raw.height, rows_out=transformed.height)
+        return transformed
+
+    def _resolve_instruments(self, transformed: pl.DataFrame) -> pl.DataFrame:
+        if self.instrument_master is None:
+            return transformed
+
+        with stage("position.resolve_instruments", **self._attributes()) as s:
+            resolved = self.instrument_master.resolve(
+                transformed,
+                standard_id_columns(self.provider_name, transformed.columns),
+            )
+            s.set(
+                rows_in=transformed.height,
+                unresolved=resolved["instrument_key"].null_count(),
+            )
+        return resolved
+
+    def _validate(self, transformed: pl.DataFrame) -> pl.DataFrame:
+        with stage(
+            "position.validate", **self._attributes(), mode=self.validation
+        ) as s:
+            s.set(rows_in=transformed.height)
+            return validate(
+                transformed,
+                PositionSchema,
+                mode=self.validation,
+                sample=self.validation_sample,
+            )
+
+    def _attributes(self) -> dict:
+        return {"provider": self.provider_name, "date": self.date}
+
+    async def aload(self) -> pl.DataFrame:
+        """Load the data without blocking the running event loop.
+
+        With an `AsyncPositionLoader` the download is awaited on the event loop,
+        and the transformation and validation run on a thread. Other loaders are
+        loaded on a thread entirely. Concurrent calls share a single load.
+
+        Returns:
+            The `data` of the position.
+        """
+        if self._data is not None:
+            return self._data
+
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._aload())
+        loading = self._loading
+        try:
+            return await asyncio.shield(loading)
+        finally:
+            if loading.done() and self._loading is loading:
+                self._loading = None
+
+    async def _aload(self) -> pl.DataFrame:
+        if not isinstance(self.dataloader, AsyncPositionLoader):
+            return await asyncio.to_thread(lambda: self.data)
+
+        with stage("position.extract", **self._attributes()) as s:
+            raw = await self.dataloader.aextract(date=self.date, accounts=self.accounts)
+            s.set(rows_out=raw.height)
+        # transformations may block too, e.g. IB maps its instruments with OpenFIGI
+        data = await asyncio.to_thread(
+            lambda: self._validate(self._resolve_instruments(self._transform(raw)))
+        )
+        with self._lock:
+            if self._data is None:
+                self._data = data
+        return self._data
+
+    @staticmethod
+    def load_all(
+        positions: Iterable["Position"], max_workers: int | None = 8
+    ) -> list[pl.DataFrame]:
+        """Load the data of several positions concurrently.
+
+        Extraction and transformation are mostly network-bound (S3, SFTP, APIs),
+        so running them on a thread pool makes a run take roughly as long as the
+        slowest provider rather than the sum of all of them.
+
+        Args:
+            positions: Positions to load. Already loaded positions are not reloaded.
+            max_workers: The maximum number of threads used for loading.
+
+        Returns:
+            The `data` of each position, in the same order as `positions`.
+        """
+        positions = list(positions)
+        pending = {id(p): p for p in positions if p._data is None}
+
+        if pending:
+            with ThreadPoolExecutor(
+                max_workers=min(len(pending), max_workers or len(pending))
+            ) as executor:
+                # `result()` re-raises the first exception from any loader
+                for future in [
+                    executor.submit(lambda p: p.data, p) for p in pending.values()
+                ]:
+                    future.result()
+
+        return [p.data for p in positions]
+
+    @staticmethod
+    async def aload_all(positions: Iterable["Position"]) -> list[pl.DataFrame]:
+        """Load the data of several positions concurrently on the event loop.
+
+        The asyncio counterpart of `load_all`.
+
+        Returns:
+            The `data` of each position, in the same order as `positions`.
+        """
+        return list(await asyncio.gather(*(p.aload() for p in positions)))
 
     def reconcile_with(
         self,
         other: "Position",
-        instrument_identifier: Literal["description", "bbg_yellow"] = "description",
-        fallback_identifier: Literal["description", "bbg_yellow"] | None = None,
+        instrument_identifier: InstrumentIdentifier | list[str] = "description",
+        fallback_identifier: InstrumentIdentifier | None = None,
         price_diff_threshold: float = 0.01,
         quantity_diff_threshold: float = 0,
+        state: ReconciliationState | None = None,
+        processes: int | None = None,
+        max_shard_bytes: int | None = None,
     ) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
         """Compare positions between two different providers and identify discrepancies.
 
         Args:
             other: Another Position instance to compare against. Must have a different provider_name.
             instrument_identifier: The column to use for matching instruments across providers.
-                Can be either "description" or "bbg_yellow". Defaults to "description".
+                Can be "description", "bbg_yellow" or "instrument_key" (with an
+                `instrument_master`). Defaults to "description". A list of columns
+                is a fallback chain: rows unmatched on a column are matched on the
+                next one, all in a single pass, see `reconcile_frames`.
             fallback_identifier: If not None, further reconcile unmatched items with this identifier.
             price_diff_threshold: The price difference threshold when comparing.
             quantity_diff_threshold: The quantity difference threshold when comparing.
+            state: If given, reconcile incrementally: only the rows changed since
+                the previous reconciliation with the same state (e.g. the previous
+                day's), and the rows sharing an account and identifier with them,
+                are reconciled again. The results of the others are carried
+                forward. See `reconcile_incremental`.
+            processes: If given, reconcile shards of accounts on this many worker
+                processes, for books too large for one process to reconcile
+                quickly. See `reconcile_sharded`.
+            max_shard_bytes: With `processes`, split the data into enough shards
+                that none holds more than about this many bytes.
 
         Returns:
             A tuple of three polars DataFrames:
@@ -94,120 +402,483 @@ class Position:
             - right_only: Positions present only in the other provider
 
         Raises:
-            ValueError: If both Position instances have the same provider_name.
+            ValueError: If both Position instances have the same provider_name,
+                or both `state` and `processes` are given.
 
         Notes:
             The diff DataFrame includes columns suffixed with provider names and additional
-            columns showing the differences (price_diff, quantity_diff) and currency comparison.
+            columns showing the differences (price_diff, quantity_diff) and currency comparison,
+            and the identifier each pair matched on (match_level).
         """
 
         if other.provider_name == self.provider_name:
             raise ValueError("`other` can't have the same `provider_name`")
 
-        # make a copy and add provider name to column names
-        l_suffix = self.provider_name
-        r_suffix = other.provider_name
+        if state is not None and processes is not None:
+            raise ValueError("`state` and `processes` can't be used together")
 
-        left = self.data.clone().rename(
-            lambda name: f"{name}_{l_suffix}"
-            # if name not in ["account_id", "bbg_yellow"]
-            # else name
-        )
-        right = other.data.clone().rename(
-            lambda name: f"{name}_{r_suffix}"
-            # if name not in ["account_id", instrument_identifier]
-            # else name
-        )
+        identifiers = _identifiers(instrument_identifier, fallback_identifier)
 
-        diff, left_only, right_only = Position._reconcile_dataframes(
-            left=left,
-            right=right,
-            l_suffix=l_suffix,
-            r_suffix=r_suffix,
-            instrument_identifier=instrument_identifier,
+        if processes is not None:
+            return reconcile_sharded(
+                left=self.data,
+                right=other.data,
+                l_suffix=self.provider_name,
+                r_suffix=other.provider_name,
+                identifiers=identifiers,
+                price_diff_threshold=price_diff_threshold,
+                quantity_diff_threshold=quantity_diff_threshold,
+                max_workers=processes,
+                max_shard_bytes=max_shard_bytes,
+            )
+
+        if state is not None:
+            return reconcile_incremental(
+                left=self.data,
+                right=other.data,
+                l_suffix=self.provider_name,
+                r_suffix=other.provider_name,
+                identifiers=identifiers,
+                price_diff_threshold=price_diff_threshold,
+                quantity_diff_threshold=quantity_diff_threshold,
+                state=state,
+            )
+
+        return reconcile_frames(
+            left=self.data,
+            right=other.data,
+            l_suffix=self.provider_name,
+            r_suffix=other.provider_name,
+            identifiers=identifiers,
             price_diff_threshold=price_diff_threshold,
             quantity_diff_threshold=quantity_diff_threshold,
         )
 
-        if not fallback_identifier:
-            return diff, left_only, right_only
+    def reconcile_many(
+        self,
+        others: list["Position"],
+        instrument_identifier: InstrumentIdentifier = "description",
+        price_diff_threshold: float = 0.01,
+        quantity_diff_threshold: float = 0,
+        breaks_only: bool = True,
+    ) -> pl.DataFrame:
+        """Compare positions between this provider and several others at once.
 
-        # further reconcile unmatched rows with `fallback_identifier`
-        new_diff, new_left_only, new_right_only = Position._reconcile_dataframes(
-            left=left_only,
-            right=right_only,
-            l_suffix=l_suffix,
-            r_suffix=r_suffix,
-            instrument_identifier=fallback_identifier,
+        All providers are matched on account and instrument in a single pass,
+        rather than one `reconcile_with` per pair, into one wide table.
+
+        Args:
+            others: Positions of other providers, compared with this one. Provider
+                names must be unique.
+            instrument_identifier: The column to use for matching instruments
+                across providers.
+            price_diff_threshold: The price difference threshold when comparing.
+            quantity_diff_threshold: The quantity difference threshold when comparing.
+            breaks_only: Only return the instruments which some provider doesn't
+                hold or disagrees on.
+
+        Returns:
+            One row per account and instrument, with the quantity, price and
+            currency of each provider, and the differences and agreement
+            (`agrees_<provider>`) of each other provider with this one. See
+            `reconcile_many_frames`.
+
+        Raises:
+            ValueError: If provider names aren't unique.
+        """
+        positions = [self, *others]
+        names = [p.provider_name for p in positions]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Provider names must be unique, got {names}")
+
+        return reconcile_many_frames(
+            frames=dict(zip(names, Position.load_all(positions))),
+            identifier=instrument_identifier,
             price_diff_threshold=price_diff_threshold,
             quantity_diff_threshold=quantity_diff_threshold,
+            breaks_only=breaks_only,
         )
 
-        return pl.concat([diff, new_diff]), new_left_only, new_right_only
 
-    @staticmethod
-    def _reconcile_dataframes(
-        left: pl.DataFrame,
-        right: pl.DataFrame,
-        l_suffix: str,
-        r_suffix: str,
-        instrument_identifier: str,
-        price_diff_threshold: float,
-        quantity_diff_threshold: float,
-    ) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
-        def _diff_col(col_name: str, l_suffix: str, r_suffix) -> pl.Expr:
-            return (
-                pl.col(f"{col_name}_{l_suffix}") - pl.col(f"{col_name}_{r_suffix}")
-            ).alias(f"{col_name}_diff")
-
-        left = left.filter(pl.col(f"{instrument_identifier}_{l_suffix}").is_not_null())
-        right = right.filter(
-            pl.col(f"{instrument_identifier}_{r_suffix}").is_not_null()
-        )
+class PositionRange:
+    """Positions of one provider over many dates, loaded and reconciled together.
 
-        diff = (
-            left.join(
-                other=right,
-                left_on=[
-                    f"account_id_{l_suffix}",
-                    f"{instrument_identifier}_{l_suffix}",
-                ],
-                right_on=[
-                    f"account_id_{r_suffix}",
-                    f"{instrument_identifier}_{r_suffix}",
-                ],
-                how="inner",
-                validate="1:1",
-                coalesce=False,
+    All dates share the same dataloader, and therefore its connections and
+    caches. The combined data is tagged with an `as_of_date` column, so that
+    reconciliation matches rows by date, account and identifier in a single join
+    rather than date by date.
+    """
+
+    def __init__(
+        self,
+        dataloader: PositionLoader,
+        dates: Iterable[dt.date],
+        provider_name: str = "custom",
+        accounts: list[str] | None = None,
+        skip_missing: bool = False,
+        max_workers: int | None = 8,
+        validation: ValidationMode = "full",
+        instrument_master: InstrumentMaster | None = None,
+    ):
+        self.dataloader = dataloader
+        self.dates = sorted(set(dates))
+        self.provider_name = provider_name
+        self.accounts = accounts
+        self.skip_missing = skip_missing
+        self.max_workers = max_workers
+
+        self.positions = [
+            Position(
+                dataloader=dataloader,
+                date=date,
+                provider_name=provider_name,
+                accounts=accounts,
+                validation=validation,
+                instrument_master=instrument_master,
             )
-            .with_columns(
-                _diff_col("price", l_suffix, r_suffix),
-                _diff_col("quantity", l_suffix, r_suffix),
-                (
-                    pl.col(f"local_ccy_{l_suffix}") == pl.col(f"local_ccy_{r_suffix}")
-                ).alias("same_ccy?"),
+            for date in self.dates
+        ]
+
+        self._data: pl.DataFrame | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self) -> pl.DataFrame:
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self._load()
+        return self._data
+
+    def _load(self) -> pl.DataFrame:
+        if not self.positions:
+            raise ValueError("No dates to load")
+
+        with ThreadPoolExecutor(
+            max_workers=min(
+                len(self.positions), self.max_workers or len(self.positions)
             )
-            .filter(
-                (pl.col("price_diff").abs() > price_diff_threshold)
-                | (pl.col("quantity_diff").abs() > quantity_diff_threshold)
-                | (~pl.col("same_ccy?"))
+        ) as executor:
+            futures = [executor.submit(lambda p: p.data, p) for p in self.positions]
+
+        frames = []
+        for position, future in zip(self.positions, futures):
+            try:
+                data = future.result()
+            except MissingDataError:
+                # e.g. no file on a holiday
+                if not self.skip_missing:
+                    raise
+                continue
+
+            frames.append(
+                data.select(pl.lit(position.date).alias("as_of_date"), pl.all())
+            )
+
+        if not frames:
+            raise MissingDataError(
+                f"No data for {self.provider_name} from {self.dates[0]} to {self.dates[-1]}"
+            )
+
+        return pl.concat(frames, how="vertical_relaxed")
+
+    def reconcile_with(
+        self,
+        other: "PositionRange",
+        instrument_identifier: InstrumentIdentifier | list[str] = "description",
+        fallback_identifier: InstrumentIdentifier | None = None,
+        price_diff_threshold: float = 0.01,
+        quantity_diff_threshold: float = 0,
+        state: ReconciliationState | None = None,
+        processes: int | None = None,
+        max_shard_bytes: int | None = None,
+    ) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+        """Compare positions between two providers on every date of the range.
+
+        Rows are matched on `as_of_date` as well as account and instrument, so
+        the arguments and results are the same as `Position.reconcile_with`,
+        with an extra `as_of_date_<provider>` column on each side. With a
+        `state`, a rolling window only reconciles its new dates and changed rows,
+        and with `processes`, shards of dates and accounts are reconciled in
+        parallel.
+        """
+        if other.provider_name == self.provider_name:
+            raise ValueError("`other` can't have the same `provider_name`")
+        if state is not None and processes is not None:
+            raise ValueError("`state` and `processes` can't be used together")
+
+        identifiers = _identifiers(instrument_identifier, fallback_identifier)
+
+        # load both sides concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            left, right = executor.map(lambda r: r.data, [self, other])
+
+        kwargs = {
+            "left": left,
+            "right": right,
+            "l_suffix": self.provider_name,
+            "r_suffix": other.provider_name,
+            "identifiers": identifiers,
+            "price_diff_threshold": price_diff_threshold,
+            "quantity_diff_threshold": quantity_diff_threshold,
+            "keys": ["as_of_date", "account_id"],
+        }
+        if processes is not None:
+            return reconcile_sharded(
+                **kwargs,  # type: ignore
+                max_workers=processes,
+                max_shard_bytes=max_shard_bytes,
             )
+        if state is not None:
+            return reconcile_incremental(**kwargs, state=state)  # type: ignore
+        return reconcile_frames(**kwargs)  # type: ignore
+
+
+class Trade:
+    """Trades of one provider over a window of dates, loaded and reconciled day by day.
+
+    Trades are far more numerous than positions, so a window is never loaded as a
+    whole: each business day is extracted, transformed and validated on its own
+    and, when reconciling, compared with the same day of the other provider while
+    the next day is already being loaded. At most two days of trades per provider
+    are held in memory, whatever the length of the window.
+    """
+
+    DATALOADER_CLASS_MAPPING: ClassVar[dict[str, type[TradeLoader]]] = {
+        "rjo": rjo.RjoTradeLoader,
+    }
+
+    def __init__(
+        self,
+        dataloader: TradeLoader,
+        start: dt.date,
+        end: dt.date,
+        provider_name: str = "custom",
+        accounts: list[str] | None = None,
+        skip_missing: bool = False,
+        validation: ValidationMode = "full",
+        instrument_master: InstrumentMaster | None = None,
+    ):
+        """
+        Args:
+            skip_missing: Treat days without data, e.g. holidays, as days without
+                trades instead of failing.
+            instrument_master: If given, every trade gets the canonical
+                `instrument_key` of its instrument, see `Position`.
+        """
+        if end < start:
+            raise ValueError(f"`end` {end} is before `start` {start}")
+
+        self.dataloader = dataloader
+        self.start = start
+        self.end = end
+        self.provider_name = provider_name
+        self.accounts = accounts
+        self.skip_missing = skip_missing
+        self.validation = validation
+        self.instrument_master = instrument_master
+
+    @classmethod
+    def from_config_file(
+        cls,
+        provider: Literal["rjo"],
+        config_filepath: str,
+        start: dt.date,
+        end: dt.date,
+        accounts: list[str] | None = None,
+        skip_missing: bool = False,
+        validation: ValidationMode = "full",
+        instrument_master: InstrumentMaster | None = None,
+    ):
+        return cls(
+            dataloader=_make_dataloader(
+                provider,
+                config_filepath,
+                Trade.DATALOADER_CLASS_MAPPING,
+                instrument_master,
+            ),
+            start=start,
+            end=end,
+            provider_name=provider,
+            accounts=accounts,
+            skip_missing=skip_missing,
+            validation=validation,
+            instrument_master=instrument_master,
         )
 
-        left_only = left.join(
-            other=right,
-            left_on=[f"account_id_{l_suffix}", f"{instrument_identifier}_{l_suffix}"],
-            right_on=[f"account_id_{r_suffix}", f"{instrument_identifier}_{r_suffix}"],
-            how="anti",
-            # rows without an identifier are also considered unmatched
-        ).vstack(left.filter(pl.col(f"{instrument_identifier}_{l_suffix}").is_null()))
-
-        # NOTE: now `right` uses `left_on`, and `left` uses `right_on`. Confusing!
-        right_only = right.join(
-            other=left,
-            right_on=[f"account_id_{l_suffix}", f"{instrument_identifier}_{l_suffix}"],
-            left_on=[f"account_id_{r_suffix}", f"{instrument_identifier}_{r_suffix}"],
-            how="anti",
-        ).vstack(right.filter(pl.col(f"{instrument_identifier}_{r_suffix}").is_null()))
-
-        return diff, left_only, right_only
+    @property
+    def dates(self) -> list[dt.date]:
+        return business_days(self.start, self.end)
+
+    def load_day(self, date: dt.date) -> pl.DataFrame:
+        """The standardized trades of a single day."""
+        with stage("trade.load", provider=self.provider_name, date=date) as s:
+            if isinstance(self.dataloader, LazyTradeLoader):
+                transformed = self.dataloader.transform_lazy(
+                    self.dataloader.scan(start=date, end=date, accounts=self.accounts)
+                ).collect()
+            else:
+                raw = self.dataloader.extract(
+                    start=date, end=date, accounts=self.accounts
+                )
+                transformed = self.dataloader.transform(raw)
+            if self.instrument_master is not None:
+                transformed = self.instrument_master.resolve(
+                    transformed,
+                    standard_id_columns(self.provider_name, transformed.columns),
+                )
+            s.set(rows_out=transformed.height)
+
+        with stage(
+            "trade.validate",
+            provider=self.provider_name,
+            date=date,
+            mode=self.validation,
+        ) as s:
+            s.set(rows_in=transformed.height)
+            return validate(transformed, TradeSchema, mode=self.validation)
+
+    def iter_days(self) -> Iterator[tuple[dt.date, pl.DataFrame]]:
+        """Yield the trades of each business day of the window in turn.
+
+        Days without data are skipped when `skip_missing` is set.
+        """
+        for date in self.dates:
+            data = self._load_day_or_none(date)
+            if data is not None:
+                yield date, data
+
+    def iter_reconcile_with(
+        self,
+        other: "Trade",
+        instrument_identifier: InstrumentIdentifier | list[str] = "description",
+        fallback_identifier: InstrumentIdentifier | None = None,
+        price_diff_threshold: float = 0.01,
+        quantity_diff_threshold: float = 0,
+    ) -> Iterator[tuple[dt.date, pl.DataFrame, pl.DataFrame, pl.DataFrame]]:
+        """Reconcile the window day by day, yielding `(date, diff, left_only, right_only)`.
+
+        Rows are matched on `trade_date`, account and instrument; see
+        `Position.reconcile_with` for the arguments and results. Both sides of the
+        next day are loaded while the current day is reconciled and consumed.
+        """
+        if other.provider_name == self.provider_name:
+            raise ValueError("`other` can't have the same `provider_name`")
+        if (other.start, other.end) != (self.start, self.end):
+            raise ValueError("`other` must cover the same window of dates")
+
+        identifiers = _identifiers(instrument_identifier, fallback_identifier)
+
+        dates = self.dates
+        with ThreadPoolExecutor(max_workers=2) as executor:
+
+            def submit(date: dt.date):
+                return (
+                    executor.submit(self._load_day_or_none, date),
+                    executor.submit(other._load_day_or_none, date),
+                )
+
+            pending = submit(dates[0]) if dates else None
+            for i, date in enumerate(dates):
+                left_future, right_future = pending  # type: ignore
+                pending = submit(dates[i + 1]) if i + 1 < len(dates) else None
+
+                left, right = left_future.result(), right_future.result()
+                if left is None and right is None:
+                    continue
+                # a day missing on one side only has no trades there
+                if left is None:
+                    left = right.clear()  # type: ignore
+                if right is None:
+                    right = left.clear()
+
+                yield (
+                    date,
+                    *reconcile_frames(
+                        left=left,
+                        right=right,
+                        l_suffix=self.provider_name,
+                        r_suffix=other.provider_name,
+                        identifiers=identifiers,
+                        price_diff_threshold=price_diff_threshold,
+                        quantity_diff_threshold=quantity_diff_threshold,
+                        keys=["trade_date", "account_id"],
+                    ),
+                )
+
+    def reconcile_with(
+        self,
+        other: "Trade",
+        instrument_identifier: InstrumentIdentifier | list[str] = "description",
+        fallback_identifier: InstrumentIdentifier | None = None,
+        price_diff_threshold: float = 0.01,
+        quantity_diff_threshold: float = 0,
+    ) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+        """Reconcile the whole window, see `iter_reconcile_with`.
+
+        Only the breaks of each day are kept, so memory grows with the number of
+        breaks rather than the number of trades.
+        """
+        diffs, left_onlys, right_onlys = [], [], []
+        for _, diff, left_only, right_only in self.iter_reconcile_with(
+            other,
+            instrument_identifier=instrument_identifier,
+            fallback_identifier=fallback_identifier,
+            price_diff_threshold=price_diff_threshold,
+            quantity_diff_threshold=quantity_diff_threshold,
+        ):
+            diffs.append(diff)
+            left_onlys.append(left_only)
+            right_onlys.append(right_only)
+
+        if not diffs:
+            raise MissingDataError(
+                f"No trades for {self.provider_name} or {other.provider_name} "
+                f"from {self.start} to {self.end}"
+            )
+
+        return (
+            pl.concat(diffs, how="vertical_relaxed"),
+            pl.concat(left_onlys, how="vertical_relaxed"),
+            pl.concat(right_onlys, how="vertical_relaxed"),
+        )
+
+    def reconcile_to(
+        self,
+        sink: ResultSink,
+        other: "Trade",
+        instrument_identifier: InstrumentIdentifier | list[str] = "description",
+        fallback_identifier: InstrumentIdentifier | None = None,
+        price_diff_threshold: float = 0.01,
+        quantity_diff_threshold: float = 0,
+        **tags: str,
+    ) -> None:
+        """Reconcile the window day by day, writing the results of each day to `sink`.
+
+        Nothing is kept in memory beyond the days being reconciled, whatever the
+        number of breaks. See `iter_reconcile_with` for the arguments, and
+        `ResultSink.write` for `tags`.
+        """
+        for date, *results in self.iter_reconcile_with(
+            other,
+            instrument_identifier=instrument_identifier,
+            fallback_identifier=fallback_identifier,
+            price_diff_threshold=price_diff_threshold,
+            quantity_diff_threshold=quantity_diff_threshold,
+        ):
+            sink.write(
+                tuple(results),  # type: ignore
+                left=self.provider_name,
+                right=other.provider_name,
+                date=date,
+                **tags,
+            )
+
+    def _load_day_or_none(self, date: dt.date) -> pl.DataFrame | None:
+        try:
+            return self.load_day(date)
+        except MissingDataError:
+            # e.g. no file on a holiday
+            if not self.skip_missing:
+                raise
+            return None
@@ -0,0 +1,67 @@
+"""
+The `novi-tally` command.
+
+    novi-tally run jobs.toml
+    novi-tally run jobs.toml --date 2025-01-31 --dry-run
+
+See `novi_tally.jobs` for the job file.
+"""
+
+import argparse
+import datetime as dt
+import logging
+import sys
+
+from novi_tally.jobs import Jobs
+from novi_tally.results import ResultStore
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="novi-tally")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="run the reconciliations of a job file"
+    )
+    run_parser.add_argument("jobs", help="path of the job file")
+    run_parser.add_argument(
+        "--date",
+        type=dt.date.fromisoformat,
+        action="append",
+        help="run on this date instead of the dates of the job file, repeatable",
+    )
+    run_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the loads and reconciliations without running them",
+    )
+    run_parser.add_argument("-v", "--verbose", action="store_true")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    jobs = Jobs.from_file(args.jobs)
+    if args.date:
+        jobs.dates = args.date
+
+    if args.dry_run:
+        for (provider, date), accounts in jobs.loads().items():
+            print(f"load {provider} on {date}: {', '.join(accounts)}")
+        for reconciliation in jobs.reconciliations():
+            print(f"reconcile {reconciliation}")
+        return 0
+
+    sink = ResultStore(jobs.output).sink(format=jobs.results_format)
+    print(f"run {sink.run_id}, results in {jobs.output}")
+    errors = jobs.run(sink)
+    for reconciliation, error in errors.items():
+        status = "ok" if error is None else f"failed: {error}"
+        print(f"{reconciliation}: {status}")
+    return 1 if any(error is not None for error in errors.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,22 @@
+import os
+import threading
 from typing import Any, Literal
 
 import tomllib
 
+from novi_tally.connections import async_file_systems as afss
 from novi_tally.connections import file_systems as fss
-from novi_tally.connections.openfigi import OpenFigiApi
+from novi_tally.connections.cache import (
+    AsyncCachedFileSystem,
+    CachedFileSystem,
+    ContentCache,
+    DiskCache,
+    MemoryCache,
+    TieredCache,
+)
 from novi_tally.connections.formidium import FormidiumApi
+from novi_tally.connections.openfigi import OpenFigiApi
+from novi_tally.errors import ConfigError
 
 
 def load_config(filepath: str) -> dict[str, Any]:
@@ -14,25 +26,84 @@ def load_config(filepath: str) -> dict[str, Any]:
     return parse_config(config)
 
 
+def make_cache(cache_config: dict[str, Any] | None) -> ContentCache:
+    cache_config = cache_config or {}
+
+    caches: list[ContentCache] = [
+        MemoryCache(max_bytes=cache_config.get("memory_max_bytes", 512 * 1024**2))
+    ]
+    if "directory" in cache_config:
+        caches.append(
+            DiskCache(
+                directory=cache_config["directory"],
+                max_bytes=cache_config.get("disk_max_bytes"),
+            )
+        )
+
+    return caches[0] if len(caches) == 1 else TieredCache(caches)
+
+
 def make_file_system(
-    fs_type: Literal["S3", "SFTP"], kwargs: dict[str, str]
+    fs_type: Literal["S3", "SFTP", "LOCAL"],
+    kwargs: dict[str, str],
+    cache_config: dict[str, Any] | None = None,
 ) -> fss.RemoteFileSystem:
     if fs_type == "S3":
         fs_cls = fss.S3FileSystem
     elif fs_type == "SFTP":
         fs_cls = fss.SftpFileSystem
+    elif fs_type == "LOCAL":
+        fs_cls = fss.LocalFileSystem
+    else:
+        raise ValueError(f"Unknown file system type: {fs_type}")
+
+    fs = fs_cls(**kwargs)
+    if cache_config is None:
+        # an uncached read doesn't need the fingerprint of the file (a HEAD or stat)
+        return fs
+    return CachedFileSystem(fs=fs, cache=make_cache(cache_config))
+
+
+def make_async_file_system(
+    fs_type: Literal["S3", "SFTP", "LOCAL"],
+    kwargs: dict[str, str],
+    cache_config: dict[str, Any] | None = None,
+) -> afss.AsyncRemoteFileSystem:
+    if fs_type == "S3":
+        fs = afss.AsyncS3FileSystem(**kwargs)  # type: ignore
+    elif fs_type == "SFTP":
+        fs = afss.AsyncSftpFileSystem(**kwargs)
+    elif fs_type == "LOCAL":
+        return afss.ThreadedAsyncFileSystem(
+            make_file_system("LOCAL", kwargs, cache_config=cache_config)
+        )
     else:
         raise ValueError(f"Unknown file system type: {fs_type}")
 
-    return fs_cls(**kwargs)
+    if cache_config is None:
+        return fs
+    return AsyncCachedFileSystem(fs=fs, cache=make_cache(cache_config))
 
 
 def parse_connection(
-    connection_type: str, kwargs: dict[str, str]
-) -> fss.RemoteFileSystem | OpenFigiApi | FormidiumApi:
+    connection_type: str,
+    kwargs: dict[str, str],
+    cache_config: dict[str, Any] | None = None,
+) -> fss.RemoteFileSystem | afss.AsyncRemoteFileSystem | OpenFigiApi | FormidiumApi:
     category, subtype = connection_type.split(".")
     if category == "FileSystem":
-        return make_file_system(fs_type=subtype, kwargs=kwargs)  # type: ignore
+        return make_file_system(
+            fs_type=subtype,  # type: ignore
+            kwargs=kwargs,
+            cache_config=cache_config,
+        )
+
+    if category == "AsyncFileSystem":
+        return make_async_file_system(
+            fs_type=subtype,  # type: ignore
+            kwargs=kwargs,
+            cache_config=cache_config,
+        )
 
     if subtype == "OPENFIGI":
         return OpenFigiApi(**kwargs)
@@ -48,7 +119,9 @@ def parse_config(config: dict[str, Any]) -> dict[str, Any]:
     connections = {}
     for c_name, c_config in config["connection"].items():
         connections[c_name] = parse_connection(
-            connection_type=c_config["type"], kwargs=c_config["kwargs"]
+            connection_type=c_config["type"],
+            kwargs=c_config["kwargs"],
+            cache_config=c_config.get("cache"),
         )
 
     # parse dataloader kwargs
@@ -64,3 +137,98 @@ def parse_config(config: dict[str, Any]) -> dict[str, Any]:
         dataloader_kwargs[p_name] = p_kwargs
 
     return dataloader_kwargs
+
+
+class ConnectionRegistry:
+    """Config files and connections shared by every dataloader of the process.
+
+    A config file is parsed once (and again only when it is modified), and a
+    connection is only created when a provider referencing it is first used.
+    Dataloaders of all positions then share the same clients and caches.
+    """
+
+    def __init__(self):
+        # path -> (modification time, raw config)
+        self._configs: dict[str, tuple[int, dict[str, Any]]] = {}
+        # (path, connection name, connection config) -> connection
+        self._connections: dict[tuple[str, str, str], Any] = {}
+        self._lock = threading.RLock()
+
+    def dataloader_kwargs(self, filepath: str, provider: str) -> dict[str, Any]:
+        """The dataloader kwargs of `provider`, with its connections.
+
+        Raises:
+            ConfigError: If the provider, or a connection it references, isn't
+                defined in the file.
+        """
+        path = os.path.realpath(os.path.expanduser(filepath))
+        with self._lock:
+            config = self._config(path)
+            provider_config = self._provider_config(config, provider, filepath)
+
+            dataloader_kwargs = {}
+            for k, v in provider_config.items():
+                if v["type"] == "connection":
+                    dataloader_kwargs[k] = self._connection(path, config, v["name"])
+                else:
+                    dataloader_kwargs[k] = v
+            return dataloader_kwargs
+
+    def connection_names(self, filepath: str, provider: str) -> list[str]:
+        """The names of the connections used by `provider`, without creating them.
+
+        Raises:
+            ConfigError: If the provider isn't defined in the file.
+        """
+        path = os.path.realpath(os.path.expanduser(filepath))
+        with self._lock:
+            provider_config = self._provider_config(
+                self._config(path), provider, filepath
+            )
+        return [
+            v["name"] for v in provider_config.values() if v["type"] == "connection"
+        ]
+
+    def clear(self) -> None:
+        """Forget all configs and connections, e.g. after rotating credentials."""
+        with self._lock:
+            self._configs.clear()
+            self._connections.clear()
+
+    def _config(self, path: str) -> dict[str, Any]:
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._configs.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, "rb") as f:
+                cached = self._configs[path] = (mtime, tomllib.load(f))
+        return cached[1]
+
+    @staticmethod
+    def _provider_config(
+        config: dict[str, Any], provider: str, filepath: str
+    ) -> dict[str, Any]:
+        try:
+            return config["provider"][provider]
+        except KeyError as e:
+            raise ConfigError(
+                f"No config found for provider {provider} in file {filepath}"
+            ) from e
+
+    def _connection(self, path: str, config: dict[str, Any], name: str) -> Any:
+        try:
+            c_config = config["connection"][name]
+        except KeyError as e:
+            raise ConfigError(f"No connection {name} in file {path}") from e
+
+        # a connection whose config was edited is created anew
+        key = (path, name, repr(c_config))
+        if key not in self._connections:
+            self._connections[key] = parse_connection(
+                connection_type=c_config["type"],
+                kwargs=c_config["kwargs"],
+                cache_config=c_config.get("cache"),
+            )
+        return self._connections[key]
+
+
+registry = ConnectionRegistry()
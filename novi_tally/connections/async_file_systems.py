@@ -0,0 +1,276 @@
+"""
+Asyncio counterparts of the file systems in `file_systems`.
+
+The native implementations need the optional `async` extra (`aiobotocore` for
+S3, `asyncssh` for SFTP), and are cached by `AsyncCachedFileSystem`. Any
+blocking `RemoteFileSystem`, e.g. a `CachedFileSystem`, can be used from asyncio
+with `ThreadedAsyncFileSystem`.
+"""
+
+import asyncio
+import inspect
+import io
+import re
+import threading
+import weakref
+from typing import Any, Protocol
+
+from novi_tally.connections.file_systems import RemoteFileSystem
+from novi_tally.errors import MissingDataError
+
+
+class AsyncRemoteFileSystem(Protocol):
+    async def read_bytes(self, path: str) -> bytes: ...
+
+
+class AsyncVersionedFileSystem(AsyncRemoteFileSystem, Protocol):
+    def uri(self, path: str) -> str:
+        """A location of `path` that is unique across file systems."""
+        ...
+
+    async def fingerprint(self, path: str) -> str:
+        """A value which changes whenever the content of `path` changes."""
+        ...
+
+
+class ThreadedAsyncFileSystem:
+    """Run the reads of a blocking file system on threads, `max_concurrency` at a time.
+
+    The limit applies per event loop, so the file system can be used by
+    successive `asyncio.run` calls, or by loops of several threads.
+    """
+
+    def __init__(self, fs: RemoteFileSystem, max_concurrency: int = 8):
+        self._fs = fs
+        self._max_concurrency = max_concurrency
+        # semaphores are bound to the loop they are first used on
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def fs(self) -> RemoteFileSystem:
+        return self._fs
+
+    async def read_bytes(self, path: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(
+                    self._max_concurrency
+                )
+
+        async with semaphore:
+            return await asyncio.to_thread(self._fs.read_bytes, path)
+
+
+def as_async(fs: RemoteFileSystem | AsyncRemoteFileSystem) -> AsyncRemoteFileSystem:
+    """Return `fs` if it is already asynchronous, or wrap it on threads."""
+    if inspect.iscoroutinefunction(fs.read_bytes):
+        return fs  # type: ignore
+    return ThreadedAsyncFileSystem(fs)  # type: ignore
+
+
+class AsyncS3FileSystem:
+    """S3 bucket read with `aiobotocore`, by parallel byte-range GETs.
+
+    Mirrors `S3FileSystem`. The client is created on the first read and bound to
+    the running event loop; `close` it when done.
+    """
+
+    def __init__(
+        self,
+        aws_access_key_id: str,
+        aws_secret_access_key: str,
+        bucket: str,
+        part_size: int = 8 * 1024**2,
+        max_concurrency: int = 8,
+    ):
+        try:
+            from aiobotocore.session import get_session
+        except ImportError as e:
+            raise ImportError(
+                "AsyncS3FileSystem requires aiobotocore: "
+                "pip install 'novi-tally[async]'"
+            ) from e
+
+        self._client_context = get_session().create_client(
+            "s3",
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+        )
+        self._client: Any = None
+        self._bucket = bucket
+        self._part_size = part_size
+        self._max_concurrency = max_concurrency
+
+    def uri(self, path: str) -> str:
+        return f"s3://{self._bucket}/{path}"
+
+    async def fingerprint(self, path: str) -> str:
+        from botocore.exceptions import ClientError
+
+        client = await self._get_client()
+        try:
+            head = await client.head_object(Bucket=self._bucket, Key=path)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("404", "NoSuchKey"):
+                raise MissingDataError(f"No data on S3: {self.uri(path)}") from e
+            raise ValueError(f"Failed to read {self.uri(path)}: {e}") from e
+
+        # the same as `S3FileSystem`, so both share cache entries
+        etag = head["ETag"].strip('"')
+        return f"{etag}-{head['ContentLength']}"
+
+    async def read_bytes(self, path: str) -> bytes:
+        from botocore.exceptions import ClientError
+
+        client = await self._get_client()
+        try:
+            first = await client.get_object(
+                Bucket=self._bucket, Key=path, Range=f"bytes=0-{self._part_size - 1}"
+            )
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code == "InvalidRange":
+                # an empty object has no byte 0
+                return b""
+            if code in ("404", "NoSuchKey"):
+                raise MissingDataError(f"No data on S3: {self.uri(path)}") from e
+            raise ValueError(f"Failed to read {self.uri(path)}: {e}") from e
+
+        size = int(re.sub(r".*/", "", first["ContentRange"]))
+        async with first["Body"] as body:
+            first_part = await body.read()
+        if size <= self._part_size:
+            return first_part
+
+        stream = io.BytesIO()
+        stream.seek(size - 1)
+        stream.write(b"\0")
+        buffer = stream.getbuffer()
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def download_part(offset: int) -> None:
+            part = buffer[offset : offset + self._part_size]
+            async with semaphore:
+                # `IfMatch` fails the download if the object changes between parts
+                response = await client.get_object(
+                    Bucket=self._bucket,
+                    Key=path,
+                    Range=f"bytes={offset}-{offset + len(part) - 1}",
+                    IfMatch=first["ETag"],
+                )
+                async with response["Body"] as body:
+                    part[:] = await body.read()
+
+        try:
+            buffer[: len(first_part)] = first_part
+            del first_part
+            await asyncio.gather(
+                *(
+                    download_part(offset)
+                    for offset in range(self._part_size, size, self._part_size)
+                )
+            )
+        except ClientError as e:
+            raise ValueError(f"Failed to read {self.uri(path)}: {e}") from e
+        finally:
+            buffer.release()
+
+        # without exported buffers, `getvalue` shares the memory of the stream
+        return stream.getvalue()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client_context.__aexit__(None, None, None)
+            self._client = None
+
+    async def _get_client(self) -> Any:
+        if self._client is None:
+            self._client = await self._client_context.__aenter__()
+        return self._client
+
+
+class AsyncSftpFileSystem:
+    """SFTP file system read with `asyncssh`.
+
+    A single SSH connection serves all reads, which are multiplexed over it. The
+    connection is opened on the first read and re-established once if the
+    server drops it.
+    """
+
+    def __init__(self, host: str, username: str, password: str):
+        try:
+            import asyncssh
+        except ImportError as e:
+            raise ImportError(
+                "AsyncSftpFileSystem requires asyncssh: pip install 'novi-tally[async]'"
+            ) from e
+
+        self._asyncssh = asyncssh
+        self._host = host
+        self._username = username
+        self._password = password
+
+        self._connection: Any = None
+        self._sftp: Any = None
+        self._lock: asyncio.Lock | None = None
+
+    def uri(self, path: str) -> str:
+        return f"sftp://{self._username}@{self._host}/{path}"
+
+    async def fingerprint(self, path: str) -> str:
+        try:
+            stat = await self._stat(await self._get_sftp(), path)
+        except (self._asyncssh.DisconnectError, ConnectionError):
+            await self.close()
+            stat = await self._stat(await self._get_sftp(), path)
+        # the same as `SftpFileSystem`, so both share cache entries
+        return f"{stat.mtime}-{stat.size}"
+
+    async def read_bytes(self, path: str) -> bytes:
+        try:
+            return await self._read(await self._get_sftp(), path)
+        except (self._asyncssh.DisconnectError, ConnectionError):
+            # the connection went stale while idle: retry once on a fresh one
+            await self.close()
+            return await self._read(await self._get_sftp(), path)
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            await self._connection.wait_closed()
+            self._connection = self._sftp = None
+
+    async def _read(self, sftp: Any, path: str) -> bytes:
+        try:
+            async with sftp.open(path, "rb") as f:
+                return await f.read()
+        except self._asyncssh.SFTPNoSuchFile as e:
+            raise MissingDataError(f"No data on SFTP: {self.uri(path)}") from e
+
+    async def _stat(self, sftp: Any, path: str) -> Any:
+        try:
+            return await sftp.stat(path)
+        except self._asyncssh.SFTPNoSuchFile as e:
+            raise MissingDataError(f"No data on SFTP: {self.uri(path)}") from e
+
+    async def _get_sftp(self) -> Any:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._sftp is None:
+                # same host key policy as `SftpFileSystem` (fabric): accept unknown hosts
+                self._connection = await self._asyncssh.connect(
+                    self._host,
+                    username=self._username,
+                    password=self._password,
+                    known_hosts=None,
+                )
+                self._sftp = await self._connection.start_sftp_client()
+        return self._sftp
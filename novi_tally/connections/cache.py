@@ -0,0 +1,302 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Protocol
+
+from novi_tally.connections.async_file_systems import AsyncVersionedFileSystem
+from novi_tally.connections.file_systems import VersionedFileSystem
+from novi_tally.instrumentation import stage
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_KEY_LOCK_STRIPES = 64
+
+
+@contextmanager
+def file_lock(path: str | os.PathLike) -> Iterator[None]:
+    """Hold an exclusive lock on `path` across processes.
+
+    Locking is advisory and only available on POSIX; elsewhere writers rely on
+    atomic renames alone.
+    """
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_atomic(path: str | os.PathLike, data: bytes) -> None:
+    """Write `data` to `path` so readers never see a partially written file."""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class ContentCache(Protocol):
+    def get(self, key: str) -> bytes | None: ...
+
+    def put(self, key: str, data: bytes) -> None: ...
+
+
+class MemoryCache:
+    """In-memory LRU cache bounded by the total size of its values."""
+
+    def __init__(self, max_bytes: int = 512 * 1024**2):
+        self._max_bytes = max_bytes
+        self._size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self._max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+
+            self._entries[key] = data
+            self._size += len(data)
+
+            while self._size > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class DiskCache:
+    """Compressed on-disk cache, safe to share between processes.
+
+    Entries are written atomically and the directory is locked while writing
+    and evicting, so several scheduled runs can use the same directory.
+    When `max_bytes` is set, the least recently used entries are evicted.
+    """
+
+    SUFFIX = ".zz"
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        max_bytes: int | None = None,
+        compression_level: int = 6,
+    ):
+        self._directory = Path(directory).expanduser()
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._compression_level = compression_level
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            compressed = path.read_bytes()
+            # mark as recently used for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        try:
+            return zlib.decompress(compressed)
+        except zlib.error:
+            # a corrupted entry is a cache miss
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        compressed = zlib.compress(data, self._compression_level)
+
+        with file_lock(self._directory / ".lock"):
+            write_atomic(self._path(key), compressed)
+
+            if self._max_bytes is not None:
+                self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self._directory / (
+            hashlib.sha256(key.encode()).hexdigest() + self.SUFFIX
+        )
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self._directory.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self._max_bytes:  # type: ignore
+                break
+            try:
+                path.unlink()
+            except OSError:
+                # still open by a reader on Windows, try again next time
+                continue
+            size -= entry_size
+
+
+class TieredCache:
+    """Look up caches in order, promoting hits to the faster tiers."""
+
+    def __init__(self, caches: list[ContentCache]):
+        self._caches = caches
+
+    def get(self, key: str) -> bytes | None:
+        for i, cache in enumerate(self._caches):
+            data = cache.get(key)
+            if data is not None:
+                for faster in self._caches[:i]:
+                    faster.put(key, data)
+                return data
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        for cache in self._caches:
+            cache.put(key, data)
+
+
+class CachedFileSystem:
+    """Wrap a file system so unchanged files are only downloaded once.
+
+    Cache entries are keyed by the file's location and its fingerprint
+    (e.g. the S3 ETag, or the SFTP mtime and size), so a changed file is
+    always downloaded again.
+    """
+
+    def __init__(self, fs: VersionedFileSystem, cache: ContentCache):
+        self._fs = fs
+        self._cache = cache
+
+        # a fixed set of locks, so that memory doesn't grow with the files read
+        self._key_locks = [threading.Lock() for _ in range(_KEY_LOCK_STRIPES)]
+
+    @property
+    def fs(self) -> VersionedFileSystem:
+        return self._fs
+
+    def uri(self, path: str) -> str:
+        return self._fs.uri(path)
+
+    def fingerprint(self, path: str) -> str:
+        return self._fs.fingerprint(path)
+
+    def read_bytes(self, path: str) -> bytes:
+        key = self._key(path)
+
+        # concurrent reads of the same file only download it once
+        with (
+            stage("fs.read", connection=self._fs.uri(""), path=path) as s,
+            self._key_lock(key),
+        ):
+            data = self._cache.get(key)
+            if data is None:
+                data = self._fs.read_bytes(path)
+                self._cache.put(key, data)
+                s.set(cache_misses=1, bytes=len(data))
+            else:
+                s.set(cache_hits=1, bytes=0)
+
+        return data
+
+    def read_many(self, paths: Iterable[str]) -> dict[str, bytes]:
+        paths = list(dict.fromkeys(paths))
+        keys = {path: self._key(path) for path in paths}
+
+        with stage("fs.read_many", connection=self._fs.uri("")) as s:
+            output = {}
+            for path in paths:
+                data = self._cache.get(keys[path])
+                if data is not None:
+                    output[path] = data
+
+            missing = [path for path in paths if path not in output]
+            s.set(cache_hits=len(output), cache_misses=len(missing), bytes=0)
+            if missing:
+                read_many = getattr(self._fs, "read_many", None)
+                if read_many is not None:
+                    fetched = read_many(missing)
+                else:
+                    fetched = {path: self._fs.read_bytes(path) for path in missing}
+
+                for path, data in fetched.items():
+                    self._cache.put(keys[path], data)
+                    output[path] = data
+                    s.add("bytes", len(data))
+
+        return {path: output[path] for path in paths}
+
+    def _key(self, path: str) -> str:
+        return f"{self._fs.uri(path)}@{self._fs.fingerprint(path)}"
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        # distinct files may share a lock, only serializing their downloads
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+
+class AsyncCachedFileSystem:
+    """The asyncio counterpart of `CachedFileSystem`.
+
+    Cache entries are keyed like those of `CachedFileSystem`, so a sync and an
+    async connection to the same files share the entries of a common disk cache.
+    Lookups run on threads, as a disk cache reads files.
+    """
+
+    def __init__(self, fs: AsyncVersionedFileSystem, cache: ContentCache):
+        self._fs = fs
+        self._cache = cache
+
+    @property
+    def fs(self) -> AsyncVersionedFileSystem:
+        return self._fs
+
+    def uri(self, path: str) -> str:
+        return self._fs.uri(path)
+
+    async def fingerprint(self, path: str) -> str:
+        return await self._fs.fingerprint(path)
+
+    async def read_bytes(self, path: str) -> bytes:
+        key = f"{self._fs.uri(path)}@{await self._fs.fingerprint(path)}"
+
+        with stage("fs.read", connection=self._fs.uri(""), path=path) as s:
+            data = await asyncio.to_thread(self._cache.get, key)
+            if data is None:
+                data = await self._fs.read_bytes(path)
+                await asyncio.to_thread(self._cache.put, key, data)
+                s.set(cache_misses=1, bytes=len(data))
+            else:
+                s.set(cache_hits=1, bytes=0)
+
+        return data
+
+    async def close(self) -> None:
+        close = getattr(self._fs, "close", None)
+        if close is not None:
+            await close()
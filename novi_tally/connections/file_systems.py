@@ -1,53 +1,278 @@
 import io
-from functools import lru_cache
-from typing import Protocol
+import queue
+import re
+import threading
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Protocol, TypeVar
 
 import boto3
 from botocore.client import BaseClient
 from botocore.exceptions import ClientError
 from fabric.connection import Connection
+from paramiko.sftp_attr import SFTPAttributes
+from paramiko.sftp_client import SFTPClient
+
+from novi_tally.errors import MissingDataError
+
+T = TypeVar("T")
 
 
 class RemoteFileSystem(Protocol):
     def read_bytes(self, path: str) -> bytes: ...
 
 
+class VersionedFileSystem(RemoteFileSystem, Protocol):
+    def uri(self, path: str) -> str:
+        """A location of `path` that is unique across file systems."""
+        ...
+
+    def fingerprint(self, path: str) -> str:
+        """A value which changes whenever the content of `path` changes."""
+        ...
+
+
+class LocalFileSystem:
+    """Files in a local directory, e.g. reports downloaded by hand."""
+
+    def __init__(self, root: str = "."):
+        self._root = Path(root).expanduser()
+
+    def uri(self, path: str) -> str:
+        return (self._root / path).resolve().as_uri()
+
+    def fingerprint(self, path: str) -> str:
+        try:
+            stat = (self._root / path).stat()
+        except FileNotFoundError as e:
+            raise MissingDataError(f"No data on local file system: {path}") from e
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def read_bytes(self, path: str) -> bytes:
+        try:
+            return (self._root / path).read_bytes()
+        except FileNotFoundError as e:
+            raise MissingDataError(f"No data on local file system: {path}") from e
+
+
 class S3FileSystem:
-    def __init__(self, aws_access_key_id: str, aws_secret_access_key: str, bucket: str):
+    """S3 bucket, read with parallel byte-range GETs.
+
+    Objects larger than `part_size` are downloaded in parts of `part_size` bytes
+    on up to `max_concurrency` threads, straight into a single preallocated
+    buffer, which is handed over without copying it.
+    """
+
+    def __init__(
+        self,
+        aws_access_key_id: str,
+        aws_secret_access_key: str,
+        bucket: str,
+        part_size: int = 8 * 1024**2,
+        max_concurrency: int = 8,
+    ):
         self._s3_client: BaseClient = boto3.client(
             "s3",
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
         )
         self._bucket = bucket
+        self._part_size = part_size
+        self._max_concurrency = max_concurrency
+
+    def uri(self, path: str) -> str:
+        return f"s3://{self._bucket}/{path}"
+
+    def fingerprint(self, path: str) -> str:
+        try:
+            head = self._s3_client.head_object(Bucket=self._bucket, Key=path)
+        except ClientError as e:
+            raise self._error(path, e) from e
+
+        etag = head["ETag"].strip('"')
+        return f"{etag}-{head['ContentLength']}"
 
-    @lru_cache
     def read_bytes(self, path: str) -> bytes:
-        with io.BytesIO() as stream:
-            try:
-                self._s3_client.download_fileobj(
-                    Bucket=self._bucket, Key=path, Fileobj=stream
-                )
-            except ClientError as e:
-                raise ValueError(
-                    f"No data on S3: key: {path}, bucket: {self._bucket}, msg: {e}"
-                ) from e
+        # the first part tells the size of the object
+        try:
+            first = self._get_range(path, 0, self._part_size)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "InvalidRange":
+                # an empty object has no byte 0
+                return b""
+            raise self._error(path, e) from e
+
+        size = int(re.sub(r".*/", "", first["ContentRange"]))
+        if size <= self._part_size:
+            return first["Body"].read()
 
-            stream.seek(0)
-            output = stream.read()
+        # growing the buffer to its final size once, its memory is filled in place
+        stream = io.BytesIO()
+        stream.seek(size - 1)
+        stream.write(b"\0")
+        buffer = stream.getbuffer()
+        try:
+            self._read_into(buffer[: self._part_size], first["Body"])
 
-            return output
+            offsets = range(self._part_size, size, self._part_size)
+            with ThreadPoolExecutor(max_workers=self._max_concurrency) as executor:
+                futures = [
+                    executor.submit(
+                        self._download_part,
+                        path,
+                        buffer[offset : offset + self._part_size],
+                        offset,
+                        first["ETag"],
+                    )
+                    for offset in offsets
+                ]
+                for future in futures:
+                    future.result()
+        except ClientError as e:
+            raise self._error(path, e) from e
+        finally:
+            buffer.release()
+
+        # without exported buffers, `getvalue` shares the memory of the stream
+        return stream.getvalue()
+
+    def _get_range(
+        self, path: str, offset: int, length: int, etag: str | None = None
+    ) -> dict:
+        kwargs = {"IfMatch": etag} if etag is not None else {}
+        return self._s3_client.get_object(
+            Bucket=self._bucket,
+            Key=path,
+            Range=f"bytes={offset}-{offset + length - 1}",
+            **kwargs,
+        )
+
+    def _download_part(
+        self, path: str, buffer: memoryview, offset: int, etag: str
+    ) -> None:
+        # `IfMatch` fails the download if the object changes between parts
+        response = self._get_range(path, offset, len(buffer), etag=etag)
+        self._read_into(buffer, response["Body"])
+
+    @staticmethod
+    def _read_into(buffer: memoryview, body, chunk_size: int = 1024**2) -> None:
+        position = 0
+        while position < len(buffer):
+            chunk = body.read(min(chunk_size, len(buffer) - position))
+            if not chunk:
+                raise ValueError(
+                    f"Incomplete S3 download: {position} of {len(buffer)} bytes"
+                )
+            buffer[position : position + len(chunk)] = chunk
+            position += len(chunk)
+        body.close()
+
+    def _error(self, path: str, e: ClientError) -> ValueError:
+        msg = f"No data on S3: key: {path}, bucket: {self._bucket}, msg: {e}"
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+            return MissingDataError(msg)
+        return ValueError(msg)
 
 
 class SftpFileSystem:
-    def __init__(self, host: str, username: str, password: str):
+    """SFTP file system backed by a pool of long-lived SSH sessions.
+
+    Sessions are opened on demand (up to `max_sessions` at a time), kept alive
+    between reads and transparently re-established when the server drops them.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        max_sessions: int = 4,
+        keepalive_interval: int = 30,
+    ):
         self._host = host
         self._username = username
         self._password = password
+        self._keepalive_interval = keepalive_interval
+
+        self._idle: queue.LifoQueue[Connection] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_sessions)
+
+    def uri(self, path: str) -> str:
+        return f"sftp://{self._username}@{self._host}/{path}"
+
+    def fingerprint(self, path: str) -> str:
+        stat = self._run(lambda sftp: self._stat(sftp, path))
+        return f"{stat.st_mtime}-{stat.st_size}"
 
-    @lru_cache
     def read_bytes(self, path: str) -> bytes:
-        with Connection(
+        return self._run(lambda sftp: self._read(sftp, path))
+
+    def read_many(self, paths: Iterable[str]) -> dict[str, bytes]:
+        """Read several files over a single SFTP session."""
+        paths = list(dict.fromkeys(paths))
+        return self._run(lambda sftp: {path: self._read(sftp, path) for path in paths})
+
+    def close(self) -> None:
+        """Close all idle sessions. New sessions are opened on the next read."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+
+    def _read(self, sftp: SFTPClient, path: str) -> bytes:
+        try:
+            f = sftp.open(path, "rb")
+        except FileNotFoundError as e:
+            raise MissingDataError(f"No data on SFTP: {self.uri(path)}") from e
+
+        with f:
+            # pipeline the read requests instead of waiting for each block in turn
+            f.prefetch()
+            return f.read()
+
+    def _stat(self, sftp: SFTPClient, path: str) -> SFTPAttributes:
+        try:
+            return sftp.stat(path)
+        except FileNotFoundError as e:
+            raise MissingDataError(f"No data on SFTP: {self.uri(path)}") from e
+
+    def _run(self, func: Callable[[SFTPClient], T]) -> T:
+        with self._slots:
+            conn = self._checkout()
+            try:
+                result = func(conn.sftp())
+            except Exception:
+                if conn.is_connected:
+                    # not a connection problem, e.g. a missing file
+                    self._idle.put(conn)
+                    raise
+                conn.close()
+                # the session went stale while idle: retry once on a fresh one
+                conn = self._connect()
+                try:
+                    result = func(conn.sftp())
+                except Exception:
+                    conn.close()
+                    raise
+
+            self._idle.put(conn)
+            return result
+
+    def _checkout(self) -> Connection:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if conn.is_connected:
+                return conn
+            conn.close()
+
+    def _connect(self) -> Connection:
+        conn = Connection(
             host=self._host,
             user=self._username,
             connect_kwargs={
@@ -55,7 +280,7 @@ class SftpFileSystem:
                 "allow_agent": False,
                 "look_for_keys": False,
             },
-        ) as conn:
-            sftp = conn.sftp()
-            with sftp.file(path, "r") as f:
-                return f.read()
+        )
+        conn.open()
+        conn.transport.set_keepalive(self._keepalive_interval)
+        return conn
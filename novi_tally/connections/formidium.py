@@ -1,14 +1,31 @@
 import datetime as dt
+import threading
+import time
+from collections import defaultdict
+
 from formidium import Api
 
+from novi_tally.instrumentation import stage
+
+_DATE_LOCK_STRIPES = 16
+
 
 class FormidiumApi:
+    """Formidium API client, with a cache of position responses.
+
+    Responses are cached by date and funds for `cache_ttl` seconds (forever if
+    None, not at all if 0). A cached response for several funds also serves
+    requests for any of them, so fetching all funds of interest at once with
+    `read_positions_many` makes one request per date for a whole run.
+    """
+
     def __init__(
         self,
         api_key: str,
         passphrase: str,
         api_secret: str,
         base_url: str = "https://api.formidium.com",
+        cache_ttl: float | None = 600,
     ) -> None:
         self.api = Api(
             api_key=api_key,
@@ -16,10 +33,59 @@ class FormidiumApi:
             api_secret=api_secret,
             base_url=base_url,
         )
+        self._cache_ttl = cache_ttl
+        # date -> [(funds, fetched at, response)]
+        self._cache: dict[dt.date, list[tuple[frozenset[str], float, dict]]] = (
+            defaultdict(list)
+        )
+        # one request at a time per date, so concurrent loaders share it. A fixed
+        # set of locks, so that memory doesn't grow with the dates requested
+        self._date_locks = [threading.Lock() for _ in range(_DATE_LOCK_STRIPES)]
+        self._lock = threading.Lock()
 
     def read_positions(self, date: dt.date, fund_name: str) -> dict:
-        data = self.api.positions(
-            fund_names=[fund_name],
-            date=date,
-        )
-        return data
+        """The positions of a fund on `date`.
+
+        The response may also hold the positions of other funds fetched
+        together with it; filter the result by account.
+        """
+        return self.read_positions_many(date=date, fund_names=[fund_name])
+
+    def read_positions_many(self, date: dt.date, fund_names: list[str]) -> dict:
+        """The positions of several funds on `date`, in a single request.
+
+        The response may also hold the positions of other funds fetched
+        together with them; filter the result by account.
+        """
+        funds = frozenset(fund_names)
+        date_lock = self._date_locks[hash(date) % len(self._date_locks)]
+
+        with date_lock, stage("formidium.read_positions", date=date) as s:
+            cached = self._cached(date, funds)
+            if cached is not None:
+                s.set(cache_hits=1)
+                return cached
+
+            s.set(cache_misses=1)
+            data = self.api.positions(fund_names=sorted(funds), date=date)
+            if self._cache_ttl != 0:
+                with self._lock:
+                    # a superset replaces the responses it covers
+                    self._cache[date] = [
+                        entry for entry in self._cache[date] if not entry[0] <= funds
+                    ]
+                    self._cache[date].append((funds, time.monotonic(), data))
+            return data
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _cached(self, date: dt.date, funds: frozenset[str]) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            for cached_funds, fetched_at, data in self._cache.get(date, []):
+                fresh = self._cache_ttl is None or now - fetched_at < self._cache_ttl
+                if fresh and funds <= cached_funds:
+                    return data
+        return None
@@ -1,10 +1,99 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Iterable
 
 import requests
 
+from novi_tally.connections.cache import file_lock, write_atomic
+from novi_tally.instrumentation import stage
+
 BASE_URL = "https://api.openfigi.com"
 VERSION = "v3"
 
+# https://www.openfigi.com/api#rate-limit
+MAX_JOBS_PER_REQUEST = 100
+MAX_JOBS_PER_REQUEST_WITHOUT_KEY = 10
+REQUESTS_PER_SECOND = 25 / 6
+REQUESTS_PER_SECOND_WITHOUT_KEY = 25 / 60
+
+
+class TokenBucket:
+    """Thread-safe token bucket: allows bursts of `capacity`, refilled at `rate`/s."""
+
+    def __init__(self, rate: float, capacity: int):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity, self._tokens + (now - self._updated_at) * self._rate
+                )
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self._rate
+
+            time.sleep(wait)
+
+
+class FigiMappingCache:
+    """A local file of BB global ID -> BBG yellow mappings, shared by processes.
+
+    Mappings older than `ttl_days` are considered missing. IDs which OpenFIGI
+    could not map are remembered as well, so they are not requested every day.
+    """
+
+    def __init__(self, path: str | os.PathLike, ttl_days: float = 30):
+        self._path = Path(path).expanduser()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._ttl = ttl_days * 24 * 3600
+
+    def get_many(self, bb_globals: Iterable[str]) -> dict[str, str | None]:
+        """Return fresh entries only; unmappable IDs are mapped to None."""
+        entries = self._load()
+        expired_before = time.time() - self._ttl
+
+        output = {}
+        for bb_global in bb_globals:
+            entry = entries.get(bb_global)
+            if entry is not None and entry["fetched_at"] >= expired_before:
+                output[bb_global] = entry["bbg_yellow"]
+        return output
+
+    def update(self, mapping: dict[str, str | None]) -> None:
+        if not mapping:
+            return
+
+        fetched_at = time.time()
+        with file_lock(self._path.with_name(self._path.name + ".lock")):
+            # merge with entries written by other processes in the meantime
+            entries = self._load()
+            for bb_global, bbg_yellow in mapping.items():
+                entries[bb_global] = {
+                    "bbg_yellow": bbg_yellow,
+                    "fetched_at": fetched_at,
+                }
+            write_atomic(self._path, json.dumps(entries).encode())
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            return json.loads(self._path.read_bytes())
+        except FileNotFoundError:
+            return {}
+
 
 class OpenFigiApi:
     def __init__(
@@ -12,35 +101,114 @@ class OpenFigiApi:
         api_key: str,
         version: str = "v3",
         base_url: str = BASE_URL,
+        cache_path: str | None = None,
+        cache_ttl_days: float = 30,
+        max_workers: int = 4,
+        max_retries: int = 5,
     ) -> None:
         self._header = {
             "Content-Type": "text/json",
             "X-OPENFIGI-APIKEY": api_key,
         }
         self._url = f"{base_url}/{version}"
+        self._session = requests.Session()
+
+        if api_key:
+            self._max_jobs = MAX_JOBS_PER_REQUEST
+            self._limiter = TokenBucket(rate=REQUESTS_PER_SECOND, capacity=25)
+        else:
+            self._max_jobs = MAX_JOBS_PER_REQUEST_WITHOUT_KEY
+            self._limiter = TokenBucket(
+                rate=REQUESTS_PER_SECOND_WITHOUT_KEY, capacity=25
+            )
+        self._max_workers = max_workers
+        self._max_retries = max_retries
+
+        self._cache = (
+            FigiMappingCache(cache_path, ttl_days=cache_ttl_days)
+            if cache_path
+            else None
+        )
 
     def map_jobs(
         self, jobs: list[dict[str, str]]
     ) -> list[dict[str, list[dict[str, str]]]]:
-        response = requests.post(
-            url=f"{self._url}/mapping/",
-            json=jobs,
-            headers=self._header,
-        )
+        attempt = 0
+        while True:
+            self._limiter.acquire()
+            response = self._session.post(
+                url=f"{self._url}/mapping/",
+                json=jobs,
+                headers=self._header,
+            )
+
+            if response.status_code == 429 and attempt < self._max_retries:
+                time.sleep(2**attempt)
+                attempt += 1
+                continue
 
-        if response.status_code != 200:
-            raise Exception("Bad response code {}".format(str(response.status_code)))
-        return response.json()
+            if response.status_code != 200:
+                raise Exception(
+                    "Bad response code {}".format(str(response.status_code))
+                )
+            return response.json()
 
     def get_bbg_mapping_table(self, bb_globals: Iterable[str]) -> dict[str, str]:
-        """Get a mapping table from BB globals to BBG yellows."""
+        """Get a mapping table from BB globals to BBG yellows.
+
+        Mappings found in the local cache are not requested again. The others are
+        requested in batches of OpenFIGI's job limit, concurrently, within its rate
+        limit.
+        """
+        bb_globals = list(dict.fromkeys(b for b in bb_globals if b))
+
+        with stage("openfigi.map") as s:
+            mapping: dict[str, str | None] = (
+                self._cache.get_many(bb_globals) if self._cache is not None else {}
+            )
+
+            missing = [b for b in bb_globals if b not in mapping]
+            s.set(
+                rows_in=len(bb_globals),
+                cache_hits=len(mapping),
+                cache_misses=len(missing),
+                requests=-(-len(missing) // self._max_jobs),
+            )
+            if missing:
+                batches = [
+                    missing[i : i + self._max_jobs]
+                    for i in range(0, len(missing), self._max_jobs)
+                ]
+                with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                    fetched: dict[str, str | None] = {}
+                    for batch_mapping in executor.map(self._map_bb_globals, batches):
+                        fetched.update(batch_mapping)
+
+                if self._cache is not None:
+                    self._cache.update(fetched)
+                mapping.update(fetched)
+
+            mapped = {k: v for k, v in mapping.items() if v is not None}
+            s.set(rows_out=len(mapped))
+            return mapped
+
+    def _map_bb_globals(self, bb_globals: list[str]) -> dict[str, str | None]:
         jobs = [
             {"idType": "ID_BB_GLOBAL", "idValue": bb_global} for bb_global in bb_globals
         ]
         job_responses = self.map_jobs(jobs)
 
-        mapping_table = dict()
-        for r in job_responses:
+        # responses are in the same order as the jobs
+        mapping_table: dict[str, str | None] = {}
+        for bb_global, r in zip(bb_globals, job_responses):
+            if "error" in r:
+                # e.g. an invalid request: don't remember it
+                continue
+            if not r.get("data"):
+                # no instrument found for this ID
+                mapping_table[bb_global] = None
+                continue
+
             d = r["data"][0]
             if d["marketSector"] == "Equity":
                 bbg_yellow = f"{d['ticker']} {d['exchCode']} {d['marketSector']}"
@@ -48,6 +216,6 @@ class OpenFigiApi:
                 bbg_yellow = f"{d['securityDescription']} {d['marketSector']}"
             else:
                 bbg_yellow = f"{d['ticker']} {d['marketSector']}"
-            mapping_table[d["figi"]] = bbg_yellow
+            mapping_table[bb_global] = bbg_yellow
 
         return mapping_table
@@ -2,22 +2,36 @@ import datetime as dt
 
 import polars as pl
 
+from novi_tally.connections.async_file_systems import AsyncRemoteFileSystem, as_async
 from novi_tally.connections.file_systems import RemoteFileSystem
 from novi_tally.connections.openfigi import OpenFigiApi
 
 
 class EnfusionLoaderBase:
-    def __init__(self, fs: RemoteFileSystem):
+    def __init__(self, fs: RemoteFileSystem, afs: AsyncRemoteFileSystem | None = None):
         self._fs = fs
+        self._afs = afs if afs is not None else as_async(fs)
 
 
 class EnfusionPositionLoader(EnfusionLoaderBase):
     def extract(self, date: dt.date, accounts: list[str] | None = None) -> pl.DataFrame:
-        path = f"daily_positions/paf_1_dailyposition_{date:%Y%m%d}.csv"
+        return self.scan(date, accounts).collect()
 
-        data = self._fs.read_bytes(path)
+    async def aextract(
+        self, date: dt.date, accounts: list[str] | None = None
+    ) -> pl.DataFrame:
+        data = await self._afs.read_bytes(self._path(date))
+        return await self._parse(data, accounts).collect_async()
+
+    def scan(self, date: dt.date, accounts: list[str] | None = None) -> pl.LazyFrame:
+        return self._parse(self._fs.read_bytes(self._path(date)), accounts)
+
+    def _path(self, date: dt.date) -> str:
+        return f"daily_positions/paf_1_dailyposition_{date:%Y%m%d}.csv"
+
+    def _parse(self, data: bytes, accounts: list[str] | None) -> pl.LazyFrame:
         raw = (
-            pl.read_csv(
+            pl.scan_csv(
                 data,
                 schema_overrides={
                     "Deal Id": pl.String,
@@ -37,7 +51,8 @@ class EnfusionPositionLoader(EnfusionLoaderBase):
                     # RJO' Brien Bank A/c: 791 30014
                     # RJO' Brien Bank A/c: 791 30013 - F1
                     # RJO' Brien Bank A/c: 791-30012 - F1 (are you kidding me..?)
-                    pl.when(pl.col("Account").str.starts_with("RJO")).then(
+                    pl.when(pl.col("Account").str.starts_with("RJO"))
+                    .then(
                         pl.col("Account")
                         .str.split(" - ")
                         .list.get(0)
@@ -57,8 +72,11 @@ class EnfusionPositionLoader(EnfusionLoaderBase):
 
         return raw
 
-    # Not sure about if Native Average Cost maps to the cost_price in local currency
     def transform(self, raw: pl.DataFrame) -> pl.DataFrame:
+        return self.transform_lazy(raw.lazy()).collect()
+
+    # Not sure about if Native Average Cost maps to the cost_price in local currency
+    def transform_lazy(self, raw: pl.LazyFrame) -> pl.LazyFrame:
         return (
             raw.filter(pl.col("BB Yellow Key").is_not_null())
             .group_by("account_id", "BB Yellow Key")
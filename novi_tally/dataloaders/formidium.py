@@ -1,4 +1,14 @@
+import asyncio
 import datetime as dt
+import functools
+import glob
+import hashlib
+import multiprocessing
+import os
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import polars as pl
 
 from novi_tally.connections.formidium import FormidiumApi
@@ -44,6 +54,24 @@ class FormidiumAPIPositionLoader(FormidiumLoaderBase):
                     return fund_name
         return ""
 
+    def _get_fund_names(self, accounts: list[str]) -> list[str]:
+        """All known funds, and the fund of `accounts` if it isn't one of them.
+
+        Every position of a run on the same date then shares one request.
+        """
+        fund_names = list(self.FUNDNAMES)
+        fund_name = self._get_fund_name(accounts)
+        # accounts of no known fund don't add an empty fund to the request
+        if fund_name and fund_name not in fund_names:
+            fund_names.append(fund_name)
+        return fund_names
+
+    async def aextract(
+        self, date: dt.date, accounts: list[str] | None = None
+    ) -> pl.DataFrame:
+        # the Formidium client is blocking
+        return await asyncio.to_thread(self.extract, date, accounts)
+
     def extract(self, date: dt.date, accounts: list[str] | None = None) -> pl.DataFrame:
         if accounts is None:
             return pl.DataFrame()
@@ -53,9 +81,8 @@ class FormidiumAPIPositionLoader(FormidiumLoaderBase):
             "Interactive Brokers": Broker.IB,
         }
 
-        fund_name = self._get_fund_name(accounts)
-        data = self._formidium_api.read_positions(
-            fund_name=fund_name,
+        data = self._formidium_api.read_positions_many(
+            fund_names=self._get_fund_names(accounts),
             date=date,
         )
         raw = (
@@ -120,9 +147,118 @@ class FormidiumAPIPositionLoader(FormidiumLoaderBase):
         return transformed
 
 
+# the columns of the NAV report used by `FormidiumPositionLoader`
+NAV_REPORT_COLUMNS = [
+    "Account",
+    "Symbol",
+    "Security",
+    "Quantity",
+    "MP",
+    "Unit Cost (LC)",
+    "CCY",
+    "Asset Class",
+]
+
+
+def _digest(path: Path) -> str:
+    stat = path.stat()
+    return _file_digest(str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+# keyed by (path, mtime, size), so unchanged files aren't hashed again
+@functools.lru_cache(maxsize=1024)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()[:16]
+
+
+def _sidecar_prefix(path: Path, sidecar_dir: str | Path | None) -> Path:
+    """The sidecars of `path` start with this, whatever the workbook's content.
+
+    Includes a hash of the resolved path, so that same-named reports of
+    different directories sharing a `sidecar_dir` don't clash.
+    """
+    directory = Path(sidecar_dir).expanduser() if sidecar_dir else path.parent
+    location = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:8]
+    return directory / f".{path.name}.{location}"
+
+
+def _sidecar_path(path: Path, sidecar_dir: str | Path | None) -> Path:
+    prefix = _sidecar_prefix(path, sidecar_dir)
+    return prefix.with_name(f"{prefix.name}.{_digest(path)}.parquet")
+
+
+def read_nav_report(
+    filepath: str | Path, sidecar_dir: str | Path | None = None
+) -> pl.DataFrame:
+    """The used columns of a Formidium NAV report, through a Parquet sidecar.
+
+    Parsing Excel is slow, so the first read writes the table to a sidecar
+    file, named after the hash of the workbook and of its path, next to the
+    report (or in `sidecar_dir`). Later reads of the same workbook read the
+    sidecar instead; a modified workbook gets a new sidecar, replacing the
+    sidecars of its earlier versions.
+    """
+    path = Path(filepath).expanduser()
+    sidecar = _sidecar_path(path, sidecar_dir)
+    if sidecar.exists():
+        return pl.read_parquet(sidecar)
+
+    table = pl.read_excel(
+        path, read_options={"header_row": 3}, columns=NAV_REPORT_COLUMNS
+    )
+
+    try:
+        prefix = _sidecar_prefix(path, sidecar_dir)
+        for stale in prefix.parent.glob(f"{glob.escape(prefix.name)}.*.parquet"):
+            stale.unlink(missing_ok=True)
+        staging = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+        table.write_parquet(staging)
+        os.replace(staging, sidecar)
+    except OSError:
+        # e.g. a read-only directory: still return the table
+        pass
+
+    return table
+
+
+def convert_nav_reports(
+    filepaths: Iterable[str | Path],
+    sidecar_dir: str | Path | None = None,
+    max_workers: int | None = None,
+) -> None:
+    """Write the Parquet sidecars of many NAV reports on a process pool.
+
+    Excel parsing is CPU-bound, so e.g. a month of reports is converted in
+    parallel ahead of a backfill. See `read_nav_report`. Workers are spawned, so
+    scripts calling it need an `if __name__ == "__main__":` guard.
+    """
+    filepaths = list(filepaths)
+    # Polars' thread pool doesn't survive a fork
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        for future in [
+            executor.submit(_convert_nav_report, path, sidecar_dir)
+            for path in filepaths
+        ]:
+            future.result()
+
+
+def _convert_nav_report(filepath: str | Path, sidecar_dir: str | Path | None) -> None:
+    # the table isn't sent back to the parent process
+    read_nav_report(filepath, sidecar_dir)
+
+
 class FormidiumPositionLoader:
-    def __init__(self, filepath: str):
+    """Positions from a Formidium NAV report workbook.
+
+    The report is read through a Parquet sidecar, see `read_nav_report`.
+    """
+
+    def __init__(self, filepath: str, sidecar_dir: str | None = None):
         self._filepath = filepath
+        self._sidecar_dir = sidecar_dir
 
     def extract(self, date: dt.date, accounts: list[str] | None = None) -> pl.DataFrame:
         broker_names = {
@@ -130,7 +266,7 @@ class FormidiumPositionLoader:
             "Interactive Brokers": Broker.IB,
         }
         raw = (
-            pl.read_excel(self._filepath, read_options={"header_row": 3})
+            read_nav_report(self._filepath, self._sidecar_dir)
             .filter(pl.col("Symbol").str.len_chars() > 0)
             .with_columns(
                 pl.col("Account")
@@ -2,21 +2,49 @@ import datetime as dt
 
 import polars as pl
 
+from novi_tally.connections.async_file_systems import AsyncRemoteFileSystem, as_async
 from novi_tally.connections.file_systems import RemoteFileSystem
 from novi_tally.connections.openfigi import OpenFigiApi
+from novi_tally.instruments import InstrumentMaster
 
 
 class IbLoaderBase:
-    def __init__(self, fs: RemoteFileSystem, openfigi_api: OpenFigiApi):
+    def __init__(
+        self,
+        fs: RemoteFileSystem,
+        openfigi_api: OpenFigiApi,
+        afs: AsyncRemoteFileSystem | None = None,
+        instrument_master: InstrumentMaster | None = None,
+    ):
+        """
+        Args:
+            instrument_master: If given, BB global IDs are mapped to BBG yellows
+                with it, and only those it doesn't know are requested from
+                OpenFIGI. The mappings found there are registered in it.
+        """
         self._fs = fs
+        self._afs = afs if afs is not None else as_async(fs)
         self._openfigi_api = openfigi_api
+        self._instrument_master = instrument_master
 
 
 class IbPositionLoader(IbLoaderBase):
     def extract(self, date: dt.date, accounts: list[str] | None = None) -> pl.DataFrame:
-        path = f"IB/F5678557_Position_{date:%Y%m%d}.csv"
-        data = self._fs.read_bytes(path)
+        return self.scan(date, accounts).collect()
 
+    async def aextract(
+        self, date: dt.date, accounts: list[str] | None = None
+    ) -> pl.DataFrame:
+        data = await self._afs.read_bytes(self._path(date))
+        return await self._parse(data, accounts).collect_async()
+
+    def scan(self, date: dt.date, accounts: list[str] | None = None) -> pl.LazyFrame:
+        return self._parse(self._fs.read_bytes(self._path(date)), accounts)
+
+    def _path(self, date: dt.date) -> str:
+        return f"IB/F5678557_Position_{date:%Y%m%d}.csv"
+
+    def _parse(self, data: bytes, accounts: list[str] | None) -> pl.LazyFrame:
         filters = [
             pl.col("Type") == "D",
             pl.col("AssetType").is_not_null(),
@@ -28,11 +56,16 @@ class IbPositionLoader(IbLoaderBase):
         if accounts is not None:
             filters.append(pl.col("AccountID").is_in(accounts))
 
-        raw = pl.read_csv(data, skip_rows=1, ignore_errors=True).filter(filters)
+        raw = pl.scan_csv(data, skip_rows=1, ignore_errors=True).filter(filters)
 
         return raw
 
     def transform(self, raw: pl.DataFrame) -> pl.DataFrame:
+        return self.transform_lazy(raw.lazy()).collect()
+
+    def transform_lazy(self, raw: pl.LazyFrame) -> pl.LazyFrame:
+        # the aggregated positions are materialized here, as mapping their BB
+        # global IDs to BBG yellows may need a request to OpenFIGI
         transformed = (
             raw.filter(
                 pl.col("SecurityDescription").is_not_null(),
@@ -43,14 +76,14 @@ class IbPositionLoader(IbLoaderBase):
                 pl.col("MarketPrice").first().alias("price"),
                 pl.col("CostPrice").first().alias("cost_price_lc"),
                 pl.col("Currency").first().alias("local_ccy"),
-                pl.col("BBGlobalID").first(),
+                pl.col("BBGlobalID").first().alias("figi"),
                 pl.col("AssetType").first().alias("asset_type"),
                 pl.col("Multiplier").first().alias("multiplier"),
             )
             .select(
                 pl.col("AccountID").alias("account_id"),
                 pl.col("SecurityDescription").alias("description"),
-                pl.col("BBGlobalID"),
+                pl.col("figi"),
                 pl.col("quantity"),
                 pl.col("price"),
                 pl.col("local_ccy"),
@@ -58,17 +91,35 @@ class IbPositionLoader(IbLoaderBase):
                 pl.col("cost_price_lc"),
                 pl.col("multiplier"),
             )
+            .collect()
         )
 
-        mapping_table = self._openfigi_api.get_bbg_mapping_table(
-            transformed["BBGlobalID"]
+        figis = transformed["figi"]
+        mapping_table = self._known_bbg_yellows(figis)
+        fetched = self._openfigi_api.get_bbg_mapping_table(
+            figi for figi in figis if figi not in mapping_table
         )
+        mapping_table.update(fetched)
 
         transformed = transformed.with_columns(
-            pl.col("BBGlobalID")
-            .replace(mapping_table)
-            .str.to_uppercase()
-            .alias("bbg_yellow")
-        ).drop("BBGlobalID")
+            pl.col("figi").replace(mapping_table).str.to_uppercase().alias("bbg_yellow")
+        )
+
+        if self._instrument_master is not None and fetched:
+            self._instrument_master.register(
+                transformed.filter(pl.col("figi").is_in(list(fetched))),
+                {"figi": "figi", "bbg_yellow": "bbg_yellow"},
+            )
+
+        return transformed.lazy()
 
-        return transformed
+    def _known_bbg_yellows(self, figis: pl.Series) -> dict[str, str]:
+        if self._instrument_master is None:
+            return {}
+        known = self._instrument_master.translate(figis, "figi", "bbg_yellow")
+        # unmapped BB global IDs are their own BBG yellow: try OpenFIGI again
+        return {
+            figi: bbg_yellow
+            for figi, bbg_yellow in known.items()
+            if bbg_yellow != figi.upper()
+        }
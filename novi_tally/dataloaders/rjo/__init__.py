@@ -1,3 +1,3 @@
-from .loaders import RjoPositionLoader
+from .loaders import RjoPositionLoader, RjoTradeLoader
 
-__all__ = ["RjoPositionLoader"]
+__all__ = ["RjoPositionLoader", "RjoTradeLoader"]
@@ -1,114 +1,179 @@
 import datetime as dt
-from typing import Any
+from typing import TypeVar
 
 import polars as pl
 
+from novi_tally.connections.async_file_systems import AsyncRemoteFileSystem, as_async
 from novi_tally.connections.file_systems import RemoteFileSystem
+from novi_tally.dates import business_days
+from novi_tally.errors import MissingDataError
 
 from . import headers
 
+FrameT = TypeVar("FrameT", pl.DataFrame, pl.LazyFrame)
 
-def make_bloomberg_yellow_code(row: dict[str, Any]) -> str:
-    description = row["Security_desc_line_1"]
-    bloomberg_root = row["bloomberg_root"]
-    bloomberg_market_sector = row["bloomberg_market_sector"]
-    contract_month = row["Contract_month"]
-
-    month_to_code = {
-        "01": "F",
-        "02": "G",
-        "03": "H",
-        "04": "J",
-        "05": "K",
-        "06": "M",
-        "07": "N",
-        "08": "Q",
-        "09": "U",
-        "10": "V",
-        "11": "X",
-        "12": "Z",
-    }
-
-    if description.endswith("SCM TSR20RUBBR"):
-        bloomberg_root = "OR"
-        bloomberg_market_sector = "Comdty"
-    elif description.endswith("LME NICKEL US"):
-        bloomberg_root = "LN"
-        bloomberg_market_sector = "Comdty"
-    elif description.endswith("CME LUMBER FUT"):
-        bloomberg_root = "LBO"
-        bloomberg_market_sector = "Comdty"
-    # HACK: Temporary fix for RJO wrong symbol
-    elif bloomberg_root == "NZ" and bloomberg_market_sector == "Index":
-        bloomberg_root = "JGS"
-    elif bloomberg_root == "AL" and bloomberg_market_sector == "Comdty":
-        bloomberg_root = "ALE"
-    elif description.endswith("ICE UKA FUT"):
-        bloomberg_root = "UKE"
-        bloomberg_market_sector = "Comdty"
-    elif description.endswith("EUX FDXS FUT"):
-        bloomberg_root = "MZS"
-        bloomberg_market_sector = "Index"
-    elif description.endswith("OSE GOLD"):
-        bloomberg_root = "JG"
-        bloomberg_market_sector = "Comdty"
-    elif description.endswith("CMX MHG COPPER"):
-        bloomberg_root = "MHC"
-        bloomberg_market_sector = "Comdty"
-    elif description.endswith("NYM MICR CRUDE"):
-        bloomberg_root = "WMI"
-        bloomberg_market_sector = "Comdty"
-    elif description.endswith("IFLL 3MESRT F"):
-        bloomberg_root = "TKY"
-        bloomberg_market_sector = "Comdty"
-    elif description.endswith("ICE FTSE250 2"):
-        bloomberg_root = "YBY"
-        bloomberg_market_sector = "Index"
-
-    bloomberg_root = bloomberg_root
-    sector = bloomberg_market_sector
-    if len(bloomberg_root) == 1:
-        bloomberg_root += " "
-
-    contract_month = contract_month
-    year, month = contract_month[:4], contract_month[4:]
-    month_code = month_to_code[month]
-    if bloomberg_root in (
-        "NG",
-        "LA",
-        "MO",
-    ):
-        year_code = year[-2:]
-    else:
-        year_code = year[-1]
-
-    bbg_code = bloomberg_root + month_code + year_code + " " + sector
-
-    return bbg_code
+# RJO's own code of a contract, e.g. "01 ES 202503"
+CONTRACT_CODE = pl.concat_str(
+    "Exchange_code", "Contract_code", "Contract_month", separator=" "
+).alias("contract_code")
+
+
+MONTH_CODES = {
+    "01": "F",
+    "02": "G",
+    "03": "H",
+    "04": "J",
+    "05": "K",
+    "06": "M",
+    "07": "N",
+    "08": "Q",
+    "09": "U",
+    "10": "V",
+    "11": "X",
+    "12": "Z",
+}
+
+# roots whose bloomberg code uses a two-digit year
+TWO_DIGIT_YEAR_ROOTS = ["NG", "LA", "MO"]
+
+# HACK: Temporary fix for RJO wrong symbol: "root sector" -> root
+ROOT_FIXES = {
+    "NZ Index": "JGS",
+    "AL Comdty": "ALE",
+}
+
+# root and sector overrides by description suffix, the first matching suffix wins.
+# `precedes_root_fix` overrides are applied even when a `ROOT_FIXES` entry matches.
+DESCRIPTION_OVERRIDES = pl.DataFrame(
+    [
+        ("SCM TSR20RUBBR", "OR", "Comdty", True),
+        ("LME NICKEL US", "LN", "Comdty", True),
+        ("CME LUMBER FUT", "LBO", "Comdty", True),
+        ("ICE UKA FUT", "UKE", "Comdty", False),
+        ("EUX FDXS FUT", "MZS", "Index", False),
+        ("OSE GOLD", "JG", "Comdty", False),
+        ("CMX MHG COPPER", "MHC", "Comdty", False),
+        ("NYM MICR CRUDE", "WMI", "Comdty", False),
+        ("IFLL 3MESRT F", "TKY", "Comdty", False),
+        ("ICE FTSE250 2", "YBY", "Index", False),
+    ],
+    schema={
+        "_override_suffix": pl.String,
+        "_override_root": pl.String,
+        "_override_sector": pl.String,
+        "_precedes_root_fix": pl.Boolean,
+    },
+    orient="row",
+)
+
+
+def with_bloomberg_yellow_code(frame: FrameT) -> FrameT:
+    """Add a `bbg_yellow` column built from RJO's bloomberg root and contract month.
+
+    Expects the `Security_desc_line_1`, `bloomberg_root`, `bloomberg_market_sector`
+    and `Contract_month` columns.
+    """
+    description = pl.col("Security_desc_line_1")
+    root = pl.col("bloomberg_root")
+    sector = pl.col("bloomberg_market_sector")
+    contract_month = pl.col("Contract_month")
+
+    overrides = DESCRIPTION_OVERRIDES
+    if isinstance(frame, pl.LazyFrame):
+        overrides = overrides.lazy()
+
+    matched_suffix = pl.coalesce(
+        pl.when(description.str.ends_with(suffix)).then(pl.lit(suffix))
+        for suffix in DESCRIPTION_OVERRIDES["_override_suffix"]
+    )
+    root_fix = pl.concat_str(root, sector, separator=" ").replace_strict(
+        ROOT_FIXES, default=None, return_dtype=pl.String
+    )
+    use_override = pl.col("_override_root").is_not_null() & (
+        pl.col("_precedes_root_fix") | root_fix.is_null()
+    )
+
+    fixed_root = (
+        pl.when(use_override)
+        .then(pl.col("_override_root"))
+        .when(root_fix.is_not_null())
+        .then(root_fix)
+        .otherwise(root)
+    )
+    fixed_sector = (
+        pl.when(use_override).then(pl.col("_override_sector")).otherwise(sector)
+    )
+
+    return (
+        frame.with_columns(matched_suffix.alias("_override_suffix"))
+        .join(overrides, on="_override_suffix", how="left", coalesce=True)
+        .with_columns(
+            fixed_root.alias("_bbg_root"),
+            fixed_sector.alias("_bbg_sector"),
+        )
+        .with_columns(
+            pl.concat_str(
+                pl.when(pl.col("_bbg_root").str.len_chars() == 1)
+                .then(pl.col("_bbg_root") + " ")
+                .otherwise(pl.col("_bbg_root")),
+                contract_month.str.slice(4, 2).replace_strict(
+                    MONTH_CODES, return_dtype=pl.String
+                ),
+                pl.when(pl.col("_bbg_root").is_in(TWO_DIGIT_YEAR_ROOTS))
+                .then(contract_month.str.slice(2, 2))
+                .otherwise(contract_month.str.slice(3, 1)),
+                pl.lit(" "),
+                pl.col("_bbg_sector"),
+            ).alias("bbg_yellow")
+        )
+        .drop(
+            "_override_suffix",
+            "_override_root",
+            "_override_sector",
+            "_precedes_root_fix",
+            "_bbg_root",
+            "_bbg_sector",
+        )
+    )
 
 
 class RjoLoaderBase:
-    def __init__(self, fs: RemoteFileSystem):
+    def __init__(self, fs: RemoteFileSystem, afs: AsyncRemoteFileSystem | None = None):
         self._fs = fs
+        self._afs = afs if afs is not None else as_async(fs)
 
 
 class RjoPositionLoader(RjoLoaderBase):
     def extract(self, date: dt.date, accounts: list[str] | None = None) -> pl.DataFrame:
-        path = f"NOVISCIENT_SFTP_csvnpos_npos_{date:%Y%m%d}.csv"
-        data = self._fs.read_bytes(path)
+        return self.scan(date, accounts).collect()
+
+    async def aextract(
+        self, date: dt.date, accounts: list[str] | None = None
+    ) -> pl.DataFrame:
+        data = await self._afs.read_bytes(self._path(date))
+        return await self._parse(data, accounts).collect_async()
+
+    def scan(self, date: dt.date, accounts: list[str] | None = None) -> pl.LazyFrame:
+        return self._parse(self._fs.read_bytes(self._path(date)), accounts)
+
+    def _path(self, date: dt.date) -> str:
+        return f"NOVISCIENT_SFTP_csvnpos_npos_{date:%Y%m%d}.csv"
 
+    def _parse(self, data: bytes, accounts: list[str] | None) -> pl.LazyFrame:
         filters = [
             pl.col("Record_code") == "P",
         ]
         if accounts:
             filters.append(pl.col("Account_number").is_in(accounts))
 
-        raw = pl.read_csv(
+        raw = pl.scan_csv(
             data,
             has_header=False,
             new_columns=headers.POSITION_HEADER,
             schema_overrides={
                 "Contract_month": pl.String,
+                "Exchange_code": pl.String,
+                "Contract_code": pl.String,
                 "Account_number": pl.String,
                 "Formatted_trade_price": pl.String,
             },
@@ -117,7 +182,10 @@ class RjoPositionLoader(RjoLoaderBase):
         return raw
 
     def transform(self, raw: pl.DataFrame) -> pl.DataFrame:
-        return (
+        return self.transform_lazy(raw.lazy()).collect()
+
+    def transform_lazy(self, raw: pl.LazyFrame) -> pl.LazyFrame:
+        aggregated = (
             raw.filter(
                 pl.col("Security_desc_line_1").is_not_null(),
                 # filter out options with non-empty Security_subtype_code
@@ -137,19 +205,112 @@ class RjoPositionLoader(RjoLoaderBase):
                 pl.col("Contract_month").first(),
                 pl.col("bloomberg_root").first(),
                 pl.col("bloomberg_market_sector").first(),
+                CONTRACT_CODE.first(),
+            )
+        )
+
+        return with_bloomberg_yellow_code(aggregated).select(
+            pl.col("bbg_yellow").str.to_uppercase(),
+            pl.col("Account_number").alias("account_id"),
+            pl.col("Security_desc_line_1").alias("description"),
+            pl.col("contract_code"),
+            pl.col("quantity"),
+            pl.col("price"),
+            pl.col("local_ccy"),
+            pl.col("asset_type"),
+            pl.col("cost_price_lc"),
+            pl.col("multiplier"),
+        )
+
+
+class RjoTradeLoader(RjoLoaderBase):
+    """RJO trades from the daily trade files, one file per business day."""
+
+    FILENAME = "NOVISCIENT_SFTP_csvth1_dth1_{date:%Y%m%d}.csv"
+    # trade records of the file, other record codes are summaries
+    RECORD_CODES = ("T",)
+
+    def extract(
+        self, start: dt.date, end: dt.date, accounts: list[str] | None = None
+    ) -> pl.DataFrame:
+        return self.scan(start, end, accounts).collect()
+
+    def scan(
+        self, start: dt.date, end: dt.date, accounts: list[str] | None = None
+    ) -> pl.LazyFrame:
+        frames = [
+            self._parse(self._fs.read_bytes(self._path(date)), accounts)
+            for date in business_days(start, end)
+        ]
+        if not frames:
+            raise MissingDataError(f"No business day from {start} to {end}")
+        return pl.concat(frames, how="vertical_relaxed")
+
+    def transform(self, raw: pl.DataFrame) -> pl.DataFrame:
+        return self.transform_lazy(raw.lazy()).collect()
+
+    def transform_lazy(self, raw: pl.LazyFrame) -> pl.LazyFrame:
+        quantity = pl.col("Quantity") * pl.col("Buy_sell_code").replace({2: -1})
+
+        aggregated = (
+            raw.filter(
+                pl.col("Security_desc_line_1").is_not_null(),
+                # filter out options with non-empty Security_subtype_code
+                pl.col("Security_subtype_code").is_null(),
+            )
+            .group_by("Account_number", "trade_date", "Security_desc_line_1")
+            .agg(
+                quantity.sum().cast(pl.Int64).alias("quantity"),
+                # average price of the fills, weighted by their size
+                (
+                    (pl.col("Quantity").abs() * pl.col("Trade_price")).sum()
+                    / pl.col("Quantity").abs().sum()
+                ).alias("price"),
+                pl.col("Account_type_currency_symbol").first().alias("local_ccy"),
+                pl.col("Contract_month").first(),
+                pl.col("bloomberg_root").first(),
+                pl.col("bloomberg_market_sector").first(),
+                CONTRACT_CODE.first(),
+            )
+        )
+
+        return with_bloomberg_yellow_code(aggregated).select(
+            pl.col("trade_date"),
+            pl.col("bbg_yellow").str.to_uppercase(),
+            pl.col("Account_number").alias("account_id"),
+            pl.col("Security_desc_line_1").alias("description"),
+            pl.col("contract_code"),
+            pl.col("quantity"),
+            pl.col("price"),
+            pl.col("local_ccy"),
+        )
+
+    def _path(self, date: dt.date) -> str:
+        return self.FILENAME.format(date=date)
+
+    def _parse(self, data: bytes, accounts: list[str] | None) -> pl.LazyFrame:
+        filters = [
+            pl.col("Record_code").is_in(self.RECORD_CODES),
+        ]
+        if accounts:
+            filters.append(pl.col("Account_number").is_in(accounts))
+
+        return (
+            pl.scan_csv(
+                data,
+                has_header=False,
+                new_columns=headers.TRADE_HEADER,
+                schema_overrides={
+                    "Contract_month": pl.String,
+                    "Exchange_code": pl.String,
+                    "Contract_code": pl.String,
+                    "Account_number": pl.String,
+                    "Formatted_trade_price": pl.String,
+                    "Trade_date": pl.String,
+                },
             )
-            .select(
-                pl.struct(pl.all())
-                .map_elements(make_bloomberg_yellow_code, return_dtype=pl.String)
-                .str.to_uppercase()
-                .alias("bbg_yellow"),
-                pl.col("Account_number").alias("account_id"),
-                pl.col("Security_desc_line_1").alias("description"),
-                pl.col("quantity"),
-                pl.col("price"),
-                pl.col("local_ccy"),
-                pl.col("asset_type"),
-                pl.col("cost_price_lc"),
-                pl.col("multiplier"),
+            .filter(filters)
+            .with_columns(
+                pl.col("Trade_date").str.strptime(pl.Date, "%Y%m%d").alias("trade_date")
             )
         )
@@ -0,0 +1,15 @@
+import datetime as dt
+
+
+def business_days(start: dt.date, end: dt.date) -> list[dt.date]:
+    """Weekdays from `start` to `end`, both inclusive. Holidays are not excluded."""
+    return [
+        start + dt.timedelta(days=i)
+        for i in range((end - start).days + 1)
+        if (start + dt.timedelta(days=i)).weekday() < 5
+    ]
+
+
+def last_business_date(date: dt.date) -> dt.date:
+    """The last weekday on or before `date`. Holidays are not excluded."""
+    return date - dt.timedelta(days=max(date.weekday() - 4, 0))
@@ -1,2 +1,6 @@
 class ConfigError(Exception):
     pass
+
+
+class MissingDataError(ValueError, FileNotFoundError):
+    """The requested data doesn't exist, e.g. no file for a date."""
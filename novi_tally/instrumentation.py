@@ -0,0 +1,213 @@
+"""
+Timings and metrics of the stages of loading and reconciling data.
+
+Each stage (a download, a transformation, a validation, a reconciliation...)
+is timed and reports its metrics, e.g. rows in and out, bytes downloaded and
+cache hits, to the registered callbacks once done:
+
+    with instrumentation.record() as recorder:
+        ib_position.reconcile_with(enfusion_position)
+    print(recorder.summary())
+
+With `use_opentelemetry()`, stages are also traced as OpenTelemetry spans,
+which requires the `opentelemetry-api` package.
+"""
+
+import contextlib
+import datetime as dt
+import logging
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import polars as pl
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A step of loading or reconciling data, with its duration and metrics.
+
+    Attributes:
+        name: e.g. "position.extract" or "fs.read".
+        attributes: What the stage ran on, e.g. the provider and date.
+        metrics: Counts measured by the stage, e.g. `rows_in`, `rows_out`,
+            `bytes`, `cache_hits` and `cache_misses`.
+        started_at: The wall clock time the stage started at.
+        duration: In seconds.
+        peak_rss_bytes: The peak resident memory of the process so far, when
+            the stage ended. None where it can't be measured.
+        error: The exception the stage failed with, if any.
+    """
+
+    def __init__(self, name: str, attributes: dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.metrics: dict[str, float] = {}
+        self.started_at = dt.datetime.now(dt.timezone.utc)
+        self.duration = 0.0
+        self.peak_rss_bytes: int | None = None
+        self.error: BaseException | None = None
+
+    def add(self, metric: str, value: float = 1) -> None:
+        self.metrics[metric] = self.metrics.get(metric, 0) + value
+
+    def set(self, **metrics: float) -> None:
+        self.metrics.update(metrics)
+
+    def __repr__(self) -> str:
+        return (
+            f"Stage({self.name!r}, attributes={self.attributes}, "
+            f"duration={self.duration:.6f}, metrics={self.metrics})"
+        )
+
+
+StageCallback = Callable[[Stage], None]
+
+_callbacks: list[StageCallback] = []
+_callbacks_lock = threading.Lock()
+_tracer: Any = None
+
+
+def add_callback(callback: StageCallback) -> None:
+    """Call `callback` with every stage of the process once it ends.
+
+    Callbacks are called on the thread which ran the stage, so they must be
+    thread-safe. Exceptions raised by a callback are logged and ignored.
+    """
+    with _callbacks_lock:
+        _callbacks.append(callback)
+
+
+def remove_callback(callback: StageCallback) -> None:
+    with _callbacks_lock:
+        _callbacks.remove(callback)
+
+
+def use_opentelemetry(tracer_provider: Any = None) -> None:
+    """Also trace stages as OpenTelemetry spans.
+
+    Spans come from the global tracer provider unless another one is given, and
+    the metrics of a stage are set as attributes of its span.
+    """
+    global _tracer
+
+    try:
+        from opentelemetry import trace
+    except ImportError as e:
+        raise ImportError(
+            "Tracing requires opentelemetry-api: pip install 'novi-tally[otel]'"
+        ) from e
+
+    _tracer = trace.get_tracer("novi_tally", tracer_provider=tracer_provider)
+
+
+@contextlib.contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[Stage]:
+    """Time the enclosed block as a stage, see `Stage`.
+
+    Metrics are reported on the yielded stage:
+
+        with stage("position.transform", provider="ib") as s:
+            transformed = transform(raw)
+            s.set(rows_in=raw.height, rows_out=transformed.height)
+    """
+    current = Stage(name, attributes)
+    span_context = (
+        _tracer.start_as_current_span(name, attributes=_span_attributes(attributes))
+        if _tracer is not None
+        else contextlib.nullcontext()
+    )
+
+    with span_context as span:
+        start = time.perf_counter()
+        try:
+            yield current
+        except BaseException as e:
+            current.error = e
+            raise
+        finally:
+            current.duration = time.perf_counter() - start
+            current.peak_rss_bytes = _peak_rss_bytes()
+            if span is not None:
+                span.set_attributes(_span_attributes(current.metrics))
+            _report(current)
+
+
+class Recorder:
+    """A callback keeping every stage, see `record`."""
+
+    def __init__(self):
+        self.stages: list[Stage] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, stage: Stage) -> None:
+        with self._lock:
+            self.stages.append(stage)
+
+    def summary(self) -> pl.DataFrame:
+        """One row per stage, with its attributes and metrics as columns."""
+        with self._lock:
+            stages = list(self.stages)
+
+        return pl.from_dicts(
+            [
+                {
+                    "stage": s.name,
+                    **{k: str(v) for k, v in s.attributes.items()},
+                    "started_at": s.started_at,
+                    "duration": s.duration,
+                    **s.metrics,
+                    "peak_rss_bytes": s.peak_rss_bytes,
+                    "failed": s.error is not None,
+                }
+                for s in stages
+            ],
+            infer_schema_length=None,
+        )
+
+
+@contextlib.contextmanager
+def record() -> Iterator[Recorder]:
+    """Record the stages run by any thread of the process within the block."""
+    recorder = Recorder()
+    add_callback(recorder)
+    try:
+        yield recorder
+    finally:
+        remove_callback(recorder)
+
+
+def _report(current: Stage) -> None:
+    with _callbacks_lock:
+        callbacks = list(_callbacks)
+
+    for callback in callbacks:
+        try:
+            callback(current)
+        except Exception:
+            # a broken callback must not fail the run it observes
+            logger.exception("Stage callback %r failed", callback)
+
+
+def _peak_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _span_attributes(values: dict[str, Any]) -> dict[str, Any]:
+    return {
+        f"novi_tally.{k}": v if isinstance(v, str | bool | int | float) else str(v)
+        for k, v in values.items()
+        if v is not None
+    }
@@ -0,0 +1,272 @@
+"""
+A local instrument master: provider identifiers mapped to a canonical key.
+
+Each provider identifies instruments its own way (BB global IDs, BBG yellows,
+contract codes, free-text descriptions...). The master maps `(id_type,
+id_value)` pairs, e.g. `("figi", "BBG01XXXXXX")`, `("bbg_yellow", "ESH5 INDEX")`
+or `("description:rjo", "MAR 25 CME E-MINI S&P")`, to a canonical
+`instrument_key`, so that providers can be reconciled on one stable identifier
+without any network call.
+"""
+
+import io
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TypeVar
+
+import polars as pl
+
+from novi_tally.connections.cache import file_lock, write_atomic
+
+FrameT = TypeVar("FrameT", pl.DataFrame, pl.LazyFrame)
+
+_SCHEMA = {"id_type": pl.String, "id_value": pl.String, "instrument_key": pl.String}
+
+
+def standard_id_columns(
+    provider: str, columns: Iterable[str] | None = None
+) -> dict[str, str]:
+    """The identifier types of the columns of standardized data, by priority.
+
+    FIGIs (IB's BB global IDs) and BBG yellows are shared by every provider,
+    while contract codes (e.g. RJO's exchange, contract and month) and
+    descriptions are specific to each of them.
+
+    Args:
+        columns: Only the identifiers of these columns, e.g. those of a frame:
+            not every provider has FIGIs or contract codes.
+    """
+    id_columns = {
+        "figi": "figi",
+        "bbg_yellow": "bbg_yellow",
+        f"contract_code:{provider}": "contract_code",
+        f"description:{provider}": "description",
+    }
+    if columns is None:
+        return id_columns
+    columns = set(columns)
+    return {
+        id_type: column for id_type, column in id_columns.items() if column in columns
+    }
+
+
+def _non_blank(expr: pl.Expr) -> pl.Expr:
+    """`expr`, with blank identifiers as null: they don't identify anything."""
+    return pl.when(expr.str.strip_chars() != "").then(expr)
+
+
+class InstrumentMaster:
+    """Mappings of instrument identifiers to canonical keys, kept in a Parquet file.
+
+    Lookups are a left join per identifier type against an in-memory table of
+    that type, so resolving a frame costs the same whatever the size of the
+    master. New instruments are registered incrementally, and the file is
+    updated under a lock, so several processes can share it.
+
+    Identifiers are given as `{id_type: column}` in order of priority: a row is
+    keyed by its first identifier found in the master. A new instrument gets the
+    key `<id_type>:<id_value>` of its first non-null identifier, and all of its
+    other identifiers are mapped to that key.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        """
+        Args:
+            path: The Parquet file of the master. Without a path, the master only
+                lives in memory.
+        """
+        self._path = Path(path).expanduser() if path is not None else None
+        self._tables: dict[str, pl.DataFrame] | None = None
+        self._lock = threading.RLock()
+
+    def lookup(self, frame: FrameT, id_columns: dict[str, str]) -> FrameT:
+        """Add an `instrument_key` column, null for unknown instruments.
+
+        Args:
+            frame: Any frame holding the identifier columns.
+            id_columns: The identifier type of each column, in order of priority.
+        """
+        tables = self._get_tables()
+        keys = []
+        for i, (id_type, column) in enumerate(id_columns.items()):
+            table = tables.get(id_type)
+            if table is None:
+                continue
+            if isinstance(frame, pl.LazyFrame):
+                table = table.lazy()  # type: ignore
+            key = f"__instrument_key_{i}"
+            frame = frame.join(
+                table.rename({"id_value": column, "instrument_key": key}),
+                on=column,
+                how="left",
+                coalesce=True,
+            )
+            keys.append(key)
+
+        if not keys:
+            return frame.with_columns(pl.lit(None, pl.String).alias("instrument_key"))
+        return frame.with_columns(pl.coalesce(keys).alias("instrument_key")).drop(keys)
+
+    def register(self, frame: pl.DataFrame, id_columns: dict[str, str]) -> int:
+        """Map the identifiers of the rows of `frame` not yet in the master.
+
+        Returns:
+            The number of new mappings.
+        """
+        with self._lock:
+            # e.g. Formidium has empty BBG yellows for all but RJO positions
+            identifiers = frame.select(
+                _non_blank(pl.col(column)).alias(column)
+                for column in dict.fromkeys(id_columns.values())
+            )
+            keyed = self.lookup(identifiers, id_columns)
+            keyed = keyed.with_columns(
+                pl.coalesce(
+                    "instrument_key",
+                    *(
+                        pl.concat_str(pl.lit(f"{id_type}:"), pl.col(column))
+                        for id_type, column in id_columns.items()
+                    ),
+                )
+            )
+
+            tables = self._get_tables()
+            new = pl.concat(
+                [
+                    keyed.select(
+                        pl.lit(id_type).alias("id_type"),
+                        pl.col(column).alias("id_value"),
+                        pl.col("instrument_key"),
+                    )
+                    .filter(pl.col("id_value").is_not_null())
+                    .unique(subset="id_value", keep="first", maintain_order=True)
+                    .join(
+                        tables.get(id_type, pl.DataFrame(schema=_SCHEMA)),
+                        on="id_value",
+                        how="anti",
+                    )
+                    for id_type, column in id_columns.items()
+                ],
+                how="vertical_relaxed",
+            )
+            if not new.is_empty():
+                self.add(new, overwrite=False)
+            return new.height
+
+    def resolve(self, frame: pl.DataFrame, id_columns: dict[str, str]) -> pl.DataFrame:
+        """Register the instruments of `frame`, and add their `instrument_key`."""
+        self.register(frame, id_columns)
+        return self.lookup(frame, id_columns)
+
+    def translate(
+        self, values: Iterable[str], from_type: str, to_type: str
+    ) -> dict[str, str]:
+        """The `to_type` identifier of the instrument of each of `values`.
+
+        E.g. the BBG yellows of FIGIs, for instruments registered with both.
+        Values of unknown instruments, or of instruments without a `to_type`
+        identifier, are left out.
+        """
+        tables = self._get_tables()
+        source, target = tables.get(from_type), tables.get(to_type)
+        if source is None or target is None:
+            return {}
+
+        values = pl.DataFrame(
+            {"id_value": list(dict.fromkeys(v for v in values if v is not None))},
+            schema={"id_value": pl.String},
+        )
+        translated = (
+            source.join(values, on="id_value", how="semi")
+            .join(target.rename({"id_value": "to_value"}), on="instrument_key")
+            .unique(subset="id_value", keep="first", maintain_order=True)
+        )
+        return dict(zip(translated["id_value"], translated["to_value"]))
+
+    def add(self, mappings: pl.DataFrame, overwrite: bool = True) -> None:
+        """Add `id_type`, `id_value`, `instrument_key` rows, e.g. curated by hand.
+
+        Args:
+            overwrite: Replace the key of identifiers already in the master.
+                Otherwise, they keep their key.
+        """
+        mappings = (
+            mappings.select(pl.col(name).cast(dtype) for name, dtype in _SCHEMA.items())
+            .filter(_non_blank(pl.col("id_value")).is_not_null())
+            .unique(subset=["id_type", "id_value"], keep="last")
+        )
+
+        with self._lock:
+            if self._path is None:
+                self._tables = self._merge(self._get_tables(), mappings, overwrite)
+                return
+
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            with file_lock(f"{self._path}.lock"):
+                # other processes may have added instruments since we read it
+                merged = self._merge(self._read(), mappings, overwrite)
+                buffer = io.BytesIO()
+                self._to_frame(merged).write_parquet(buffer)
+                write_atomic(self._path, buffer.getvalue())
+            self._tables = merged
+
+    def to_frame(self) -> pl.DataFrame:
+        """All mappings as `id_type`, `id_value`, `instrument_key` columns."""
+        return self._to_frame(self._get_tables())
+
+    def reload(self) -> None:
+        """Read the file again on next use, e.g. after another process updated it."""
+        with self._lock:
+            self._tables = None
+
+    def _get_tables(self) -> dict[str, pl.DataFrame]:
+        if self._tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._tables = self._read()
+        return self._tables
+
+    def _read(self) -> dict[str, pl.DataFrame]:
+        if self._path is None or not self._path.exists():
+            return {}
+        # blank identifiers registered by earlier versions never match
+        frame = pl.read_parquet(self._path).filter(
+            _non_blank(pl.col("id_value")).is_not_null()
+        )
+        return {
+            id_type: table.drop("id_type")
+            for (id_type,), table in frame.partition_by("id_type", as_dict=True).items()
+        }
+
+    @staticmethod
+    def _merge(
+        tables: dict[str, pl.DataFrame], mappings: pl.DataFrame, overwrite: bool
+    ) -> dict[str, pl.DataFrame]:
+        merged = dict(tables)
+        for (id_type,), new in mappings.partition_by("id_type", as_dict=True).items():
+            new = new.drop("id_type")
+            table = merged.get(id_type)
+            if table is None:
+                merged[id_type] = new
+            elif overwrite:
+                merged[id_type] = pl.concat(
+                    [table.join(new, on="id_value", how="anti"), new]
+                )
+            else:
+                merged[id_type] = pl.concat(
+                    [table, new.join(table, on="id_value", how="anti")]
+                )
+        return merged
+
+    @staticmethod
+    def _to_frame(tables: dict[str, pl.DataFrame]) -> pl.DataFrame:
+        return pl.concat(
+            [
+                pl.DataFrame(schema=_SCHEMA),
+                *(
+                    table.select(pl.lit(id_type).alias("id_type"), pl.all())
+                    for id_type, table in tables.items()
+                ),
+            ]
+        )
@@ -0,0 +1,413 @@
+"""
+Run batches of position reconciliations described by a job file.
+
+A job file lists funds, the accounts of each fund at each provider, and the
+providers they are reconciled against, on some dates:
+
+    config = "config.toml"
+    output = "reconciliations"
+    dates = [2025-01-31]
+    instrument_identifier = ["description", "bbg_yellow"]
+
+    # loaded on the dates themselves rather than their last business day
+    [provider_dates]
+    formidium = "date"
+
+    # the most concurrent loads of any provider using a connection
+    [limits]
+    formidium-api = 1
+
+    [[funds]]
+    name = "PAF"
+    against = ["formidium", "enfusion"]
+
+    [funds.accounts]
+    rjo = ["30012", "30014"]
+    ib = ["U19923882", "U8674826"]
+
+Each `(provider, date)` position is loaded once, with the accounts of every
+reconciliation needing it, and each reconciliation only keeps the accounts of
+its fund. The results of a run are appended to a `ResultStore` in `output`.
+Run it with `novi-tally run jobs.toml`, see `novi_tally.cli`.
+"""
+
+import datetime as dt
+import functools
+import logging
+import threading
+from collections.abc import Callable, Hashable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Literal
+
+import polars as pl
+import tomllib
+
+from novi_tally.api import Position
+from novi_tally.config import registry
+from novi_tally.dates import last_business_date
+from novi_tally.errors import ConfigError
+from novi_tally.instrumentation import stage
+from novi_tally.reconciliation import reconcile_frames
+from novi_tally.results import ResultFormat, ResultSink, ResultStore
+from novi_tally.validation import ValidationMode
+
+logger = logging.getLogger(__name__)
+
+ProviderDate = Literal["date", "last_business_date"]
+
+
+class Fund:
+    """The accounts of a fund at each provider, and the providers they're checked against."""
+
+    def __init__(self, name: str, accounts: dict[str, list[str]], against: list[str]):
+        self.name = name
+        self.accounts = accounts
+        self.against = against
+
+
+class Reconciliation:
+    """The reconciliation of the accounts of a fund at `left` with `right` on a date."""
+
+    def __init__(self, fund: Fund, left: str, right: str, date: dt.date):
+        self.fund = fund
+        self.left = left
+        self.right = right
+        self.date = date
+
+    @property
+    def accounts(self) -> list[str]:
+        return self.fund.accounts[self.left]
+
+    def __repr__(self) -> str:
+        return (
+            f"Reconciliation({self.fund.name!r}, {self.left!r}, {self.right!r}, "
+            f"{self.date})"
+        )
+
+
+class Jobs:
+    """A batch of reconciliations sharing their loads, see the module docstring."""
+
+    def __init__(
+        self,
+        config_filepath: str,
+        funds: list[Fund],
+        dates: list[dt.date],
+        output: str | Path,
+        provider_dates: dict[str, ProviderDate] | None = None,
+        limits: dict[str, int] | None = None,
+        instrument_identifier: str | list[str] = "description",
+        price_diff_threshold: float = 0.01,
+        quantity_diff_threshold: float = 0,
+        validation: ValidationMode = "full",
+        max_workers: int = 8,
+        results_format: ResultFormat = "parquet",
+    ):
+        """
+        Args:
+            config_filepath: The config file of the connections and providers.
+            output: The directory of the `ResultStore` results are written to.
+            provider_dates: "date" for providers loaded on the dates themselves,
+                e.g. fund administrators with month end valuations. Others are
+                loaded on the last business day on or before each date.
+            limits: The maximum number of concurrent loads using each connection.
+            max_workers: The maximum number of concurrent tasks.
+            results_format: The format of the result files, see `ResultSink`.
+
+        Raises:
+            ConfigError: If a limit is less than 1.
+        """
+        for name, limit in (limits or {}).items():
+            # a connection without any slot would never run its loads
+            if not isinstance(limit, int) or limit < 1:
+                raise ConfigError(
+                    f"The limit of connection {name} must be at least 1, got {limit!r}"
+                )
+
+        self.config_filepath = config_filepath
+        self.funds = funds
+        self.dates = dates
+        self.output = Path(output)
+        self.provider_dates = provider_dates or {}
+        self.limits = limits or {}
+        self.identifiers = (
+            [instrument_identifier]
+            if isinstance(instrument_identifier, str)
+            else list(instrument_identifier)
+        )
+        self.price_diff_threshold = price_diff_threshold
+        self.quantity_diff_threshold = quantity_diff_threshold
+        self.validation = validation
+        self.max_workers = max_workers
+        self.results_format = results_format
+
+    @classmethod
+    def from_file(cls, filepath: str | Path) -> "Jobs":
+        """Read a job file. Its relative paths are relative to the file.
+
+        Raises:
+            ConfigError: If the file misses a setting, or has an invalid one.
+        """
+        filepath = Path(filepath)
+        with open(filepath, "rb") as f:
+            spec = tomllib.load(f)
+
+        try:
+            funds = [
+                Fund(
+                    name=fund["name"],
+                    accounts={
+                        provider: [str(account) for account in accounts]
+                        for provider, accounts in fund["accounts"].items()
+                    },
+                    against=fund["against"],
+                )
+                for fund in spec["funds"]
+            ]
+            return cls(
+                config_filepath=str(filepath.parent / spec["config"]),
+                funds=funds,
+                dates=list(spec["dates"]),
+                output=filepath.parent / spec.get("output", "reconciliations"),
+                provider_dates=spec.get("provider_dates"),
+                limits=spec.get("limits"),
+                instrument_identifier=spec.get("instrument_identifier", "description"),
+                price_diff_threshold=spec.get("price_diff_threshold", 0.01),
+                quantity_diff_threshold=spec.get("quantity_diff_threshold", 0),
+                validation=spec.get("validation", "full"),
+                max_workers=spec.get("max_workers", 8),
+                results_format=spec.get("results_format", "parquet"),
+            )
+        except KeyError as e:
+            raise ConfigError(f"Missing setting {e} in job file {filepath}") from e
+
+    def provider_date(self, provider: str, date: dt.date) -> dt.date:
+        """The date `provider` is loaded on for the reconciliations of `date`."""
+        rule = self.provider_dates.get(provider, "last_business_date")
+        if rule == "date":
+            return date
+        if rule == "last_business_date":
+            return last_business_date(date)
+        raise ConfigError(f"Unknown date {rule!r} of provider {provider}")
+
+    def reconciliations(self) -> list[Reconciliation]:
+        """Every reconciliation of the batch.
+
+        Raises:
+            ConfigError: If a fund reconciles a provider with itself, or an
+                unknown provider.
+        """
+        reconciliations = []
+        for fund in self.funds:
+            for provider in [*fund.accounts, *fund.against]:
+                if provider not in Position.DATALOADER_CLASS_MAPPING:
+                    raise ConfigError(f"Unknown provider {provider} of {fund.name}")
+
+            for date in self.dates:
+                for left in fund.accounts:
+                    for right in fund.against:
+                        if left == right:
+                            raise ConfigError(
+                                f"{fund.name} reconciles {left} with itself"
+                            )
+                        reconciliations.append(Reconciliation(fund, left, right, date))
+        return reconciliations
+
+    def loads(self) -> dict[tuple[str, dt.date], list[str]]:
+        """The accounts to load of each provider and date, once for all reconciliations."""
+        loads: dict[tuple[str, dt.date], set[str]] = {}
+        for reconciliation in self.reconciliations():
+            for provider in (reconciliation.left, reconciliation.right):
+                key = (provider, self.provider_date(provider, reconciliation.date))
+                loads.setdefault(key, set()).update(reconciliation.accounts)
+        return {key: sorted(accounts) for key, accounts in loads.items()}
+
+    def run(
+        self, sink: ResultSink | None = None
+    ) -> dict[Reconciliation, BaseException | None]:
+        """Load every position and run every reconciliation, writing their results.
+
+        The results of each reconciliation are written to `sink` as soon as it
+        completes, tagged with the name of its fund. A failed load only fails the
+        reconciliations depending on it; the others still run.
+
+        Args:
+            sink: A sink of a new run in the `output` store by default.
+
+        Returns:
+            The error of each reconciliation, None if it succeeded.
+        """
+        if sink is None:
+            sink = ResultStore(self.output).sink(format=self.results_format)
+
+        tasks: list[_Task] = []
+        positions: dict[tuple[str, dt.date], Position] = {}
+        for (provider, date), accounts in self.loads().items():
+            position = positions[provider, date] = Position.from_config_file(
+                provider=provider,  # type: ignore
+                config_filepath=self.config_filepath,
+                date=date,
+                accounts=accounts,
+                validation=self.validation,
+            )
+            tasks.append(
+                _Task(
+                    key=(provider, date),
+                    func=lambda p=position: p.data,
+                    connections=registry.connection_names(
+                        self.config_filepath, provider
+                    ),
+                )
+            )
+
+        reconciliations = self.reconciliations()
+        for reconciliation in reconciliations:
+            left = positions[
+                reconciliation.left,
+                self.provider_date(reconciliation.left, reconciliation.date),
+            ]
+            right = positions[
+                reconciliation.right,
+                self.provider_date(reconciliation.right, reconciliation.date),
+            ]
+            tasks.append(
+                _Task(
+                    key=reconciliation,
+                    func=functools.partial(
+                        self._reconcile, sink, reconciliation, left, right
+                    ),
+                    dependencies=[
+                        (left.provider_name, left.date),
+                        (right.provider_name, right.date),
+                    ],
+                )
+            )
+
+        with stage("jobs.run", reconciliations=len(reconciliations)) as s:
+            errors = _run_tasks(tasks, self.max_workers, self.limits)
+            s.set(
+                loads=len(positions),
+                failed=sum(errors[r] is not None for r in reconciliations),
+            )
+        return {
+            reconciliation: errors[reconciliation] for reconciliation in reconciliations
+        }
+
+    def _reconcile(
+        self,
+        sink: ResultSink,
+        reconciliation: Reconciliation,
+        left: Position,
+        right: Position,
+    ) -> None:
+        def select(position: Position) -> pl.DataFrame:
+            # positions are loaded with the accounts of every reconciliation
+            return position.data.filter(
+                pl.col("account_id").is_in(reconciliation.accounts)
+            )
+
+        results = reconcile_frames(
+            left=select(left),
+            right=select(right),
+            l_suffix=reconciliation.left,
+            r_suffix=reconciliation.right,
+            identifiers=self.identifiers,
+            price_diff_threshold=self.price_diff_threshold,
+            quantity_diff_threshold=self.quantity_diff_threshold,
+        )
+
+        sink.write(
+            results,
+            left=reconciliation.left,
+            right=reconciliation.right,
+            date=reconciliation.date,
+            fund=reconciliation.fund.name,
+        )
+
+        logger.info(
+            "%r: %d diffs, %d left only, %d right only",
+            reconciliation,
+            *(result.height for result in results),
+        )
+
+
+class _Task:
+    def __init__(
+        self,
+        key: Hashable,
+        func: Callable[[], Any],
+        dependencies: Iterable[Hashable] = (),
+        connections: Iterable[str] = (),
+    ):
+        self.key = key
+        self.func = func
+        self.dependencies = list(dependencies)
+        self.connections = sorted(set(connections))
+
+
+class DependencyError(Exception):
+    """A task wasn't run because a task it depends on failed."""
+
+
+def _run_tasks(
+    tasks: list[_Task], max_workers: int, limits: dict[str, int]
+) -> dict[Hashable, BaseException | None]:
+    """Run tasks once their dependencies succeed, within the limits of their connections.
+
+    A task only starts once a slot of each of its connections is free, so tasks
+    waiting for a busy connection never hold a worker.
+
+    Returns:
+        The error of each task, None if it succeeded.
+    """
+    slots = {name: threading.BoundedSemaphore(limit) for name, limit in limits.items()}
+    errors: dict[Hashable, BaseException | None] = {}
+    pending = list(tasks)
+    running: dict[Future, _Task] = {}
+
+    def acquire(task: _Task) -> bool:
+        acquired = []
+        for name in task.connections:
+            if name in slots and not slots[name].acquire(blocking=False):
+                for other in acquired:
+                    slots[other].release()
+                return False
+            acquired.append(name)
+        return True
+
+    def run(task: _Task) -> None:
+        try:
+            task.func()
+        finally:
+            for name in task.connections:
+                if name in slots:
+                    slots[name].release()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for task in list(pending):
+                failed = [d for d in task.dependencies if errors.get(d) is not None]
+                if failed:
+                    pending.remove(task)
+                    errors[task.key] = DependencyError(f"{failed[0]} failed")
+                    continue
+                if all(d in errors for d in task.dependencies) and acquire(task):
+                    pending.remove(task)
+                    running[executor.submit(run, task)] = task
+
+            if not running:
+                if pending:
+                    raise ValueError(
+                        f"Tasks with unknown dependencies: {[t.key for t in pending]}"
+                    )
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                errors[task.key] = future.exception()
+                if errors[task.key] is not None:
+                    logger.error("%r failed", task.key, exc_info=errors[task.key])
+
+    return errors
@@ -1,5 +1,5 @@
 import datetime as dt
-from typing import Protocol
+from typing import Protocol, runtime_checkable
 
 import polars as pl
 
@@ -12,9 +12,44 @@ class PositionLoader(Protocol):
     def transform(self, raw: pl.DataFrame) -> pl.DataFrame: ...
 
 
+@runtime_checkable
+class LazyPositionLoader(PositionLoader, Protocol):
+    """A position loader which can also build its output as a single lazy query.
+
+    `transform_lazy(scan(...))` lets Polars push filters and column selections
+    down into the file scan, so only the needed rows and columns are parsed.
+    """
+
+    def scan(
+        self, date: dt.date, accounts: list[str] | None = None
+    ) -> pl.LazyFrame: ...
+
+    def transform_lazy(self, raw: pl.LazyFrame) -> pl.LazyFrame: ...
+
+
+@runtime_checkable
+class AsyncPositionLoader(PositionLoader, Protocol):
+    """A position loader which can also extract without blocking an event loop."""
+
+    async def aextract(
+        self, date: dt.date, accounts: list[str] | None = None
+    ) -> pl.DataFrame: ...
+
+
 class TradeLoader(Protocol):
     def extract(
         self, start: dt.date, end: dt.date, accounts: list[str] | None = None
     ) -> pl.DataFrame: ...
 
     def transform(self, raw: pl.DataFrame) -> pl.DataFrame: ...
+
+
+@runtime_checkable
+class LazyTradeLoader(TradeLoader, Protocol):
+    """A trade loader which can also build its output as a single lazy query."""
+
+    def scan(
+        self, start: dt.date, end: dt.date, accounts: list[str] | None = None
+    ) -> pl.LazyFrame: ...
+
+    def transform_lazy(self, raw: pl.LazyFrame) -> pl.LazyFrame: ...
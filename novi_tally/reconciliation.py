@@ -0,0 +1,760 @@
+import math
+import multiprocessing
+import os
+import tempfile
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import polars as pl
+
+from novi_tally.instrumentation import stage
+
+_LEFT_PRESENT = "__left_present"
+_RIGHT_PRESENT = "__right_present"
+
+
+def reconcile_frames(
+    left: pl.DataFrame | pl.LazyFrame,
+    right: pl.DataFrame | pl.LazyFrame,
+    l_suffix: str,
+    r_suffix: str,
+    identifiers: Sequence[str],
+    price_diff_threshold: float,
+    quantity_diff_threshold: float,
+    keys: Sequence[str] = ("account_id",),
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """Reconcile two standardized frames, matching on `keys` and each identifier in turn.
+
+    Identifiers form a fallback chain: rows are matched on `keys` and the first
+    identifier, the rows still unmatched on `keys` and the second one, and so on.
+    The `match_level` column of the diff holds the identifier each pair matched
+    on.
+
+    All levels are resolved in a single pass: the keys of each level are hashed
+    once, and each level only joins the hashes and row indices of the rows still
+    unmatched, so extra levels stay cheap. Full rows are gathered once, at the
+    end. Should hashes collide, or key dtypes differ between both sides, each
+    level is instead reconciled with a join on the key columns themselves.
+
+    Returns:
+        diff, left_only and right_only frames, as described in
+        `Position.reconcile_with`.
+    """
+    with stage("reconcile", left=l_suffix, right=r_suffix) as s:
+        left = left.lazy().rename(lambda name: f"{name}_{l_suffix}").collect()
+        right = right.lazy().rename(lambda name: f"{name}_{r_suffix}").collect()
+        s.set(rows_in=left.height + right.height)
+
+        matches = _match_levels(left, right, l_suffix, r_suffix, keys, identifiers)
+        if matches is not None:
+            matched = pl.concat(
+                [
+                    left.select(pl.all().gather(matches[_LEFT_INDEX])),
+                    right.select(pl.all().gather(matches[_RIGHT_INDEX])),
+                    matches.select(_MATCH_LEVEL),
+                ],
+                how="horizontal",
+            )
+            if not _keys_equal(matched, l_suffix, r_suffix, keys, identifiers):
+                matches = None
+
+        if matches is None:
+            diff, left_only, right_only = _reconcile_levels(
+                left=left.lazy(),
+                right=right.lazy(),
+                l_suffix=l_suffix,
+                r_suffix=r_suffix,
+                keys=keys,
+                identifiers=identifiers,
+                price_diff_threshold=price_diff_threshold,
+                quantity_diff_threshold=quantity_diff_threshold,
+            )
+        else:
+            diff, left_only, right_only = pl.collect_all(
+                [
+                    _diff(
+                        matched.lazy(),
+                        left.columns,
+                        right.columns,
+                        l_suffix,
+                        r_suffix,
+                        price_diff_threshold,
+                        quantity_diff_threshold,
+                        extra_columns=[_MATCH_LEVEL],
+                    ),
+                    left.lazy().filter(
+                        ~pl.int_range(pl.len()).is_in(matches[_LEFT_INDEX])
+                    ),
+                    right.lazy().filter(
+                        ~pl.int_range(pl.len()).is_in(matches[_RIGHT_INDEX])
+                    ),
+                ]
+            )
+            s.set(
+                **{
+                    f"matched_{level}": count
+                    for level, count in matches[_MATCH_LEVEL].value_counts().iter_rows()
+                }
+            )
+
+        s.set(rows_out=diff.height + left_only.height + right_only.height)
+        return diff, left_only, right_only
+
+
+_LEFT_INDEX = "__left_index"
+_RIGHT_INDEX = "__right_index"
+_MATCH_LEVEL = "match_level"
+
+
+def _match_levels(
+    left: pl.DataFrame,
+    right: pl.DataFrame,
+    l_suffix: str,
+    r_suffix: str,
+    keys: Sequence[str],
+    identifiers: Sequence[str],
+) -> pl.DataFrame | None:
+    """The row indices of the pairs of rows matched, and the identifier they matched on.
+
+    Returns None when a key column doesn't have the same dtype on both sides, as
+    their hashes couldn't be compared.
+    """
+    columns = {column for identifier in identifiers for column in (*keys, identifier)}
+    if any(
+        left.schema.get(f"{column}_{l_suffix}")
+        != right.schema.get(f"{column}_{r_suffix}")
+        for column in columns
+    ):
+        return None
+
+    levels = [f"__level_{i}" for i in range(len(identifiers))]
+
+    def hash_levels(frame: pl.DataFrame, suffix: str, index: str) -> pl.DataFrame:
+        def key(identifier: str) -> pl.Expr:
+            on = [
+                pl.col(f"{name}_{suffix}").alias(name) for name in (*keys, identifier)
+            ]
+            # rows without an identifier can't be matched at its level
+            return pl.when(
+                pl.all_horizontal(column.is_not_null() for column in on)
+            ).then(pl.struct(on).hash(seed=0))
+
+        return frame.select(
+            pl.int_range(pl.len(), dtype=pl.UInt32).alias(index),
+            *(
+                key(identifier).alias(level)
+                for identifier, level in zip(identifiers, levels)
+            ),
+        )
+
+    left_rest = hash_levels(left, l_suffix, _LEFT_INDEX)
+    right_rest = hash_levels(right, r_suffix, _RIGHT_INDEX)
+
+    matches = []
+    for identifier, level in zip(identifiers, levels):
+        pairs = (
+            left_rest.select(_LEFT_INDEX, level)
+            .drop_nulls(level)
+            .join(
+                right_rest.select(_RIGHT_INDEX, level).drop_nulls(level),
+                on=level,
+                how="inner",
+                validate="1:1",
+            )
+        )
+        matches.append(
+            pairs.select(
+                _LEFT_INDEX, _RIGHT_INDEX, pl.lit(identifier).alias(_MATCH_LEVEL)
+            )
+        )
+        left_rest = left_rest.filter(~pl.col(_LEFT_INDEX).is_in(pairs[_LEFT_INDEX]))
+        right_rest = right_rest.filter(~pl.col(_RIGHT_INDEX).is_in(pairs[_RIGHT_INDEX]))
+
+    return pl.concat(matches)
+
+
+def _keys_equal(
+    matched: pl.DataFrame,
+    l_suffix: str,
+    r_suffix: str,
+    keys: Sequence[str],
+    identifiers: Sequence[str],
+) -> bool:
+    """Whether every pair matched by hash has the same keys on both sides."""
+    return bool(
+        matched.select(
+            pl.all_horizontal(
+                (pl.col(_MATCH_LEVEL) != identifier)
+                | pl.all_horizontal(
+                    pl.col(f"{name}_{l_suffix}") == pl.col(f"{name}_{r_suffix}")
+                    for name in (*keys, identifier)
+                )
+                for identifier in set(identifiers)
+            ).all()
+        ).item()
+    )
+
+
+def _reconcile_levels(
+    left: pl.LazyFrame,
+    right: pl.LazyFrame,
+    l_suffix: str,
+    r_suffix: str,
+    keys: Sequence[str],
+    identifiers: Sequence[str],
+    price_diff_threshold: float,
+    quantity_diff_threshold: float,
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """Reconcile level by level, with one join on the key columns per identifier."""
+    diffs = []
+    for identifier in identifiers:
+        diff, left_only, right_only = _reconcile_pass(
+            left=left,
+            right=right,
+            l_suffix=l_suffix,
+            r_suffix=r_suffix,
+            on=[*keys, identifier],
+            price_diff_threshold=price_diff_threshold,
+            quantity_diff_threshold=quantity_diff_threshold,
+        )
+        diffs.append(diff.with_columns(pl.lit(identifier).alias(_MATCH_LEVEL)))
+        left, right = left_only.lazy(), right_only.lazy()
+
+    return pl.concat(diffs), left_only, right_only
+
+
+def _reconcile_pass(
+    left: pl.LazyFrame,
+    right: pl.LazyFrame,
+    l_suffix: str,
+    r_suffix: str,
+    on: list[str],
+    price_diff_threshold: float,
+    quantity_diff_threshold: float,
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    left_on = [f"{name}_{l_suffix}" for name in on]
+    right_on = [f"{name}_{r_suffix}" for name in on]
+    left_columns = left.collect_schema().names()
+    right_columns = right.collect_schema().names()
+
+    # rows without an identifier can't be matched, and would also fail the
+    # 1:1 validation of the join
+    left_has_keys = pl.all_horizontal(pl.col(left_on).is_not_null())
+    right_has_keys = pl.all_horizontal(pl.col(right_on).is_not_null())
+
+    # the join is materialized once, and split by its match indicators
+    joined = (
+        left.filter(left_has_keys)
+        .with_columns(pl.lit(True).alias(_LEFT_PRESENT))
+        .join(
+            right.filter(right_has_keys).with_columns(
+                pl.lit(True).alias(_RIGHT_PRESENT)
+            ),
+            left_on=left_on,
+            right_on=right_on,
+            how="full",
+            validate="1:1",
+            coalesce=False,
+        )
+        .collect()
+    )
+
+    diff = _diff(
+        joined.lazy().filter(
+            pl.col(_LEFT_PRESENT).is_not_null() & pl.col(_RIGHT_PRESENT).is_not_null()
+        ),
+        left_columns,
+        right_columns,
+        l_suffix,
+        r_suffix,
+        price_diff_threshold,
+        quantity_diff_threshold,
+    )
+
+    left_only = pl.concat(
+        [
+            joined.lazy().filter(pl.col(_RIGHT_PRESENT).is_null()).select(left_columns),
+            left.filter(~left_has_keys),
+        ]
+    )
+    right_only = pl.concat(
+        [
+            joined.lazy().filter(pl.col(_LEFT_PRESENT).is_null()).select(right_columns),
+            right.filter(~right_has_keys),
+        ]
+    )
+
+    return tuple(pl.collect_all([diff, left_only, right_only]))  # type: ignore
+
+
+def _diff(
+    matched: pl.LazyFrame,
+    left_columns: list[str],
+    right_columns: list[str],
+    l_suffix: str,
+    r_suffix: str,
+    price_diff_threshold: float,
+    quantity_diff_threshold: float,
+    extra_columns: Sequence[str] = (),
+) -> pl.LazyFrame:
+    """The matched pairs which differ in price, quantity or currency."""
+
+    def _diff_col(col_name: str) -> pl.Expr:
+        return (
+            pl.col(f"{col_name}_{l_suffix}") - pl.col(f"{col_name}_{r_suffix}")
+        ).alias(f"{col_name}_diff")
+
+    return matched.select(
+        *left_columns,
+        *right_columns,
+        _diff_col("price"),
+        _diff_col("quantity"),
+        (pl.col(f"local_ccy_{l_suffix}") == pl.col(f"local_ccy_{r_suffix}")).alias(
+            "same_ccy?"
+        ),
+        *extra_columns,
+    ).filter(
+        (pl.col("price_diff").abs() > price_diff_threshold)
+        | (pl.col("quantity_diff").abs() > quantity_diff_threshold)
+        | (~pl.col("same_ccy?"))
+    )
+
+
+def reconcile_sharded(
+    left: pl.DataFrame | pl.LazyFrame,
+    right: pl.DataFrame | pl.LazyFrame,
+    l_suffix: str,
+    r_suffix: str,
+    identifiers: Sequence[str],
+    price_diff_threshold: float,
+    quantity_diff_threshold: float,
+    keys: Sequence[str] = ("account_id",),
+    max_workers: int | None = None,
+    max_shard_bytes: int | None = None,
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """`reconcile_frames` on a process pool, one shard of accounts at a time.
+
+    Rows are assigned to shards by the hash of their `keys`, e.g. the account,
+    so rows which could match each other are always in the same shard, and the
+    results of the shards are simply concatenated. Each worker process only
+    holds the rows of its shards, and runs its own joins.
+
+    Shards are passed to and from the workers as Arrow IPC files in a temporary
+    directory. Stages run by the workers are reported in the workers, not to
+    the callbacks of this process.
+
+    Args:
+        max_workers: The number of worker processes, the number of CPUs by
+            default.
+        max_shard_bytes: Split the data into more shards than workers so that
+            no shard holds more than about this many bytes of both sides.
+
+    Returns:
+        The same frames as `reconcile_frames`, up to row order.
+    """
+    if not keys:
+        raise ValueError("Sharding needs at least one key, e.g. `account_id`")
+
+    left, right = pl.collect_all([left.lazy(), right.lazy()])
+    max_workers = max_workers or os.cpu_count() or 1
+    n_shards = max_workers
+    if max_shard_bytes is not None:
+        size = left.estimated_size() + right.estimated_size()
+        n_shards = max(n_shards, math.ceil(size / max_shard_bytes))
+
+    def write_shards(frame: pl.DataFrame, directory: Path, side: str) -> None:
+        shards = frame.with_columns(
+            (pl.struct(keys).hash(seed=0) % n_shards).alias(_SHARD)
+        ).partition_by(_SHARD, as_dict=True, include_key=False)
+        for shard in range(n_shards):
+            # a shard without rows on one side still needs its schema
+            shards.get((shard,), frame.clear()).write_ipc(directory / f"{shard}.{side}")
+
+    with (
+        stage("reconcile.sharded", left=l_suffix, right=r_suffix, shards=n_shards) as s,
+        tempfile.TemporaryDirectory(prefix="novi_tally-") as tmp,
+    ):
+        s.set(rows_in=left.height + right.height)
+        directory = Path(tmp)
+        write_shards(left, directory, "left")
+        write_shards(right, directory, "right")
+        del left, right
+
+        kwargs = {
+            "l_suffix": l_suffix,
+            "r_suffix": r_suffix,
+            "identifiers": list(identifiers),
+            "price_diff_threshold": price_diff_threshold,
+            "quantity_diff_threshold": quantity_diff_threshold,
+            "keys": list(keys),
+        }
+        # Polars' thread pool doesn't survive a fork
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, n_shards),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            for future in [
+                executor.submit(_reconcile_shard, directory / str(shard), kwargs)
+                for shard in range(n_shards)
+            ]:
+                future.result()
+
+        diff, left_only, right_only = (
+            pl.concat(
+                [
+                    pl.read_ipc(directory / f"{shard}.{result}", memory_map=False)
+                    for shard in range(n_shards)
+                ]
+            )
+            for result in ("diff", "left_only", "right_only")
+        )
+        s.set(rows_out=diff.height + left_only.height + right_only.height)
+        return diff, left_only, right_only
+
+
+_SHARD = "__shard"
+
+
+def _reconcile_shard(path: Path, kwargs: dict) -> None:
+    # results are written next to the shard rather than sent back through a pipe
+    results = reconcile_frames(
+        left=pl.read_ipc(path.with_suffix(".left"), memory_map=False),
+        right=pl.read_ipc(path.with_suffix(".right"), memory_map=False),
+        **kwargs,
+    )
+    for name, result in zip(("diff", "left_only", "right_only"), results):
+        result.write_ipc(path.with_suffix(f".{name}"))
+
+
+_VALUES = ["quantity", "price", "local_ccy"]
+
+
+def reconcile_many_frames(
+    frames: dict[str, pl.DataFrame | pl.LazyFrame],
+    identifier: str,
+    price_diff_threshold: float,
+    quantity_diff_threshold: float,
+    keys: Sequence[str] = ("account_id",),
+    breaks_only: bool = True,
+) -> pl.DataFrame:
+    """Reconcile any number of standardized frames against the first one, at once.
+
+    Every frame is joined once, on `keys` and `identifier`, into one wide frame,
+    and all comparisons are computed in a single query, so the work grows with
+    the number of rows rather than the number of pairs of sources. Each row holds
+    the quantity, price and currency of every source (`<column>_<source>`), and,
+    for every source but the first, its differences with the first source
+    (`<column>_diff_<source>`) and whether they agree within the thresholds
+    (`agrees_<source>`, null where either is missing). `n_sources` counts the
+    sources holding the instrument, and `all_agree` is true when every source
+    holds it and agrees with the first one.
+
+    Rows without an identifier can't be matched, and are kept on rows of their
+    own.
+
+    Args:
+        frames: Standardized frames by source name. The first one is the
+            reference the others are compared with.
+        breaks_only: Only return the rows where the sources don't all agree.
+    """
+    sources = list(frames)
+    if len(sources) < 2:
+        raise ValueError("At least two frames are needed to reconcile")
+    reference, others = sources[0], sources[1:]
+    on = [*keys, identifier]
+    has_keys = pl.all_horizontal(pl.col(on).is_not_null())
+
+    with stage("reconcile.many", sources=",".join(sources)) as s:
+        wide = {
+            source: frame.lazy().select(
+                *on, *(pl.col(value).alias(f"{value}_{source}") for value in _VALUES)
+            )
+            for source, frame in frames.items()
+        }
+
+        joined = wide[reference].filter(has_keys)
+        for source in others:
+            joined = joined.join(
+                wide[source].filter(has_keys),
+                on=on,
+                how="full",
+                coalesce=True,
+                validate="1:1",
+            )
+        joined = pl.concat(
+            [joined, *(frame.filter(~has_keys) for frame in wide.values())],
+            how="diagonal",
+        )
+
+        def diff(value: str, source: str) -> pl.Expr:
+            return pl.col(f"{value}_{reference}") - pl.col(f"{value}_{source}")
+
+        result = joined.select(
+            *on,
+            *(f"{value}_{source}" for source in sources for value in _VALUES),
+            *(
+                expr
+                for source in others
+                for expr in (
+                    diff("quantity", source).alias(f"quantity_diff_{source}"),
+                    diff("price", source).alias(f"price_diff_{source}"),
+                    (
+                        (diff("quantity", source).abs() <= quantity_diff_threshold)
+                        & (diff("price", source).abs() <= price_diff_threshold)
+                        & (
+                            pl.col(f"local_ccy_{reference}")
+                            == pl.col(f"local_ccy_{source}")
+                        )
+                    ).alias(f"agrees_{source}"),
+                )
+            ),
+            pl.sum_horizontal(
+                pl.col(f"quantity_{source}").is_not_null() for source in sources
+            ).alias("n_sources"),
+        ).with_columns(
+            (
+                (pl.col("n_sources") == len(sources))
+                & pl.all_horizontal(
+                    pl.col(f"agrees_{source}").fill_null(False) for source in others
+                )
+            ).alias("all_agree")
+        )
+
+        if breaks_only:
+            result = result.filter(~pl.col("all_agree"))
+        collected = result.collect()
+        s.set(rows_out=collected.height)
+        return collected
+
+
+_ROW_HASH = "__row_hash"
+_LEVEL_HASH = "__level_hash_{}"
+
+
+class ReconciliationState:
+    """The inputs and results of the last reconciliation of a pair of providers.
+
+    Passed to `reconcile_incremental` (or `Position.reconcile_with(state=...)`)
+    run after run, e.g. day over day or for intraday reruns, only the rows
+    connected to a change since the previous run are reconciled again; the
+    results of all other rows are carried forward. The state is reset whenever
+    the providers, identifiers, thresholds or schemas change.
+    """
+
+    def __init__(self):
+        self._params: tuple | None = None
+        self._left: pl.DataFrame | None = None
+        self._right: pl.DataFrame | None = None
+        # results with the row hash of each side
+        self._results: tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame] | None = None
+
+    def clear(self) -> None:
+        self._params = self._left = self._right = self._results = None
+
+    def changes(
+        self, params: tuple, left: pl.DataFrame, right: pl.DataFrame
+    ) -> tuple[pl.DataFrame, pl.DataFrame] | None:
+        """The rows added to or removed from each side since the last run, hashed.
+
+        Returns None when the last run can't be built upon: there is none, it
+        had other `params`, or the number of copies of an identical row changed.
+        """
+        if self._params != params:
+            return None
+        assert self._left is not None and self._right is not None
+
+        left_changed = _changed(left, self._left)
+        right_changed = _changed(right, self._right)
+        if left_changed is None or right_changed is None:
+            return None
+        return left_changed, right_changed
+
+    def carried_forward(
+        self, kept_left: pl.Series, kept_right: pl.Series, l_hash: str, r_hash: str
+    ) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+        """The previous results of the rows with the row hashes kept on each side."""
+        assert self._results is not None
+        diff, left_only, right_only = self._results
+        return (
+            diff.filter(pl.col(l_hash).is_in(kept_left)),
+            left_only.filter(pl.col(l_hash).is_in(kept_left)),
+            right_only.filter(pl.col(r_hash).is_in(kept_right)),
+        )
+
+    def update(
+        self,
+        params: tuple,
+        left: pl.DataFrame,
+        right: pl.DataFrame,
+        results: tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame],
+    ) -> None:
+        """Remember the inputs and results of a run, for the next one."""
+        self._params = params
+        self._left, self._right = left, right
+        self._results = results
+
+
+def reconcile_incremental(
+    left: pl.DataFrame,
+    right: pl.DataFrame,
+    l_suffix: str,
+    r_suffix: str,
+    identifiers: Sequence[str],
+    price_diff_threshold: float,
+    quantity_diff_threshold: float,
+    state: ReconciliationState,
+    keys: Sequence[str] = ("account_id",),
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """`reconcile_frames`, only re-evaluating rows affected by changes since `state`.
+
+    Rows are compared with the previous inputs by hash. The keys (`keys` and
+    each identifier) of added and removed rows are closed over: any row sharing
+    a key with an affected row, on either side and at any identifier level, is
+    affected too, as its match may change. Only affected rows are reconciled;
+    the previous results of the other rows still hold and are carried forward.
+
+    The results are the same as those of `reconcile_frames`, up to row order.
+    """
+    params = (
+        l_suffix,
+        r_suffix,
+        tuple(identifiers),
+        price_diff_threshold,
+        quantity_diff_threshold,
+        tuple(keys),
+        tuple(left.schema.items()),
+        tuple(right.schema.items()),
+    )
+    levels = [_LEVEL_HASH.format(i) for i in range(len(identifiers))]
+    l_hash, r_hash = f"{_ROW_HASH}_{l_suffix}", f"{_ROW_HASH}_{r_suffix}"
+
+    def annotate(frame: pl.DataFrame) -> pl.DataFrame:
+        return frame.with_columns(
+            pl.struct(pl.all()).hash(seed=0).alias(_ROW_HASH),
+            *(
+                # rows can only match on keys without nulls
+                pl.when(pl.all_horizontal(pl.col(*keys, identifier).is_not_null()))
+                .then(pl.struct(*keys, identifier).hash(seed=1))
+                .alias(level)
+                for identifier, level in zip(identifiers, levels)
+            ),
+        )
+
+    def reconcile(left: pl.DataFrame, right: pl.DataFrame):
+        # the row hashes are carried through, suffixed like any other column
+        return reconcile_frames(
+            left=left.drop(levels),
+            right=right.drop(levels),
+            l_suffix=l_suffix,
+            r_suffix=r_suffix,
+            identifiers=identifiers,
+            price_diff_threshold=price_diff_threshold,
+            quantity_diff_threshold=quantity_diff_threshold,
+            keys=keys,
+        )
+
+    with stage("reconcile.incremental", left=l_suffix, right=r_suffix) as s:
+        s.set(rows_in=left.height + right.height)
+        left, right = annotate(left), annotate(right)
+
+        changed = state.changes(params, left, right)
+        if changed is None:
+            results = reconcile(left, right)
+            s.set(rows_affected=left.height + right.height)
+        else:
+            left_affected, right_affected = _affected(
+                left.select(_ROW_HASH, *levels),
+                right.select(_ROW_HASH, *levels),
+                list(changed),
+                levels,
+            )
+            diff, left_only, right_only = reconcile(
+                left.filter(left_affected), right.filter(right_affected)
+            )
+            s.set(rows_affected=int(left_affected.sum() + right_affected.sum()))
+
+            prev_diff, prev_left_only, prev_right_only = state.carried_forward(
+                left.filter(~left_affected)[_ROW_HASH],
+                right.filter(~right_affected)[_ROW_HASH],
+                l_hash,
+                r_hash,
+            )
+            results = (
+                pl.concat([prev_diff, diff]),
+                pl.concat([prev_left_only, left_only]),
+                pl.concat([prev_right_only, right_only]),
+            )
+
+        state.update(params, left, right, results)
+        return tuple(  # type: ignore
+            result.drop(l_hash, r_hash, strict=False) for result in results
+        )
+
+
+def _changed(current: pl.DataFrame, previous: pl.DataFrame) -> pl.DataFrame | None:
+    """The row and level hashes of the rows added to or removed from `previous`.
+
+    Returns None when the number of copies of an identical row changed, which
+    can't be told apart by hash membership alone.
+    """
+    added = current.filter(~pl.col(_ROW_HASH).is_in(previous[_ROW_HASH]))
+    removed = previous.filter(~pl.col(_ROW_HASH).is_in(current[_ROW_HASH]))
+
+    # the rows in both frames must be the same multiset: compare the sums of
+    # their hashes, which wrap around as unsigned 64-bit integers
+    def hash_sum(frame: pl.DataFrame) -> int:
+        return frame[_ROW_HASH].sum()
+
+    common = hash_sum(current) - hash_sum(added), hash_sum(previous) - hash_sum(removed)
+    if common[0] % 2**64 != common[1] % 2**64:
+        return None
+
+    columns = [
+        _ROW_HASH,
+        *(name for name in current.columns if name.startswith("__level_hash_")),
+    ]
+    return pl.concat([added.select(columns), removed.select(columns)])
+
+
+def _affected(
+    left_levels: pl.DataFrame,
+    right_levels: pl.DataFrame,
+    changed: list[pl.DataFrame],
+    levels: list[str],
+) -> tuple[pl.Series, pl.Series]:
+    """Masks of the rows of `left_levels` and `right_levels` connected to a change.
+
+    Added rows are affected themselves, even without a key at any level. Rows
+    are connected when they share the key hash of any identifier level; the
+    matches of a group of connected rows don't depend on any other row. A hash
+    collision only makes more rows affected.
+    """
+    changed_rows = pl.concat([frame[_ROW_HASH] for frame in changed])
+    affected = changed
+    left_mask = pl.repeat(False, left_levels.height, eager=True)
+    right_mask = pl.repeat(False, right_levels.height, eager=True)
+
+    while True:
+        seeds = {
+            level: pl.concat([frame[level] for frame in affected]).drop_nulls().unique()
+            for level in levels
+        }
+        # rows without a key at a level have a null hash there, and are not connected
+        connected = pl.col(_ROW_HASH).is_in(changed_rows) | pl.any_horizontal(
+            pl.col(level).is_in(seeds[level]).fill_null(False) for level in levels
+        )
+        new_left_mask = left_levels.select(connected).to_series()
+        new_right_mask = right_levels.select(connected).to_series()
+        if (
+            new_left_mask.sum() == left_mask.sum()
+            and new_right_mask.sum() == right_mask.sum()
+        ):
+            return left_mask, right_mask
+
+        left_mask, right_mask = new_left_mask, new_right_mask
+        affected = [
+            *changed,
+            left_levels.filter(left_mask),
+            right_levels.filter(right_mask),
+        ]
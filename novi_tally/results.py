@@ -0,0 +1,317 @@
+"""
+Append the results of reconciliations to one dataset, and read them back.
+
+A result store is a directory partitioned by run, provider pair, date and
+break type:
+
+    <root>/run_id=20250131T180000-1a2b3c4d/pair=ib_vs_enfusion/date=2025-01-31/break_type=diff/part-<uuid>.parquet
+
+Each reconciliation of a run is written by its `ResultSink` as soon as it
+completes, so results stream to disk rather than piling up in memory. Columns
+are stored without provider suffixes (`quantity_left`, `quantity_right`...),
+so the results of every pair share a schema and are queried together.
+
+Once its breaks are written, each reconciliation also gets a manifest row with
+its number of breaks of each type, next to the break types:
+
+    <root>/run_id=.../pair=ib_vs_enfusion/date=2025-01-31/manifest-<uuid>.parquet
+
+so that a reconciliation without any break can be told apart from one which
+never ran, see `ResultStore.reconciliations`.
+"""
+
+import datetime as dt
+import os
+import uuid
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Literal
+from urllib.parse import quote, unquote
+
+import polars as pl
+
+from novi_tally.instrumentation import stage
+
+BreakType = Literal["diff", "left_only", "right_only"]
+ResultFormat = Literal["parquet", "ipc"]
+
+BREAK_TYPES: tuple[BreakType, ...] = ("diff", "left_only", "right_only")
+_SUFFIXES = {"parquet": ".parquet", "ipc": ".arrow"}
+
+
+class ResultSink:
+    """Writes the reconciliations of one run to a `ResultStore`.
+
+    Writes are thread-safe: every call writes files of its own, each only
+    becoming visible once complete.
+    """
+
+    def __init__(
+        self,
+        store: "ResultStore",
+        run_id: str | None = None,
+        format: ResultFormat = "parquet",
+    ):
+        """
+        Args:
+            run_id: A new, time-ordered id by default.
+            format: Parquet files, or Arrow IPC files which are faster to write
+                and read but larger.
+        """
+        if format not in _SUFFIXES:
+            raise ValueError(f"Unknown result format: {format}")
+
+        self.store = store
+        self.run_id = run_id or (
+            f"{dt.datetime.now(dt.timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        )
+        self.format = format
+
+    def write(
+        self,
+        results: tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame],
+        left: str,
+        right: str,
+        date: dt.date,
+        **tags: str,
+    ) -> None:
+        """Append the results of a reconciliation of `left` with `right`.
+
+        Args:
+            results: The diff, left_only and right_only frames returned by
+                `reconcile_with`, with columns suffixed by `left` and `right`.
+            tags: Extra columns set on every row, e.g. `fund="PAF"`.
+        """
+        columns = [
+            pl.lit(left).alias("left_provider"),
+            pl.lit(right).alias("right_provider"),
+            *(pl.lit(value).alias(name) for name, value in tags.items()),
+        ]
+        suffix = _SUFFIXES[self.format]
+
+        with stage("results.write", left=left, right=right, date=date) as s:
+            for break_type, frame in zip(BREAK_TYPES, results):
+                if frame.is_empty():
+                    continue
+                directory = self.store._path(self.run_id, left, right, date, break_type)
+                directory.mkdir(parents=True, exist_ok=True)
+                _write(
+                    _normalize(frame, left, right).with_columns(columns),
+                    directory / f"part-{uuid.uuid4().hex}{suffix}",
+                    self.format,
+                )
+                s.add("rows_out", frame.height)
+
+            # written last: a manifest row means all the breaks are in the store
+            directory = self.store._path(self.run_id, left, right, date)
+            directory.mkdir(parents=True, exist_ok=True)
+            _write(
+                pl.DataFrame(
+                    {
+                        break_type: [frame.height]
+                        for break_type, frame in zip(BREAK_TYPES, results)
+                    },
+                    schema=dict.fromkeys(BREAK_TYPES, pl.Int64),
+                ).with_columns(columns),
+                directory / f"manifest-{uuid.uuid4().hex}{suffix}",
+                self.format,
+            )
+
+
+class ResultStore:
+    """Reconciliation results of many runs under a local directory."""
+
+    def __init__(self, directory: str | Path):
+        self._root = Path(directory)
+
+    def sink(
+        self, run_id: str | None = None, format: ResultFormat = "parquet"
+    ) -> ResultSink:
+        """A sink for the results of a new run, see `ResultSink`."""
+        return ResultSink(self, run_id=run_id, format=format)
+
+    def runs(self) -> list[str]:
+        """The ids of the runs in the store, oldest first for generated ids."""
+        return sorted(
+            unquote(path.name.removeprefix("run_id="))
+            for path in self._root.glob("run_id=*")
+            if path.is_dir()
+        )
+
+    def scan(
+        self,
+        run_id: str | None = None,
+        left: str | None = None,
+        right: str | None = None,
+        date: dt.date | None = None,
+        break_type: BreakType | None = None,
+    ) -> pl.LazyFrame:
+        """The results matching all the given partitions, as a lazy query.
+
+        Rows get `run_id`, `date` and `break_type` columns from their partition.
+        Columns only found in some results, e.g. the diff columns, are null in
+        the others.
+        """
+
+        directories = self._glob(
+            run_id, left, right, date, f"break_type={_pattern(break_type)}"
+        )
+
+        frames = [
+            _scan(file).with_columns(
+                *_partition_columns(file.parent.parent),
+                pl.lit(file.parts[-2].removeprefix("break_type=")).alias("break_type"),
+            )
+            for directory in sorted(directories)
+            for file in sorted(directory.iterdir())
+            if file.suffix in _SUFFIXES.values()
+        ]
+        if not frames:
+            return pl.LazyFrame(schema={**_PARTITION_SCHEMA, "break_type": pl.String})
+        return pl.concat(frames, how="diagonal_relaxed")
+
+    def read(
+        self,
+        run_id: str | None = None,
+        left: str | None = None,
+        right: str | None = None,
+        date: dt.date | None = None,
+        break_type: BreakType | None = None,
+    ) -> pl.DataFrame:
+        """The results matching all the given partitions, see `scan`.
+
+        Reconciliations without any break have no result: see `reconciliations`
+        to tell them apart from those which never ran.
+        """
+        return self.scan(
+            run_id=run_id, left=left, right=right, date=date, break_type=break_type
+        ).collect()
+
+    def reconciliations(
+        self,
+        run_id: str | None = None,
+        left: str | None = None,
+        right: str | None = None,
+        date: dt.date | None = None,
+    ) -> pl.DataFrame:
+        """The reconciliations written to the store, whether they had breaks or not.
+
+        Each reconciliation is a row of its provider pair, tags, `run_id`, `date`
+        and number of breaks of each type (`diff`, `left_only`, `right_only`).
+        A reconciliation without any break has a row of zeros, while one which
+        never ran, or failed before its results were written, has no row.
+        """
+        files = [
+            file
+            for directory in sorted(self._glob(run_id, left, right, date))
+            for file in sorted(directory.glob("manifest-*"))
+            if file.suffix in _SUFFIXES.values()
+        ]
+        if not files:
+            return pl.DataFrame(
+                schema={
+                    **dict.fromkeys(BREAK_TYPES, pl.Int64),
+                    **_PARTITION_SCHEMA,
+                }
+            )
+        return pl.concat(
+            [
+                _scan(file).with_columns(_partition_columns(file.parent))
+                for file in files
+            ],
+            how="diagonal_relaxed",
+        ).collect()
+
+    def _glob(
+        self,
+        run_id: str | None,
+        left: str | None,
+        right: str | None,
+        date: dt.date | None,
+        *parts: str,
+    ) -> Iterable[Path]:
+        return self._root.glob(
+            "/".join(
+                [
+                    f"run_id={_pattern(run_id)}",
+                    f"pair={_pattern(left)}_vs_{_pattern(right)}",
+                    f"date={'*' if date is None else f'{date:%Y-%m-%d}'}",
+                    *parts,
+                ]
+            )
+        )
+
+    def _path(
+        self,
+        run_id: str,
+        left: str,
+        right: str,
+        date: dt.date,
+        break_type: str | None = None,
+    ) -> Path:
+        path = (
+            self._root
+            / f"run_id={quote(run_id, safe='')}"
+            / f"pair={quote(left, safe='')}_vs_{quote(right, safe='')}"
+            / f"date={date:%Y-%m-%d}"
+        )
+        return path if break_type is None else path / f"break_type={break_type}"
+
+
+_PARTITION_SCHEMA = {
+    "left_provider": pl.String,
+    "right_provider": pl.String,
+    "run_id": pl.String,
+    "date": pl.Date,
+}
+
+
+def _pattern(value: str | None) -> str:
+    return "*" if value is None else quote(value, safe="")
+
+
+def _partition_columns(directory: Path) -> list[pl.Expr]:
+    """The `run_id` and `date` of the files of a `date=` directory."""
+    return [
+        pl.lit(unquote(directory.parts[-3].removeprefix("run_id="))).alias("run_id"),
+        pl.lit(dt.date.fromisoformat(directory.parts[-1].removeprefix("date="))).alias(
+            "date"
+        ),
+    ]
+
+
+def _normalize(frame: pl.DataFrame, left: str, right: str) -> pl.DataFrame:
+    """Replace the provider suffixes of the columns with `_left` and `_right`."""
+    # the longer suffix first, in case one provider name ends with the other
+    suffixes = sorted(
+        [(f"_{left}", "_left"), (f"_{right}", "_right")],
+        key=lambda suffix: -len(suffix[0]),
+    )
+
+    def rename(name: str) -> str:
+        for suffix, side in suffixes:
+            if name.endswith(suffix):
+                return name.removesuffix(suffix) + side
+        return name
+
+    return frame.rename(rename)
+
+
+def _write(frame: pl.DataFrame, path: Path, format: ResultFormat) -> None:
+    # written under a temporary name, so that readers never see a partial file
+    staging = path.with_name(f".{path.name}.tmp")
+    try:
+        if format == "parquet":
+            frame.write_parquet(staging)
+        else:
+            frame.write_ipc(staging, compression="zstd")
+        os.replace(staging, path)
+    except BaseException:
+        staging.unlink(missing_ok=True)
+        raise
+
+
+def _scan(path: Path) -> pl.LazyFrame:
+    if path.suffix == _SUFFIXES["parquet"]:
+        return pl.scan_parquet(path)
+    return pl.scan_ipc(path)
@@ -1,3 +1,5 @@
+import datetime as dt
+
 import pandera.polars as pa
 
 
@@ -10,12 +12,21 @@ class PositionSchema(pa.DataFrameModel):
     price: float
     asset_type: str = pa.Field(nullable=True)
     cost_price_lc: float = pa.Field(nullable=True)
+    # identifiers of the providers which have them, e.g. IB and RJO
+    figi: str | None = pa.Field(nullable=True)
+    contract_code: str | None = pa.Field(nullable=True)
+    # set when positions are resolved against an `InstrumentMaster`
+    instrument_key: str | None = pa.Field(nullable=True)
 
 
 class TradeSchema(pa.DataFrameModel):
+    trade_date: dt.date
     account_id: str
     local_ccy: str
     description: str = pa.Field(nullable=True)
     bbg_yellow: str = pa.Field(nullable=True)
     quantity: int
     price: float
+    figi: str | None = pa.Field(nullable=True)
+    contract_code: str | None = pa.Field(nullable=True)
+    instrument_key: str | None = pa.Field(nullable=True)
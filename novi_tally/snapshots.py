@@ -0,0 +1,146 @@
+"""
+Persist standardized positions as Parquet, and read them back.
+
+A snapshot store is a directory partitioned by provider, date and account:
+
+    <root>/provider=ib/date=2024-12-31/account=U19923882.parquet
+
+Each file holds the validated positions of one account, so reading some
+accounts of a date only opens their files, and Parquet statistics let filters
+on other columns skip the rest.
+"""
+
+import datetime as dt
+import shutil
+import uuid
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import polars as pl
+
+from novi_tally.errors import MissingDataError
+
+# the file of a date without any position, which keeps the schema
+_EMPTY = "empty.parquet"
+
+
+class SnapshotStore:
+    """Parquet snapshots of standardized positions under a local directory."""
+
+    def __init__(self, directory: str | Path):
+        self._root = Path(directory)
+
+    def write(self, frame: pl.DataFrame, provider: str, date: dt.date) -> None:
+        """Write the positions of `provider` on `date`, replacing any previous snapshot.
+
+        The new snapshot is written next to the previous one and swapped in once
+        complete, so readers never see a partially written date.
+        """
+        path = self._path(provider, date)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = path.with_name(f".{path.name}-{uuid.uuid4().hex}")
+        staging.mkdir()
+
+        try:
+            if frame.is_empty():
+                frame.write_parquet(staging / _EMPTY)
+            for (account,), part in frame.partition_by(
+                "account_id", as_dict=True, maintain_order=True
+            ).items():
+                part.write_parquet(
+                    staging / f"account={quote(account, safe='')}.parquet"
+                )
+
+            if path.exists():
+                previous = path.with_name(f".{path.name}-{uuid.uuid4().hex}")
+                path.rename(previous)
+                staging.rename(path)
+                shutil.rmtree(previous)
+            else:
+                staging.rename(path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def exists(self, provider: str, date: dt.date) -> bool:
+        return self._path(provider, date).is_dir()
+
+    def dates(self, provider: str) -> list[dt.date]:
+        """The dates with a snapshot of `provider`, in order."""
+        directory = self._root / f"provider={quote(provider, safe='')}"
+        if not directory.is_dir():
+            return []
+        return sorted(
+            dt.date.fromisoformat(path.name.removeprefix("date="))
+            for path in directory.glob("date=*")
+            if path.is_dir()
+        )
+
+    def scan(
+        self, provider: str, date: dt.date, accounts: list[str] | None = None
+    ) -> pl.LazyFrame:
+        """The snapshot of `provider` on `date` as a lazy query.
+
+        Raises:
+            MissingDataError: If there is no snapshot of the provider on the date.
+        """
+        path = self._path(provider, date)
+        if not path.is_dir():
+            raise MissingDataError(
+                f"No snapshot of {provider} on {date} in {self._root}"
+            )
+
+        files = sorted(path.glob("*.parquet"))
+        if accounts is not None:
+            wanted = {
+                f"account={quote(account, safe='')}.parquet" for account in accounts
+            }
+            selected = [file for file in files if file.name in wanted]
+            if not selected:
+                # none of the accounts has a position: an empty frame of the schema
+                return pl.scan_parquet(files[0]).head(0)
+            files = selected
+
+        return pl.scan_parquet(files)
+
+    def read(
+        self, provider: str, date: dt.date, accounts: list[str] | None = None
+    ) -> pl.DataFrame:
+        return self.scan(provider, date, accounts).collect()
+
+    def accounts(self, provider: str, date: dt.date) -> list[str]:
+        """The accounts in the snapshot of `provider` on `date`."""
+        return [
+            unquote(file.stem.removeprefix("account="))
+            for file in sorted(self._path(provider, date).glob("account=*.parquet"))
+        ]
+
+    def _path(self, provider: str, date: dt.date) -> Path:
+        return (
+            self._root
+            / f"provider={quote(provider, safe='')}"
+            / f"date={date:%Y-%m-%d}"
+        )
+
+
+class SnapshotLoader:
+    """A `LazyPositionLoader` reading the snapshots of one provider.
+
+    Snapshots are already standardized, so `transform` returns its input.
+    """
+
+    def __init__(self, store: SnapshotStore, provider: str):
+        self._store = store
+        self._provider = provider
+
+    def extract(self, date: dt.date, accounts: list[str] | None = None) -> pl.DataFrame:
+        return self._store.read(self._provider, date, accounts)
+
+    def transform(self, raw: pl.DataFrame) -> pl.DataFrame:
+        return raw
+
+    def scan(self, date: dt.date, accounts: list[str] | None = None) -> pl.LazyFrame:
+        return self._store.scan(self._provider, date, accounts)
+
+    def transform_lazy(self, raw: pl.LazyFrame) -> pl.LazyFrame:
+        return raw
@@ -0,0 +1,120 @@
+from typing import Literal
+
+import pandera.polars as pa
+import polars as pl
+from pandera.errors import SchemaError, SchemaErrorReason
+
+ValidationMode = Literal["full", "fast", "none"]
+
+
+class FastValidator:
+    """Validate dtypes, nullability and presence of the columns of a schema model.
+
+    Only the schema and null counts of the frame are inspected, so validation
+    doesn't scan the data. Column checks (`pa.Field(ge=...)` etc.) are not
+    supported: validate with pandera when the schema has any.
+    """
+
+    def __init__(self, schema_model: type[pa.DataFrameModel]):
+        self._schema = schema_model.to_schema()
+
+        for name, column in self._schema.columns.items():
+            if column.checks:
+                raise ValueError(
+                    f"Column checks of {name!r} can't be validated by FastValidator"
+                )
+
+        self._dtypes = {
+            name: column.dtype.type for name, column in self._schema.columns.items()
+        }
+        self._required = [
+            name for name, column in self._schema.columns.items() if column.required
+        ]
+        self._non_nullable = [
+            name for name, column in self._schema.columns.items() if not column.nullable
+        ]
+
+    def validate(self, frame: pl.DataFrame) -> pl.DataFrame:
+        for name in self._required:
+            if name not in frame.columns:
+                self._fail(
+                    frame,
+                    f"column '{name}' not in dataframe",
+                    SchemaErrorReason.COLUMN_NOT_IN_DATAFRAME,
+                )
+
+        for name, dtype in self._dtypes.items():
+            if name in frame.columns and frame.schema[name] != dtype:
+                self._fail(
+                    frame,
+                    f"expected column '{name}' to have type {dtype}, "
+                    f"got {frame.schema[name]}",
+                    SchemaErrorReason.WRONG_DATATYPE,
+                )
+
+        present = [name for name in self._non_nullable if name in frame.columns]
+        if present:
+            # null counts are kept as metadata by Polars, this doesn't scan the data
+            null_counts = frame.select(pl.col(present).null_count()).row(0, named=True)
+            for name, null_count in null_counts.items():
+                if null_count:
+                    self._fail(
+                        frame,
+                        f"non-nullable column '{name}' contains null values",
+                        SchemaErrorReason.SERIES_CONTAINS_NULLS,
+                    )
+
+        return frame
+
+    def _fail(self, frame: pl.DataFrame, message: str, reason: SchemaErrorReason):
+        raise SchemaError(
+            schema=self._schema, data=frame, message=message, reason_code=reason
+        )
+
+
+_fast_validators: dict[type[pa.DataFrameModel], FastValidator] = {}
+
+
+def validate(
+    frame: pl.DataFrame,
+    schema_model: type[pa.DataFrameModel],
+    mode: ValidationMode = "full",
+    sample: int | None = None,
+) -> pl.DataFrame:
+    """Validate a frame against a schema model.
+
+    Args:
+        frame: The frame to validate.
+        schema_model: The pandera schema model, e.g. `PositionSchema`.
+        mode:
+            - "full": validate with pandera.
+            - "fast": check dtypes, nullability and presence of columns with
+                `FastValidator`.
+            - "none": don't validate.
+        sample: In "full" mode, only validate this many randomly sampled rows.
+            Dtypes are still checked on the whole frame, but null values or
+            failed checks outside the sample go unnoticed.
+
+    Returns:
+        The frame, unchanged.
+
+    Raises:
+        SchemaError: If the frame doesn't conform to the schema.
+    """
+    if mode == "none":
+        return frame
+
+    if mode == "fast":
+        validator = _fast_validators.get(schema_model)
+        if validator is None:
+            validator = _fast_validators[schema_model] = FastValidator(schema_model)
+        return validator.validate(frame)
+
+    if mode != "full":
+        raise ValueError(f"Unknown validation mode: {mode}")
+
+    if sample is not None and sample < frame.height:
+        schema_model.validate(frame.sample(sample, seed=0))  # type: ignore
+    else:
+        schema_model.validate(frame)  # type: ignore
+    return frame
@@ -0,0 +1,58 @@
+import asyncio
+
+from novi_tally.connections.async_file_systems import ThreadedAsyncFileSystem
+from novi_tally.connections.cache import (
+    AsyncCachedFileSystem,
+    CachedFileSystem,
+    DiskCache,
+)
+from novi_tally.connections.file_systems import LocalFileSystem
+
+
+class CountingAsyncFileSystem:
+    """An async view of a local directory, counting its downloads."""
+
+    def __init__(self, fs: LocalFileSystem):
+        self._fs = fs
+        self.reads = 0
+
+    def uri(self, path: str) -> str:
+        return self._fs.uri(path)
+
+    async def fingerprint(self, path: str) -> str:
+        return self._fs.fingerprint(path)
+
+    async def read_bytes(self, path: str) -> bytes:
+        self.reads += 1
+        return self._fs.read_bytes(path)
+
+
+def test_threaded_file_system_across_event_loops(tmp_path):
+    (tmp_path / "a.csv").write_bytes(b"a")
+    afs = ThreadedAsyncFileSystem(LocalFileSystem(str(tmp_path)), max_concurrency=1)
+
+    async def read_many() -> list[bytes]:
+        # contended, so that the semaphore is waited on
+        return await asyncio.gather(*(afs.read_bytes("a.csv") for _ in range(4)))
+
+    assert asyncio.run(read_many()) == [b"a"] * 4
+    assert asyncio.run(read_many()) == [b"a"] * 4
+
+
+def test_sync_and_async_reads_share_a_disk_cache(tmp_path):
+    (tmp_path / "files").mkdir()
+    (tmp_path / "files" / "a.csv").write_bytes(b"a,b\n1,2\n")
+    fs = LocalFileSystem(str(tmp_path / "files"))
+    afs = CountingAsyncFileSystem(fs)
+
+    cached = CachedFileSystem(fs, DiskCache(tmp_path / "cache"))
+    async_cached = AsyncCachedFileSystem(afs, DiskCache(tmp_path / "cache"))
+
+    assert cached.read_bytes("a.csv") == b"a,b\n1,2\n"
+    assert asyncio.run(async_cached.read_bytes("a.csv")) == b"a,b\n1,2\n"
+    assert afs.reads == 0
+
+    # a changed file is downloaded again
+    (tmp_path / "files" / "a.csv").write_bytes(b"a,b\n3,4\n")
+    assert asyncio.run(async_cached.read_bytes("a.csv")) == b"a,b\n3,4\n"
+    assert afs.reads == 1
@@ -0,0 +1,26 @@
+import pytest
+
+from benchmarks import generators
+from novi_tally.dataloaders.formidium import read_nav_report
+
+pytest.importorskip("xlsxwriter")
+
+
+def test_same_named_reports_share_a_sidecar_dir(tmp_path):
+    for directory in ["a", "b", "sidecars"]:
+        (tmp_path / directory).mkdir()
+    sidecars = tmp_path / "sidecars"
+    first = generators.formidium_nav_report_xlsx(10, tmp_path / "a" / "nav.xlsx")
+    second = generators.formidium_nav_report_xlsx(20, tmp_path / "b" / "nav.xlsx")
+
+    assert read_nav_report(first, sidecars).height == 10
+    assert read_nav_report(second, sidecars).height == 20
+    # neither report removed the sidecar of the other
+    assert len(list(sidecars.iterdir())) == 2
+    assert read_nav_report(first, sidecars).height == 10
+
+    # a modified report replaces only its own sidecar
+    generators.formidium_nav_report_xlsx(5, first)
+    assert read_nav_report(first, sidecars).height == 5
+    assert len(list(sidecars.iterdir())) == 2
+    assert read_nav_report(second, sidecars).height == 20
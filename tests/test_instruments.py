@@ -0,0 +1,169 @@
+import polars as pl
+
+from novi_tally.connections.file_systems import LocalFileSystem
+from novi_tally.dataloaders.ib import IbPositionLoader
+from novi_tally.dataloaders.rjo import RjoPositionLoader
+from novi_tally.instruments import InstrumentMaster, standard_id_columns
+
+
+def _positions(descriptions: list[str], bbg_yellows: list[str | None]) -> pl.DataFrame:
+    return pl.DataFrame(
+        {"description": descriptions, "bbg_yellow": bbg_yellows},
+        schema={"description": pl.String, "bbg_yellow": pl.String},
+    )
+
+
+def test_blank_identifiers_are_not_keys(tmp_path):
+    master = InstrumentMaster(tmp_path / "instruments.parquet")
+    ib = _positions(["ES MAR25", "AAPL"], ["ESH5 Index", "AAPL US Equity"])
+    # Formidium only has BBG yellows for RJO positions, others are blank
+    formidium = _positions(["E-MINI S&P", "APPLE INC", "MSFT"], ["ESH5 Index", "", " "])
+
+    ib = master.resolve(ib, standard_id_columns("ib", ib.columns))
+    formidium = master.resolve(
+        formidium, standard_id_columns("formidium", formidium.columns)
+    )
+
+    assert ib["instrument_key"].to_list() == [
+        "bbg_yellow:ESH5 Index",
+        "bbg_yellow:AAPL US Equity",
+    ]
+    assert formidium["instrument_key"].to_list() == [
+        "bbg_yellow:ESH5 Index",
+        "description:formidium:APPLE INC",
+        "description:formidium:MSFT",
+    ]
+    assert (
+        master.to_frame().filter(pl.col("id_value").str.strip_chars() == "").is_empty()
+    )
+
+    # mapping the Formidium description to the IB key matches both providers
+    master.add(
+        pl.DataFrame(
+            {
+                "id_type": ["description:formidium"],
+                "id_value": ["APPLE INC"],
+                "instrument_key": ["bbg_yellow:AAPL US Equity"],
+            }
+        )
+    )
+    reloaded = InstrumentMaster(tmp_path / "instruments.parquet")
+    formidium = reloaded.lookup(
+        formidium.drop("instrument_key"),
+        standard_id_columns("formidium", formidium.columns),
+    )
+    assert formidium["instrument_key"].to_list() == [
+        "bbg_yellow:ESH5 Index",
+        "bbg_yellow:AAPL US Equity",
+        "description:formidium:MSFT",
+    ]
+
+
+class FakeOpenFigiApi:
+    def __init__(self, mapping: dict[str, str]):
+        self._mapping = mapping
+        self.requested: list[str] = []
+
+    def get_bbg_mapping_table(self, bb_globals) -> dict[str, str]:
+        bb_globals = [b for b in bb_globals if b]
+        self.requested.extend(bb_globals)
+        return {b: self._mapping[b] for b in bb_globals if b in self._mapping}
+
+
+def _ib_raw(bb_global: str) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "AccountID": ["U1"],
+            "SecurityDescription": ["ES MAR25"],
+            "BBGlobalID": [bb_global],
+            "Quantity": [2],
+            "MarketPrice": [5000.0],
+            "CostPrice": [4900.0],
+            "Currency": ["USD"],
+            "AssetType": ["FUT"],
+            "Multiplier": [50.0],
+        }
+    )
+
+
+def _rjo_raw(root: str | None) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "Account_number": ["30012"],
+            "Security_desc_line_1": ["MAR 25 CME E-MINI S&P"],
+            "Security_subtype_code": [None],
+            "Quantity": [2],
+            "Buy_sell_code": [1],
+            "Close_price": [5000.0],
+            "Trade_price": [4900.0],
+            "Account_type_currency_symbol": ["USD"],
+            "Security_type_code": ["F"],
+            "Multiplication_factor": [50.0],
+            "Exchange_code": ["01"],
+            "Contract_code": ["ES"],
+            "Contract_month": ["202503"],
+            "bloomberg_root": [root],
+            "bloomberg_market_sector": ["Index"],
+        },
+        schema_overrides={"Security_subtype_code": pl.String},
+    )
+
+
+def test_ib_and_rjo_instruments_share_a_key(tmp_path):
+    path = tmp_path / "instruments.parquet"
+    fs = LocalFileSystem(str(tmp_path))
+    openfigi_api = FakeOpenFigiApi({"BBG00ESH5": "ESH5 Index"})
+    master = InstrumentMaster(path)
+
+    ib = IbPositionLoader(
+        fs=fs,
+        openfigi_api=openfigi_api,  # type: ignore
+        instrument_master=master,
+    ).transform(_ib_raw("BBG00ESH5"))
+    rjo_loader = RjoPositionLoader(fs=fs)
+    rjo = rjo_loader.transform(_rjo_raw("ES"))
+    assert ib.select("figi", "bbg_yellow").row(0) == ("BBG00ESH5", "ESH5 INDEX")
+    assert rjo.select("contract_code", "bbg_yellow").row(0) == (
+        "01 ES 202503",
+        "ESH5 INDEX",
+    )
+
+    ib = master.resolve(ib, standard_id_columns("ib", ib.columns))
+    rjo = master.resolve(rjo, standard_id_columns("rjo", rjo.columns))
+    assert ib["instrument_key"].to_list() == ["figi:BBG00ESH5"]
+    assert rjo["instrument_key"].to_list() == ["figi:BBG00ESH5"]
+
+    # the contract code alone keys an RJO row without its bloomberg root
+    rjo = rjo_loader.transform(_rjo_raw(None))
+    assert rjo["bbg_yellow"].to_list() == [None]
+    rjo = master.lookup(rjo, standard_id_columns("rjo", rjo.columns))
+    assert rjo["instrument_key"].to_list() == ["figi:BBG00ESH5"]
+
+    # once warm, the master stands in for OpenFIGI
+    openfigi_api = FakeOpenFigiApi({})
+    ib = IbPositionLoader(
+        fs=fs,
+        openfigi_api=openfigi_api,  # type: ignore
+        instrument_master=InstrumentMaster(path),
+    ).transform(_ib_raw("BBG00ESH5"))
+    assert ib["bbg_yellow"].to_list() == ["ESH5 INDEX"]
+    assert openfigi_api.requested == []
+
+
+def test_unmapped_figis_are_requested_again(tmp_path):
+    master = InstrumentMaster()
+    fs = LocalFileSystem(str(tmp_path))
+
+    openfigi_api = FakeOpenFigiApi({})
+    loader = IbPositionLoader(
+        fs=fs,
+        openfigi_api=openfigi_api,  # type: ignore
+        instrument_master=master,
+    )
+    ib = loader.transform(_ib_raw("BBG00ESH5"))
+    # as before the master, an unmapped BB global ID is the BBG yellow
+    assert ib["bbg_yellow"].to_list() == ["BBG00ESH5"]
+    master.resolve(ib, standard_id_columns("ib", ib.columns))
+
+    ib = loader.transform(_ib_raw("BBG00ESH5"))
+    assert openfigi_api.requested == ["BBG00ESH5", "BBG00ESH5"]
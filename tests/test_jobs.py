@@ -0,0 +1,107 @@
+import datetime as dt
+import threading
+import time
+
+import pytest
+
+from novi_tally.errors import ConfigError
+from novi_tally.jobs import DependencyError, Fund, Jobs, _run_tasks, _Task
+
+# a Saturday: providers are loaded on the Friday before, unless configured
+SATURDAY = dt.date(2025, 2, 1)
+FRIDAY = dt.date(2025, 1, 31)
+
+
+def _fail():
+    raise RuntimeError("no data")
+
+
+def test_failed_dependencies_fail_their_dependents():
+    tasks = [
+        _Task("load a", _fail),
+        _Task("load b", lambda: None),
+        _Task("a vs b", lambda: None, dependencies=["load a", "load b"]),
+        _Task("after a vs b", lambda: None, dependencies=["a vs b"]),
+        _Task("b only", lambda: None, dependencies=["load b"]),
+    ]
+
+    errors = _run_tasks(tasks, max_workers=2, limits={})
+
+    assert isinstance(errors["load a"], RuntimeError)
+    assert isinstance(errors["a vs b"], DependencyError)
+    assert isinstance(errors["after a vs b"], DependencyError)
+    assert errors["load b"] is None
+    assert errors["b only"] is None
+
+
+@pytest.mark.parametrize("limit", [1, 2])
+def test_connection_limits(limit):
+    running = {"api": 0, "other": 0}
+    peaks = {"api": 0, "other": 0}
+    lock = threading.Lock()
+
+    def load(connection: str):
+        with lock:
+            running[connection] += 1
+            peaks[connection] = max(peaks[connection], running[connection])
+        time.sleep(0.02)
+        with lock:
+            running[connection] -= 1
+
+    tasks = [
+        _Task(("api", i), lambda: load("api"), connections=["api"]) for i in range(6)
+    ] + [
+        _Task(("other", i), lambda: load("other"), connections=["other"])
+        for i in range(3)
+    ]
+
+    errors = _run_tasks(tasks, max_workers=4, limits={"api": limit})
+
+    assert not any(errors.values())
+    assert peaks["api"] == limit
+    # a connection without a limit is only bound by the workers
+    assert peaks["other"] > 1
+
+
+def test_unknown_dependencies():
+    with pytest.raises(ValueError, match="unknown dependencies"):
+        _run_tasks([_Task("a vs b", lambda: None, dependencies=["load a"])], 1, {})
+
+
+@pytest.mark.parametrize("limit", [0, -1, 1.5])
+def test_limits_must_be_positive(tmp_path, limit):
+    with pytest.raises(ConfigError, match="formidium-api"):
+        Jobs("config.toml", [], [SATURDAY], tmp_path, limits={"formidium-api": limit})
+
+    job_file = tmp_path / "jobs.toml"
+    job_file.write_text(
+        'config = "config.toml"\n'
+        "dates = [2025-02-01]\n"
+        "funds = []\n"
+        f"[limits]\nformidium-api = {limit}\n"
+    )
+    with pytest.raises(ConfigError, match="formidium-api"):
+        Jobs.from_file(job_file)
+
+
+def test_positions_are_loaded_once_per_provider_and_date(tmp_path):
+    funds = [
+        Fund("PAF", {"ib": ["U1"], "rjo": ["30012"]}, against=["formidium"]),
+        Fund("ANAR", {"ib": ["U2"]}, against=["formidium", "enfusion"]),
+    ]
+    jobs = Jobs(
+        "config.toml",
+        funds,
+        [SATURDAY],
+        tmp_path,
+        provider_dates={"formidium": "date"},
+    )
+
+    assert len(jobs.reconciliations()) == 4
+    assert jobs.loads() == {
+        ("ib", FRIDAY): ["U1", "U2"],
+        ("rjo", FRIDAY): ["30012"],
+        # with the accounts of every reconciliation against it
+        ("formidium", SATURDAY): ["30012", "U1", "U2"],
+        ("enfusion", FRIDAY): ["U2"],
+    }
@@ -0,0 +1,363 @@
+import polars as pl
+import pytest
+
+from novi_tally import instrumentation, reconciliation
+from novi_tally.reconciliation import (
+    ReconciliationState,
+    _reconcile_levels,
+    reconcile_frames,
+    reconcile_incremental,
+    reconcile_sharded,
+)
+
+KWARGS = {
+    "l_suffix": "ib",
+    "r_suffix": "enfusion",
+    "price_diff_threshold": 0.01,
+    "quantity_diff_threshold": 0,
+}
+
+
+def _positions(rows: list[tuple]) -> pl.DataFrame:
+    return pl.DataFrame(
+        rows,
+        schema={
+            "account_id": pl.String,
+            "local_ccy": pl.String,
+            "description": pl.String,
+            "bbg_yellow": pl.String,
+            "quantity": pl.Int64,
+            "price": pl.Float64,
+        },
+        orient="row",
+    )
+
+
+def _sorted(frame: pl.DataFrame) -> pl.DataFrame:
+    return frame.sort(pl.all(), nulls_last=True)
+
+
+def _assert_same_results(results, expected):
+    for result, expected_result in zip(results, expected, strict=True):
+        assert result.columns == expected_result.columns
+        assert _sorted(result).equals(_sorted(expected_result))
+
+
+def _level_by_level(left, right, identifiers, **kwargs):
+    """The results of one join on the key columns per identifier."""
+    kwargs = {**KWARGS, **kwargs}
+    l_suffix, r_suffix = kwargs.pop("l_suffix"), kwargs.pop("r_suffix")
+    return _reconcile_levels(
+        left=left.lazy().rename(lambda name: f"{name}_{l_suffix}"),
+        right=right.lazy().rename(lambda name: f"{name}_{r_suffix}"),
+        l_suffix=l_suffix,
+        r_suffix=r_suffix,
+        keys=["account_id"],
+        identifiers=identifiers,
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def fallbacks(monkeypatch):
+    """The number of reconciliations falling back to `_reconcile_levels`."""
+    calls = []
+    reconcile_levels = reconciliation._reconcile_levels
+
+    def spy(**kwargs):
+        calls.append(kwargs)
+        return reconcile_levels(**kwargs)
+
+    monkeypatch.setattr(reconciliation, "_reconcile_levels", spy)
+    return calls
+
+
+LEFT = [
+    ("A", "USD", "ES H5", "ESH5 Index", 10, 100.0),
+    ("A", "USD", "NQ H5", "NQH5 Index", 5, 200.0),
+    # matched on its BBG yellow only
+    ("A", "USD", "CL J5", "CLJ5 Comdty", 2, 70.0),
+    # without a description, matched on its BBG yellow
+    ("B", "USD", None, "GCJ5 Comdty", 1, 2900.0),
+    # without a BBG yellow, matched on its description
+    ("B", "EUR", "FESX H5", None, 3, 5000.0),
+    # without any identifier, never matched
+    ("B", "USD", None, None, 4, 1.0),
+    ("C", "USD", "ZN H5", "TYH5 Comdty", 7, 110.0),
+]
+RIGHT = [
+    ("A", "USD", "ES H5", "ESH5 Index", 10, 100.5),
+    ("A", "USD", "NQ H5", "NQH5 Index", 5, 200.0),
+    ("A", "USD", "CRUDE OIL APR25", "CLJ5 Comdty", 3, 70.0),
+    ("B", "USD", "GOLD APR25", "GCJ5 Comdty", 1, 2900.0),
+    ("B", "USD", "FESX H5", "VGH5 Index", 3, 5000.0),
+    ("B", "USD", None, None, 4, 1.0),
+    ("D", "USD", "ZN H5", "TYH5 Comdty", 7, 110.0),
+]
+IDENTIFIERS = ["description", "bbg_yellow"]
+
+
+@pytest.mark.parametrize(
+    "identifiers", [["description"], ["bbg_yellow"], IDENTIFIERS, IDENTIFIERS[::-1]]
+)
+def test_reconcile_frames_matches_level_by_level(identifiers, fallbacks):
+    left, right = _positions(LEFT), _positions(RIGHT)
+
+    results = reconcile_frames(left, right, identifiers=identifiers, **KWARGS)
+
+    assert not fallbacks
+    _assert_same_results(results, _level_by_level(left, right, identifiers))
+
+
+def test_reconcile_frames_match_levels():
+    diff, left_only, right_only = reconcile_frames(
+        _positions(LEFT), _positions(RIGHT), identifiers=IDENTIFIERS, **KWARGS
+    )
+
+    assert diff.select("description_ib", "match_level").sort(
+        "description_ib"
+    ).rows() == [
+        ("CL J5", "bbg_yellow"),
+        ("ES H5", "description"),
+        ("FESX H5", "description"),
+    ]
+    # a row unmatched on its description is matched on its BBG yellow
+    assert "CL J5" not in left_only["description_ib"].to_list()
+    assert left_only["account_id_ib"].to_list() == ["B", "C"]
+    assert right_only["account_id_enfusion"].to_list() == ["B", "D"]
+
+
+def test_reconcile_frames_falls_back_on_hash_collisions(monkeypatch, fallbacks):
+    match_levels = reconciliation._match_levels
+
+    def colliding(*args, **kwargs):
+        # pair rows of different instruments, as colliding hashes would
+        matches = match_levels(*args, **kwargs)
+        return matches.with_columns(pl.col(reconciliation._RIGHT_INDEX).reverse())
+
+    monkeypatch.setattr(reconciliation, "_match_levels", colliding)
+    left, right = _positions(LEFT), _positions(RIGHT)
+
+    results = reconcile_frames(left, right, identifiers=IDENTIFIERS, **KWARGS)
+
+    assert len(fallbacks) == 1
+    _assert_same_results(results, _level_by_level(left, right, IDENTIFIERS))
+
+
+def test_reconcile_frames_falls_back_on_dtype_mismatches(fallbacks):
+    left = _positions(LEFT)
+    right = _positions(RIGHT).with_columns(pl.col("bbg_yellow").cast(pl.Categorical))
+
+    # the key columns can't be joined either: the error of the level by level
+    # reconciliation is raised
+    with pytest.raises(pl.exceptions.ComputeError) as expected:
+        _level_by_level(left, right, IDENTIFIERS)
+    with pytest.raises(type(expected.value), match="datatypes of join keys"):
+        reconcile_frames(left, right, identifiers=IDENTIFIERS, **KWARGS)
+
+    assert len(fallbacks) == 1
+
+
+@pytest.mark.parametrize(
+    "identifiers", [["description"], ["description", "bbg_yellow"]]
+)
+def test_incremental_matches_full_with_null_identifiers(identifiers):
+    left = _positions(
+        [
+            ("A", "USD", "ES H5", "ESH5 Index", 10, 100.0),
+            ("A", "USD", None, None, 5, 10.0),
+            ("B", "USD", "NQ H5", None, 3, 200.0),
+        ]
+    )
+    right = _positions(
+        [
+            ("A", "USD", "ES H5", "ESH5 Index", 10, 100.5),
+            ("B", "USD", None, "NQH5 Index", 3, 200.0),
+        ]
+    )
+    # on the next day, rows without any identifier are added and removed
+    next_left = pl.concat([left.slice(0, 1), left.slice(2)])
+    next_right = pl.concat(
+        [
+            right,
+            _positions(
+                [("A", "USD", None, None, 7, 1.0), ("C", "USD", None, None, 1, 2.0)]
+            ),
+        ]
+    )
+
+    kwargs = {
+        "l_suffix": "ib",
+        "r_suffix": "enfusion",
+        "identifiers": identifiers,
+        "price_diff_threshold": 0.01,
+        "quantity_diff_threshold": 0,
+    }
+    state = ReconciliationState()
+    for day_left, day_right in [(left, right), (next_left, next_right)]:
+        incremental = reconcile_incremental(day_left, day_right, state=state, **kwargs)
+        full = reconcile_frames(day_left, day_right, **kwargs)
+        for result, expected in zip(incremental, full):
+            assert _sorted(result).equals(_sorted(expected.select(result.columns)))
+
+    assert incremental[2].height == 3
+
+
+def _incremental_days(days, state, **kwargs) -> list[int]:
+    """Reconcile `days` incrementally, checking each day against a full run.
+
+    Returns:
+        The number of rows reconciled again on each day.
+    """
+    kwargs = {**KWARGS, "identifiers": IDENTIFIERS, **kwargs}
+    affected = []
+    for left, right in days:
+        with instrumentation.record() as recorder:
+            results = reconcile_incremental(left, right, state=state, **kwargs)
+        _assert_same_results(results, reconcile_frames(left, right, **kwargs))
+        (stage,) = [s for s in recorder.stages if s.name == "reconcile.incremental"]
+        affected.append(stage.metrics["rows_affected"])
+    return affected
+
+
+def _book(n: int, seed: int) -> list[tuple]:
+    """`n` rows over a few accounts, some of them sharing identifiers."""
+    return [
+        (
+            f"ACC{i % 3}",
+            "USD",
+            f"SEC {i}" if i % 7 else None,
+            f"TICK{i // 2} Index" if i % 5 else None,
+            10 + (i * seed) % 4,
+            float(100 + i),
+        )
+        for i in range(n)
+    ]
+
+
+def test_incremental_matches_full_over_days():
+    left, right = _positions(_book(40, seed=1)), _positions(_book(40, seed=2))
+
+    def edited(frame: pl.DataFrame, rows: list[int], **values) -> pl.DataFrame:
+        index = pl.int_range(pl.len())
+        return frame.with_columns(
+            pl.when(index.is_in(rows))
+            .then(pl.lit(value, frame.schema[name]))
+            .otherwise(pl.col(name))
+            .alias(name)
+            for name, value in values.items()
+        )
+
+    days = [(left, right)]
+    # edits: a quantity on the left, a price beyond the threshold on the right
+    left = edited(left, [3], quantity=99)
+    right = edited(right, [11], price=1.0)
+    days.append((left, right))
+    # an insert, matched by an insert on the other side the next day
+    new = _positions([("ACC9", "USD", "NEW", "NEW Index", 1, 1.0)])
+    left = pl.concat([left, new])
+    days.append((left, right))
+    right = pl.concat([right, new.with_columns(quantity=pl.lit(2, pl.Int64))])
+    days.append((left, right))
+    # deletes, on both sides
+    left, right = left.slice(1), right.slice(0, right.height - 3)
+    days.append((left, right))
+    # an unchanged day
+    days.append((left, right))
+
+    affected = _incremental_days(days, ReconciliationState())
+
+    # the first day is reconciled in full, later days only around their changes
+    assert affected[0] == 80
+    assert all(0 < rows < 40 for rows in affected[1:5])
+    assert affected[5] == 0
+
+
+def test_incremental_with_duplicate_rows():
+    # rows without any identifier are never matched, and may be identical
+    row = ("A", "USD", None, None, 4, 1.0)
+    other = ("B", "USD", "NQ H5", "NQH5 Index", 5, 200.0)
+    edited = ("B", "USD", "NQ H5", "NQH5 Index", 6, 200.0)
+    right = _positions([row, other])
+
+    days = [
+        (_positions([row, row, other]), right),
+        # another copy of an identical row: reconciled in full again
+        (_positions([row, row, row, other]), right),
+        # as many copies, and an edit elsewhere: reconciled incrementally
+        (_positions([row, row, row, edited]), right),
+        # one copy fewer
+        (_positions([row, row, edited]), right),
+    ]
+
+    affected = _incremental_days(days, ReconciliationState())
+
+    assert affected == [5, 6, 2, 5]
+
+
+def test_incremental_closes_over_identifier_levels():
+    # the IB row matches the Enfusion row on its BBG yellow only
+    left = _positions([("A", "USD", "ES H5", "ESH5 Index", 10, 100.0)])
+    right = _positions([("A", "USD", "E-MINI MAR25", "ESH5 Index", 10, 100.0)])
+    # a new Enfusion row matching its description takes the match over: the
+    # other Enfusion row, only connected to it through the IB row's BBG yellow,
+    # is then unmatched
+    new_right = pl.concat([right, _positions([("A", "USD", "ES H5", None, 10, 100.0)])])
+    # rows of other accounts are not connected
+    unrelated = _positions([("B", "USD", "ES H5", "ESH5 Index", 1, 1.0)])
+
+    days = [
+        (pl.concat([left, unrelated]), pl.concat([right, unrelated])),
+        (pl.concat([left, unrelated]), pl.concat([new_right, unrelated])),
+    ]
+    state = ReconciliationState()
+
+    assert _incremental_days(days, state) == [4, 3]
+    _, _, right_only = reconcile_incremental(
+        *days[1], state=state, identifiers=IDENTIFIERS, **KWARGS
+    )
+    assert right_only["description_enfusion"].to_list() == ["E-MINI MAR25"]
+
+
+@pytest.mark.parametrize(
+    "changed",
+    [
+        {"identifiers": ["description"]},
+        {"identifiers": IDENTIFIERS[::-1]},
+        {"price_diff_threshold": 1.0},
+        {"quantity_diff_threshold": 2},
+    ],
+)
+def test_incremental_state_reused_with_other_params(changed):
+    left, right = _positions(LEFT), _positions(RIGHT)
+    state = ReconciliationState()
+
+    _incremental_days([(left, right)], state)
+    # the same frames with other params are reconciled in full
+    assert _incremental_days([(left, right)], state, **changed) == [14]
+    # and then incrementally with the new params
+    assert _incremental_days([(left, right)], state, **changed) == [0]
+
+
+@pytest.mark.parametrize("empty_side", [None, "left", "right"])
+def test_reconcile_sharded_matches_full(empty_side):
+    left = pl.concat([_positions(LEFT), _positions(_book(40, seed=1))])
+    right = pl.concat([_positions(RIGHT), _positions(_book(40, seed=2))])
+    if empty_side == "left":
+        left = left.clear()
+    elif empty_side == "right":
+        right = right.clear()
+
+    results = reconcile_sharded(
+        left,
+        right,
+        identifiers=IDENTIFIERS,
+        max_workers=2,
+        # more shards than workers, some of them without rows
+        max_shard_bytes=256,
+        **KWARGS,
+    )
+
+    _assert_same_results(
+        results, reconcile_frames(left, right, identifiers=IDENTIFIERS, **KWARGS)
+    )
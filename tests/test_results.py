@@ -0,0 +1,45 @@
+import datetime as dt
+
+import polars as pl
+
+from novi_tally.results import ResultStore
+
+DATE = dt.date(2025, 1, 31)
+
+
+def _results(n_left_only: int) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    return (
+        pl.DataFrame(
+            schema={
+                "account_id": pl.String,
+                "quantity_ib": pl.Int64,
+                "quantity_rjo": pl.Int64,
+            }
+        ),
+        pl.DataFrame(
+            {"account_id": ["A"] * n_left_only, "quantity_ib": [1] * n_left_only},
+            schema={"account_id": pl.String, "quantity_ib": pl.Int64},
+        ),
+        pl.DataFrame(schema={"account_id": pl.String, "quantity_rjo": pl.Int64}),
+    )
+
+
+def test_clean_reconciliations_are_recorded(tmp_path):
+    store = ResultStore(tmp_path)
+    sink = store.sink(format="ipc")
+    sink.write(_results(0), left="ib", right="rjo", date=DATE, fund="PAF")
+    sink.write(_results(2), left="ib", right="enfusion", date=DATE, fund="PAF")
+
+    # a clean pair has no breaks, but it has a manifest row of zeros
+    assert store.read(left="ib", right="rjo", date=DATE).is_empty()
+    clean = store.reconciliations(left="ib", right="rjo", date=DATE)
+    assert clean.select(
+        "run_id", "date", "fund", "diff", "left_only", "right_only"
+    ).rows() == [(sink.run_id, DATE, "PAF", 0, 0, 0)]
+
+    assert store.read(left="ib", right="enfusion")["quantity_left"].to_list() == [1, 1]
+    assert store.reconciliations(right="enfusion")["left_only"].to_list() == [2]
+
+    # a pair which never ran has no manifest
+    assert store.reconciliations(left="ib", right="formidium").is_empty()
+    assert store.reconciliations().height == 2
@@ -0,0 +1,72 @@
+import polars as pl
+import pytest
+
+from novi_tally.dataloaders.rjo.loaders import with_bloomberg_yellow_code
+
+CASES = [
+    # description, bloomberg root, sector, contract month, bbg yellow
+    pytest.param(
+        "MAR 25 CME E-MINI S&P", "ES", "Index", "202503", "ESH5 Index", id="passthrough"
+    ),
+    pytest.param("JUL 25 CBT CORN", "C", "Comdty", "202507", "C N5 Comdty", id="pad"),
+    pytest.param(
+        "JAN 26 NYM NAT GAS", "NG", "Comdty", "202601", "NGF26 Comdty", id="two-digit"
+    ),
+    pytest.param("SEP 25 OSE JGB", "NZ", "Index", "202509", "JGSU5 Index", id="fix"),
+    pytest.param(
+        "DEC 25 ICE UKA FUT", "UK", "Comdty", "202512", "UKEZ5 Comdty", id="override"
+    ),
+    pytest.param(
+        "JUN 25 SCM TSR20RUBBR",
+        "NZ",
+        "Index",
+        "202506",
+        "ORM5 Comdty",
+        id="override-before-fix",
+    ),
+    pytest.param(
+        "DEC 25 ICE UKA FUT",
+        "AL",
+        "Comdty",
+        "202512",
+        "ALEZ5 Comdty",
+        id="fix-before-override",
+    ),
+    pytest.param(
+        "MAR 26 LME NICKEL US",
+        "AL",
+        "Comdty",
+        "202603",
+        "LNH6 Comdty",
+        id="override-before-fix-same-sector",
+    ),
+    pytest.param(
+        "OCT 25 ICE UKA FUT SPREAD",
+        "UK",
+        "Comdty",
+        "202510",
+        "UKV5 Comdty",
+        id="suffix-only",
+    ),
+]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("description, root, sector, contract_month, expected", CASES)
+def test_with_bloomberg_yellow_code(
+    description, root, sector, contract_month, expected, lazy
+):
+    frame = pl.DataFrame(
+        {
+            "Security_desc_line_1": [description],
+            "bloomberg_root": [root],
+            "bloomberg_market_sector": [sector],
+            "Contract_month": [contract_month],
+        }
+    )
+    result = with_bloomberg_yellow_code(frame.lazy() if lazy else frame)
+    if lazy:
+        result = result.collect()
+
+    assert result.columns == [*frame.columns, "bbg_yellow"]
+    assert result["bbg_yellow"].to_list() == [expected]
@@ -0,0 +1,69 @@
+import pandera.polars as pa
+import polars as pl
+import pytest
+from pandera.errors import SchemaError, SchemaErrorReason
+
+from novi_tally.schemas import PositionSchema
+from novi_tally.validation import FastValidator, validate
+
+
+@pytest.fixture
+def positions() -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "account_id": ["U1", "U2"],
+            "local_ccy": ["USD", "EUR"],
+            "description": ["ES H5", None],
+            "bbg_yellow": [None, "VGH5 Index"],
+            "quantity": [10, -3],
+            "price": [100.0, 5000.0],
+            "asset_type": ["FUT", None],
+            "cost_price_lc": [None, 4900.0],
+        }
+    )
+
+
+def test_fast_validation_passes(positions):
+    assert validate(positions, PositionSchema, mode="fast") is positions
+    # pandera agrees
+    PositionSchema.validate(positions)
+
+
+@pytest.mark.parametrize(
+    "change, reason",
+    [
+        (
+            lambda frame: frame.drop("local_ccy"),
+            SchemaErrorReason.COLUMN_NOT_IN_DATAFRAME,
+        ),
+        (
+            lambda frame: frame.with_columns(pl.col("quantity").cast(pl.Float64)),
+            SchemaErrorReason.WRONG_DATATYPE,
+        ),
+        (
+            lambda frame: frame.with_columns(
+                pl.when(pl.col("account_id") == "U2").then(pl.col("price"))
+            ),
+            SchemaErrorReason.SERIES_CONTAINS_NULLS,
+        ),
+    ],
+    ids=["missing column", "wrong dtype", "null in non-nullable column"],
+)
+def test_fast_validation_fails(positions, change, reason):
+    invalid = change(positions)
+
+    with pytest.raises(SchemaError) as error:
+        FastValidator(PositionSchema).validate(invalid)
+    assert error.value.reason_code == reason
+
+    # pandera rejects the same frames
+    with pytest.raises(SchemaError):
+        PositionSchema.validate(invalid)
+
+
+def test_fast_validator_rejects_column_checks():
+    class Checked(pa.DataFrameModel):
+        quantity: int = pa.Field(ge=0)
+
+    with pytest.raises(ValueError, match="quantity"):
+        FastValidator(Checked)